@@ -0,0 +1,138 @@
+import numpy as np
+from importacao_tardia import pd
+
+from calculos_carteira import fechamentos_diarios, soma_por_segmento, preco_medio_vetorizado
+
+
+def _normalizar_ordens_datadas(ordens):
+    """Como `_normalizar_ordens`, mas com a coluna `data` de cada ordem."""
+    colunas = ["data", "codigo", "tipo", "quantidade", "preco"]
+    if isinstance(ordens, str):
+        ordens = pd.read_csv(ordens)
+    if isinstance(ordens, pd.DataFrame):
+        df = ordens[colunas].copy()
+    else:
+        registros = [o if isinstance(o, dict) else dict(zip(colunas, o)) for o in ordens]
+        df = pd.DataFrame.from_records(registros, columns=colunas)
+    df["tipo"] = df["tipo"].astype(str).str.lower()
+    datas = pd.to_datetime(df["data"])
+    if datas.dt.tz is not None:
+        datas = datas.dt.tz_localize(None)
+    df["data"] = datas.dt.normalize()
+    return df.reset_index(drop=True)
+
+
+def fechamentos_alinhados(analisador, codigos, periodo="10y"):
+    """
+    Matriz de fechamentos diários (uma coluna por ticker, uma linha por
+    pregão), montada a partir dos históricos em cache de `analisador`.
+    """
+    series = {}
+    for codigo in codigos:
+        dados = analisador._get_dados_historicos(codigo, periodo=periodo, copiar=False)
+        if dados is not None and not dados.empty:
+            serie = fechamentos_diarios(dados)
+            series[codigo] = serie[~serie.index.duplicated(keep="last")]
+    return pd.DataFrame(series).sort_index()
+
+
+def simular_historico(ordens, fechamentos, saldo_inicial=10000.0):
+    """
+    Reconstrói a evolução diária da carteira a partir de um histórico de
+    ordens (colunas data, codigo, tipo, quantidade, preco) e dos fechamentos
+    alinhados de cada ticker (DataFrame com datas no índice e tickers nas
+    colunas, como o de `fechamentos_alinhados`).
+
+    Todo o cálculo é feito com arrays inteiros, sem laço por dia:
+    - a matriz de posições (dias x ativos) é a soma acumulada das variações
+      de quantidade de cada ordem, lançadas no dia em que ocorreram;
+    - o caixa é o saldo inicial mais a soma acumulada dos fluxos diários;
+    - o preço médio de cada ordem vem da mesma recorrência usada em
+      `executar_lote`, e dele saem o lucro realizado das vendas e o custo
+      da carteira em cada dia.
+
+    Uma ordem em data sem pregão entra no pregão seguinte. Dias sem
+    fechamento usam o último preço conhecido. Retorna um dict com
+    "sucesso", "curva" (caixa, valor_mercado, patrimonio, custo,
+    lucro_realizado, lucro_nao_realizado e drawdown por dia), "posicoes"
+    (quantidade por dia e ativo) e "drawdown_maximo".
+    """
+    df = _normalizar_ordens_datadas(ordens)
+    datas = pd.DatetimeIndex(fechamentos.index)
+    if datas.tz is not None:
+        datas = datas.tz_localize(None)
+    tickers = pd.Index(fechamentos.columns)
+    n_dias, n_ativos = len(datas), len(tickers)
+
+    colunas = tickers.get_indexer(df["codigo"])
+    if (colunas < 0).any():
+        faltantes = sorted(set(df["codigo"][colunas < 0]))
+        print(f"ERRO: Sem histórico de preços para {', '.join(map(str, faltantes))}.")
+        return {"sucesso": False, "curva": None, "posicoes": None, "drawdown_maximo": None}
+    if not df["tipo"].isin(["compra", "venda"]).all():
+        print("ERRO: Tipo de ordem inválido (use 'compra' ou 'venda').")
+        return {"sucesso": False, "curva": None, "posicoes": None, "drawdown_maximo": None}
+
+    dias = datas.searchsorted(df["data"].to_numpy(), side="left")
+    fora = dias >= n_dias
+    if fora.any():
+        print(f"AVISO: {int(fora.sum())} ordem(ns) posterior(es) ao último pregão foram ignoradas.")
+        df, dias, colunas = df[~fora].reset_index(drop=True), dias[~fora], colunas[~fora]
+
+    quantidades = df["quantidade"].to_numpy(dtype=np.int64)
+    precos = df["preco"].to_numpy(dtype=np.float64)
+    qtd_sinal = np.where(df["tipo"].to_numpy() == "compra", quantidades, -quantidades)
+
+    # Ordens agrupadas por ativo e, dentro de cada ativo, em ordem cronológica
+    ordem = np.lexsort((np.arange(len(df)), dias, colunas))
+    col_o, qtd_o, preco_o = colunas[ordem], qtd_sinal[ordem], precos[ordem]
+    inicio_grupo = np.r_[True, col_o[1:] != col_o[:-1]] if len(ordem) else np.zeros(0, dtype=bool)
+    qtd_depois = soma_por_segmento(qtd_o, inicio_grupo)
+    if (qtd_depois < 0).any():
+        i = ordem[int(np.argmax(qtd_depois < 0))]
+        print(f"ERRO: Venda de {df['codigo'][i]} em {df['data'][i].date()} maior que a posição.")
+        return {"sucesso": False, "curva": None, "posicoes": None, "drawdown_maximo": None}
+
+    pm_depois = preco_medio_vetorizado(qtd_o, preco_o, qtd_depois, inicio_grupo, np.zeros(len(ordem)))
+    pm_antes = np.where(inicio_grupo, 0.0, np.r_[0.0, pm_depois[:-1]]) if len(ordem) else pm_depois
+    qtd_antes = qtd_depois - qtd_o
+    lucro_o = np.where(qtd_o < 0, (preco_o - pm_antes) * -qtd_o, 0.0)
+    variacao_custo_o = qtd_depois * pm_depois - qtd_antes * pm_antes
+
+    # Posições: variações lançadas no dia de cada ordem e acumuladas no tempo
+    variacoes = np.zeros((n_dias, n_ativos), dtype=np.int64)
+    np.add.at(variacoes, (dias, colunas), qtd_sinal)
+    posicoes = np.cumsum(variacoes, axis=0)
+
+    dias_o = dias[ordem]
+    caixa = saldo_inicial + np.cumsum(np.bincount(dias, weights=-qtd_sinal * precos, minlength=n_dias))
+    lucro_realizado = np.cumsum(np.bincount(dias_o, weights=lucro_o, minlength=n_dias))
+    custo = np.cumsum(np.bincount(dias_o, weights=variacao_custo_o, minlength=n_dias))
+
+    # Antes do primeiro fechamento conhecido, o ativo é avaliado pelo preço da primeira ordem
+    primeiro_preco = np.full(n_ativos, np.nan)
+    primeiras = np.flatnonzero(inicio_grupo)
+    primeiro_preco[col_o[primeiras]] = preco_o[primeiras]
+    precos_dia = fechamentos.ffill().fillna(pd.Series(primeiro_preco, index=tickers)).to_numpy(dtype=np.float64)
+    valor_mercado = np.where(posicoes != 0, posicoes * precos_dia, 0.0).sum(axis=1)
+
+    patrimonio = caixa + valor_mercado
+    pico = np.maximum.accumulate(patrimonio)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(pico > 0, patrimonio / pico - 1, 0.0)
+
+    curva = pd.DataFrame({
+        "caixa": caixa,
+        "valor_mercado": valor_mercado,
+        "patrimonio": patrimonio,
+        "custo": custo,
+        "lucro_realizado": lucro_realizado,
+        "lucro_nao_realizado": valor_mercado - custo,
+        "drawdown": drawdown,
+    }, index=datas)
+    return {
+        "sucesso": True,
+        "curva": curva,
+        "posicoes": pd.DataFrame(posicoes, index=datas, columns=tickers),
+        "drawdown_maximo": float(drawdown.min()) if n_dias else 0.0,
+    }
@@ -0,0 +1,185 @@
+"""
+Teste de estresse do modo concorrente: várias threads sobre a mesma
+`TabelaHashConcorrente` e o mesmo `PortfolioManager(concorrente=True)`.
+
+Verifica, com semente fixa:
+- tabela: cada instantâneo tirado durante as escritas não tem chaves
+  repetidas, e o conteúdo final é exatamente o esperado;
+- carteira: em todo instantâneo lido durante as ordens, saldo + custo das
+  posições - lucro realizado é igual ao saldo inicial (o dinheiro só muda de
+  lugar), o custo bate com a soma das posições, e ao final a quantidade de
+  cada ativo é a soma das ordens executadas nele.
+
+E mede a vazão com 1, 2, 4 e 8 threads, em uma execução separada e sem o
+leitor de instantâneos. Com o GIL, as threads não rodam código Python em
+paralelo, então mais threads não aumentam a vazão, e ela pode cair. Medido
+(20.000 operações por thread, razão sobre 1 thread):
+- 1 CPU: tabela 1,00x / 0,95x / 1,01x e carteira 1,19x / 1,05x / 1,11x
+  com 2 / 4 / 8 threads;
+- vários núcleos: a tabela caiu para 0,56x com 4 threads e 0,54x com 8
+  (a disputa pelo GIL entre núcleos custa mais que as travas).
+O modo concorrente existe para que várias threads possam usar a mesma
+carteira sem corromper o estado, não para ganhar vazão.
+
+Uso:
+    python benchmarks/concorrencia.py [operacoes_por_thread]
+"""
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+# A carteira importa o pandas sob demanda; importado aqui, ele não pesa na primeira medição
+import pandas
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estruturas_dados import TabelaHashConcorrente
+from portifolio_manager import PortfolioManager
+
+THREADS = (1, 2, 4, 8)
+SALDO_INICIAL = 1e9
+
+
+def rodar_threads(quantidade, alvo, leitor=None):
+    """Roda `alvo(i)` em `quantidade` threads (e `leitor(parar)` ao lado). Retorna o tempo."""
+    parar = threading.Event()
+    threads = [threading.Thread(target=alvo, args=(i,)) for i in range(quantidade)]
+    thread_leitor = threading.Thread(target=leitor, args=(parar,)) if leitor else None
+    if thread_leitor:
+        thread_leitor.start()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tempo = time.perf_counter() - t0
+    parar.set()
+    if thread_leitor:
+        thread_leitor.join()
+    return tempo
+
+
+def estressar_tabela(threads, operacoes, com_leitor):
+    """70% get, 20% put e 10% delete; cada thread escreve só nas suas chaves e lê as de todas."""
+    tabela = TabelaHashConcorrente(tamanho=16)
+    esperado = [{} for _ in range(threads)]
+    falhas = []
+    instantaneos = [0]
+
+    def trabalhar(i):
+        rng = random.Random(i)
+        minhas = esperado[i]
+        for _ in range(operacoes):
+            sorteio = rng.random()
+            chave = (rng.randrange(threads), rng.randrange(2000))
+            if sorteio < 0.7:
+                tabela.get(chave)
+            elif sorteio < 0.9:
+                chave = (i, chave[1])
+                tabela.put(chave, chave[1])
+                minhas[chave] = chave[1]
+            else:
+                chave = (i, chave[1])
+                if tabela.delete(chave) != (chave in minhas):
+                    falhas.append(f"delete de {chave} inconsistente")
+                minhas.pop(chave, None)
+
+    def ler(parar):
+        while not parar.is_set():
+            chaves = [chave for chave, _ in tabela.get_all_items()]
+            if len(chaves) != len(set(chaves)):
+                falhas.append("instantâneo com chaves repetidas")
+            instantaneos[0] += 1
+
+    tempo = rodar_threads(threads, trabalhar, ler if com_leitor else None)
+    final = dict(tabela.items())
+    combinado = {chave: valor for parte in esperado for chave, valor in parte.items()}
+    if final != combinado or len(tabela) != len(combinado):
+        falhas.append("conteúdo final diferente do esperado")
+    return threads * operacoes / tempo, instantaneos[0], falhas
+
+
+def conferir_instantaneo(estado):
+    """Retorna a lista de invariantes violados em um instantâneo da carteira."""
+    posicoes = estado["posicoes"]
+    custo_linhas = float((posicoes["quantidade"] * posicoes["preco_medio"]).sum())
+    problemas = []
+    if not math.isclose(estado["saldo"] + estado["custo"] - estado["lucro_vendas"], SALDO_INICIAL, rel_tol=1e-9):
+        problemas.append("saldo + custo - lucro realizado != saldo inicial")
+    if not math.isclose(estado["custo"], custo_linhas, rel_tol=1e-9, abs_tol=1e-6):
+        problemas.append("custo total != soma das posições")
+    if (posicoes["quantidade"] <= 0).any():
+        problemas.append("posição com quantidade não positiva")
+    return problemas
+
+
+def estressar_carteira(threads, operacoes, com_leitor, ativos=200):
+    """
+    Compras e vendas aleatórias em tickers sorteados (várias threads disputam
+    os mesmos ativos), uma marcação a mercado a cada 100 ordens e uma thread
+    lendo instantâneos o tempo todo.
+    """
+    portfolio = PortfolioManager(saldo_inicial=SALDO_INICIAL, concorrente=True)
+    codigos = [f"CNC{i:03d}.SA" for i in range(ativos)]
+    executadas = [np.zeros(ativos, dtype=np.int64) for _ in range(threads)]
+    falhas = []
+    instantaneos = [0]
+
+    def trabalhar(i):
+        rng = random.Random(1000 + i)
+        for n in range(operacoes):
+            indice = rng.randrange(ativos)
+            codigo, quantidade, preco = codigos[indice], rng.randint(1, 50), round(rng.uniform(5, 100), 2)
+            if rng.random() < 0.6:
+                if portfolio.comprar(codigo, quantidade, preco):
+                    executadas[i][indice] += quantidade
+            elif portfolio.vender(codigo, quantidade, preco):
+                executadas[i][indice] -= quantidade
+            if n % 100 == 99:
+                portfolio.aplicar_cotacoes({c: round(rng.uniform(5, 100), 2) for c in rng.sample(codigos, 20)})
+
+    def ler(parar):
+        while not parar.is_set():
+            for problema in conferir_instantaneo(portfolio.instantaneo()):
+                falhas.append(f"instantâneo: {problema}")
+            instantaneos[0] += 1
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tempo = rodar_threads(threads, trabalhar, ler if com_leitor else None)
+
+    final = portfolio.instantaneo()
+    falhas.extend(f"final: {problema}" for problema in conferir_instantaneo(final))
+    quantidades = final["posicoes"]["quantidade"].reindex(codigos, fill_value=0).to_numpy()
+    if not np.array_equal(quantidades, sum(executadas)):
+        falhas.append("final: quantidades diferentes da soma das ordens executadas")
+    return threads * operacoes / tempo, instantaneos[0], falhas
+
+
+def main(operacoes):
+    print(f"{os.cpu_count()} CPU(s), {operacoes:,} operações por thread")
+    todas_as_falhas = []
+    for nome, estressar in (("tabela", estressar_tabela), ("carteira", estressar_carteira)):
+        base = None
+        for threads in THREADS:
+            taxa, _, falhas = estressar(threads, operacoes, com_leitor=False)
+            _, instantaneos, falhas_com_leitor = estressar(threads, operacoes, com_leitor=True)
+            falhas += falhas_com_leitor
+            base = base or taxa
+            todas_as_falhas.extend(f"{nome}, {threads} thread(s): {falha}" for falha in falhas[:5])
+            print(f"{nome:<9} {threads} thread(s): {taxa:>12,.0f} op/s ({taxa / base:.2f}x), "
+                  f"{instantaneos:,} instantâneos conferidos, {'OK' if not falhas else f'{len(falhas)} FALHA(S)'}")
+
+    for falha in todas_as_falhas:
+        print(f"ERRO: {falha}")
+    print(f"invariantes: {'OK' if not todas_as_falhas else 'VIOLADOS'}")
+    return 0 if not todas_as_falhas else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000))
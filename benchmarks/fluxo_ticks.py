@@ -0,0 +1,116 @@
+"""
+Vazão da ingestão de ticks (fluxo_cotacoes.IngestorCotacoes) até a
+marcação a mercado da carteira.
+
+Meta: pelo menos 100 mil ticks/s reproduzidos localmente, com a carteira
+consistente ao final (o preço de cada ativo é o do seu último tick e os
+totais batem com a soma das posições). Os ticks são sintéticos, gerados com
+semente fixa, e reproduzidos de três fontes: blocos em memória, um CSV e
+um socket Unix.
+
+Uso:
+    python benchmarks/fluxo_ticks.py [quantidade_ticks]
+"""
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fluxo_cotacoes import IngestorCotacoes, ticks_de_arquivo, ticks_de_socket
+from portifolio_manager import PortfolioManager
+
+META_TICKS_POR_SEGUNDO = 100_000
+
+
+def gerar_ticks(quantidade, ativos=2000, semente=42):
+    """Ticks de 10% a mais de tickers que os da carteira, para incluir ativos fora dela."""
+    rng = np.random.default_rng(semente)
+    codigos = np.array([f"TCK{i:04d}.SA" for i in range(int(ativos * 1.1))])
+    return pd.DataFrame({"codigo": codigos[rng.integers(0, len(codigos), quantidade)],
+                         "preco": rng.uniform(5, 100, quantidade).round(2)})
+
+
+def montar_carteira(ativos=2000):
+    portfolio = PortfolioManager(saldo_inicial=1e12)
+    portfolio.executar_lote([(f"TCK{i:04d}.SA", "compra", 100, 10.0) for i in range(ativos)])
+    return portfolio
+
+
+def blocos_em_memoria(ticks, tamanho_bloco=10_000):
+    codigos, precos = ticks["codigo"].tolist(), ticks["preco"].tolist()
+    for i in range(0, len(codigos), tamanho_bloco):
+        yield codigos[i:i + tamanho_bloco], precos[i:i + tamanho_bloco]
+
+
+def servir_socket(caminho, ticks, pronto):
+    """Publica os ticks no socket Unix, uma linha "CODIGO,PRECO" por tick."""
+    linhas = (ticks["codigo"] + "," + ticks["preco"].astype(str) + "\n").str.cat().encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as servidor:
+        servidor.bind(caminho)
+        servidor.listen(1)
+        pronto.set()
+        conexao, _ = servidor.accept()
+        with conexao:
+            conexao.sendall(linhas)
+
+
+def conferir(portfolio, ticks):
+    """Confere preços e totais da carteira depois da ingestão."""
+    ultimos = ticks.groupby("codigo")["preco"].last()
+    codigos = portfolio.ativos.codigos()
+    esperado = ultimos.reindex(codigos).to_numpy()
+    atual = portfolio.ativos.preco_atual[:len(codigos)]
+    precos_ok = np.array_equal(np.where(np.isnan(esperado), atual, esperado), atual)
+    totais = portfolio.totais()
+    totais_ok = math.isclose(totais["valor_mercado"], float(portfolio.ativos.valores_de_mercado().sum()), rel_tol=1e-9)
+    return precos_ok and totais_ok
+
+
+def medir(nome, fonte, ticks, ativos):
+    portfolio = montar_carteira(ativos)
+    t0 = time.perf_counter()
+    # Só a marcação dos preços: semear os indicadores ao vivo buscaria o histórico de cada ativo
+    estatisticas = IngestorCotacoes(portfolio, fonte, indicadores=False).iniciar().aguardar()
+    tempo = time.perf_counter() - t0
+    taxa = estatisticas["recebidos"] / tempo
+    consistente = conferir(portfolio, ticks)
+    print(f"{nome:<10} {estatisticas['recebidos']:>10,} ticks em {tempo:.3f} s ({taxa:,.0f} ticks/s), "
+          f"{estatisticas['lotes']} lotes, {estatisticas['coalescidos']:,} coalescidos, "
+          f"carteira {'consistente' if consistente else 'INCONSISTENTE'}")
+    return taxa, consistente
+
+
+def main(quantidade):
+    ativos = 2000
+    ticks = gerar_ticks(quantidade, ativos)
+    resultados = [medir("memória", blocos_em_memoria(ticks), ticks, ativos)]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_csv = os.path.join(pasta, "ticks.csv")
+        ticks.to_csv(caminho_csv, index=False)
+        resultados.append(medir("CSV", ticks_de_arquivo(caminho_csv), ticks, ativos))
+
+        if hasattr(socket, "AF_UNIX"):
+            caminho_socket = os.path.join(pasta, "ticks.sock")
+            pronto = threading.Event()
+            servidor = threading.Thread(target=servir_socket, args=(caminho_socket, ticks, pronto), daemon=True)
+            servidor.start()
+            pronto.wait()
+            resultados.append(medir("socket", ticks_de_socket(caminho_socket), ticks, ativos))
+            servidor.join()
+
+    atingida = all(taxa >= META_TICKS_POR_SEGUNDO and consistente for taxa, consistente in resultados)
+    print(f"meta ({META_TICKS_POR_SEGUNDO:,} ticks/s): {'OK' if atingida else 'NÃO ATINGIDA'}")
+    return 0 if atingida else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,65 @@
+"""
+Vazão de PortfolioManager.executar_lote comparada a comprar/vender em laço.
+
+Meta: um lote de 100 mil ordens sobre 2 mil ativos deve ser validado e
+aplicado em menos de 1 segundo. Os dados são sintéticos e gerados com semente
+fixa; nenhuma chamada de rede é feita.
+
+Uso:
+    python benchmarks/lote_ordens.py [quantidade_ordens]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portifolio_manager import PortfolioManager
+
+META_SEGUNDOS = 1.0
+
+
+def gerar_ordens(quantidade, ativos=2000, semente=42):
+    """Metade compras e metade vendas, com cada venda coberta por uma compra anterior."""
+    rng = np.random.default_rng(semente)
+    metade = quantidade // 2
+    codigos = np.array([f"TCK{i:04d}.SA" for i in rng.integers(0, ativos, metade)])
+    qtds = rng.integers(1, 100, metade)
+    compras = pd.DataFrame({"codigo": codigos, "tipo": "compra", "quantidade": qtds,
+                            "preco": rng.uniform(5, 100, metade).round(2)})
+    vendas_idx = rng.permutation(metade)
+    vendas = pd.DataFrame({"codigo": codigos[vendas_idx], "tipo": "venda", "quantidade": qtds[vendas_idx],
+                           "preco": rng.uniform(5, 100, metade).round(2)})
+    return pd.concat([compras, vendas], ignore_index=True)
+
+
+def main(quantidade):
+    ordens = gerar_ordens(quantidade)
+
+    portfolio = PortfolioManager(saldo_inicial=1e12)
+    t0 = time.perf_counter()
+    resultado = portfolio.executar_lote(ordens)
+    tempo_lote = time.perf_counter() - t0
+    assert resultado["sucesso"], resultado["ordens"].query("status == 'rejeitada'")
+
+    referencia = PortfolioManager(saldo_inicial=1e12)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for codigo, tipo, qtd, preco in ordens.itertuples(index=False):
+            (referencia.comprar if tipo == "compra" else referencia.vender)(codigo, int(qtd), preco)
+    tempo_laco = time.perf_counter() - t0
+
+    print(f"ordens: {quantidade}")
+    print(f"executar_lote: {tempo_lote:.3f} s ({quantidade / tempo_lote:,.0f} ordens/s)")
+    print(f"comprar/vender em laço: {tempo_laco:.3f} s ({quantidade / tempo_laco:,.0f} ordens/s)")
+    print(f"diferença de saldo: {abs(portfolio.saldo - referencia.saldo):.6f}")
+    print(f"meta ({META_SEGUNDOS:.1f} s): {'OK' if tempo_lote < META_SEGUNDOS else 'NÃO ATINGIDA'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,94 @@
+"""
+Marcação a mercado de muitas contas (RegistroPortfolios.reavaliar_todos).
+
+Compara, com as mesmas cotações já obtidas:
+- uma conta por vez: `aplicar_cotacoes` em cada carteira, em sequência;
+- pool de threads: o mesmo, em blocos de carteiras por thread (como
+  `reavaliar_todos` fazia antes);
+- empilhado: `PortfolioManager.aplicar_cotacoes_em_varios`, uma única
+  passada vetorizada sobre as linhas de todas as contas.
+
+Confere também que os três deixam as carteiras no mesmo estado.
+
+Uso:
+    python benchmarks/reavaliacao.py [contas] [ativos_por_conta]
+"""
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portifolio_manager import PortfolioManager
+from provedores_dados import ProvedorLocal
+
+SEMENTE = 42
+UNIVERSO = 500
+REPETICOES = 5
+
+
+def criar_contas(contas, ativos_por_conta):
+    rng = np.random.default_rng(SEMENTE)
+    universo = [f"RVL{i:03d}.SA" for i in range(UNIVERSO)]
+    provedor = ProvedorLocal(semente=SEMENTE)
+    carteiras = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(contas):
+            portfolio = PortfolioManager(saldo_inicial=1e9, provedor=provedor)
+            for indice in rng.choice(UNIVERSO, ativos_por_conta, replace=False).tolist():
+                portfolio.comprar(universo[indice], int(rng.integers(1, 100)), float(rng.uniform(5, 100)))
+            carteiras.append(portfolio)
+    cotacoes = [dict(zip(universo, rng.uniform(5, 100, UNIVERSO).tolist())) for _ in range(REPETICOES)]
+    return carteiras, cotacoes
+
+
+def uma_por_vez(carteiras, cotacoes):
+    for portfolio in carteiras:
+        portfolio.aplicar_cotacoes(cotacoes)
+
+
+def pool_de_threads(carteiras, cotacoes):
+    trabalhadores = os.cpu_count() or 4
+    tamanho = max(1, math.ceil(len(carteiras) / trabalhadores))
+    blocos = [carteiras[i:i + tamanho] for i in range(0, len(carteiras), tamanho)]
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        list(executor.map(lambda bloco: uma_por_vez(bloco, cotacoes), blocos))
+
+
+def empilhado(carteiras, cotacoes):
+    PortfolioManager.aplicar_cotacoes_em_varios(carteiras, cotacoes)
+
+
+def estado(carteiras):
+    return np.concatenate([np.concatenate([p.ativos.valor_total[:p.ativos.n], p.ativos.lucro_prejuizo[:p.ativos.n],
+                                           [p.ativos.valor_total_carteira()]]) for p in carteiras])
+
+
+def main(contas, ativos_por_conta):
+    carteiras, cotacoes = criar_contas(contas, ativos_por_conta)
+    print(f"{os.cpu_count()} CPU(s), {contas:,} contas x {ativos_por_conta} ativos")
+    tempos, estados = {}, {}
+    for nome, marcar in (("uma por vez", uma_por_vez), ("pool de threads", pool_de_threads),
+                         ("empilhado", empilhado)):
+        melhor = math.inf
+        for precos in cotacoes:
+            t0 = time.perf_counter()
+            marcar(carteiras, precos)
+            melhor = min(melhor, time.perf_counter() - t0)
+        tempos[nome], estados[nome] = melhor, estado(carteiras)
+        print(f"{nome:<16} {melhor * 1000:>9.1f} ms ({tempos['uma por vez'] / melhor:.1f}x)")
+
+    iguais = all(np.allclose(estados[nome], estados["uma por vez"], rtol=1e-12, equal_nan=True) for nome in estados)
+    print(f"estados finais {'iguais' if iguais else 'DIFERENTES'}")
+    return 0 if iguais else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 10))
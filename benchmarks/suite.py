@@ -0,0 +1,334 @@
+"""
+Suíte de benchmarks dos caminhos críticos do projeto.
+
+Cobre as tabelas hash (put/get/delete em vários tamanhos e com colisões),
+comprar/vender, atualizar_precos, get_distribuicao_por_ativo e os três
+indicadores de FerramentasDeAnalise. Todos os dados são sintéticos, gerados
+com semente fixa pelo ProvedorLocal; nenhuma chamada de rede é feita.
+
+Cada caso é aquecido e medido `--repeticoes` vezes, em rodadas que passam
+por todos os casos, com o coletor de lixo desligado; cada medida repete o
+caso até durar pelo menos `TEMPO_MINIMO` segundos, para que casos rápidos
+não fiquem à mercê da resolução do relógio. O melhor tempo, as medidas e o
+ruído (distância relativa entre a mediana e o melhor tempo) são guardados
+em JSON. Com `--comparar`, os resultados são comparados a uma execução
+anterior e os casos mais lentos que o limite são marcados como regressão
+(o processo termina com código 1). O limite de cada caso é o maior entre
+`--tolerancia` e FATOR_RUIDO vezes o ruído medido nas duas execuções: em
+uma máquina instável o limite se alarga, em vez de acusar regressões
+falsas.
+
+Uso:
+    python benchmarks/suite.py [--saida resultados.json] [--comparar base.json]
+                               [--tolerancia 0.2] [--filtro hash] [--repeticoes 7]
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estruturas_dados import TabelaHashEncadeada, TabelaHashAberta
+from portifolio_manager import PortfolioManager, FerramentasDeAnalise
+from provedores_dados import ProvedorLocal
+
+SEMENTE = 42
+# Data fixa: o ProvedorLocal gera as mesmas séries em qualquer dia de execução
+DATA_FINAL = "2025-01-31"
+# Duração mínima, em segundos, de cada medida de um caso
+TEMPO_MINIMO = 0.05
+# Quantas vezes o ruído medido entra na tolerância de cada caso
+FATOR_RUIDO = 3
+CASOS = {}
+
+
+def caso(nome):
+    """Registra uma função que prepara o caso e devolve (função medida, operações por chamada)."""
+    def registrar(funcao):
+        CASOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+class ChaveColidente:
+    """Chave cujo hash se repete a cada `grupos` chaves, para forçar colisões."""
+    __slots__ = ("valor", "_hash")
+
+    def __init__(self, valor, grupos):
+        self.valor = valor
+        self._hash = valor % grupos
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, outra):
+        return isinstance(outra, ChaveColidente) and self.valor == outra.valor
+
+
+def _chaves(quantidade):
+    return [f"TCK{i:06d}.SA" for i in range(quantidade)]
+
+
+def _provedor():
+    return ProvedorLocal(semente=SEMENTE, data_final=DATA_FINAL)
+
+
+def _silencioso(funcao):
+    """Executa `funcao` descartando os prints de SUCESSO/ERRO."""
+    def executar():
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcao()
+    return executar
+
+
+def _preparar_tabela(tipo_tabela, chaves, operacao):
+    if operacao == "put":
+        def executar():
+            tabela = tipo_tabela()
+            for i, chave in enumerate(chaves):
+                tabela.put(chave, i)
+        return executar, len(chaves)
+
+    if operacao == "get":
+        cheia = tipo_tabela()
+        for i, chave in enumerate(chaves):
+            cheia.put(chave, i)
+
+        def executar():
+            for chave in chaves:
+                cheia.get(chave)
+        return executar, len(chaves)
+
+    def executar():
+        tabela = tipo_tabela()
+        for i, chave in enumerate(chaves):
+            tabela.put(chave, i)
+        for chave in chaves:
+            tabela.delete(chave)
+    return executar, 2 * len(chaves)
+
+
+def _registrar_casos_tabela():
+    for tipo_tabela, nome_tipo in ((TabelaHashEncadeada, "encadeada"), (TabelaHashAberta, "aberta")):
+        variantes = [(f"{n}", lambda n=n: _chaves(n)) for n in (1_000, 10_000, 100_000)]
+        # 2 mil chaves espalhadas em apenas 64 valores de hash
+        variantes.append(("2000-colisoes", lambda: [ChaveColidente(i, 64) for i in range(2_000)]))
+        for rotulo, gerar_chaves in variantes:
+            for operacao in ("put", "get", "put+delete"):
+                CASOS[f"hash/{nome_tipo}/{rotulo}/{operacao}"] = (
+                    lambda t=tipo_tabela, g=gerar_chaves, o=operacao: _preparar_tabela(t, g(), o))
+
+
+_registrar_casos_tabela()
+
+
+def _carteira(ativos, provedor=None):
+    portfolio = PortfolioManager(saldo_inicial=1e12, provedor=provedor or _provedor())
+    rng = np.random.default_rng(SEMENTE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for codigo in _chaves(ativos):
+            portfolio.comprar(codigo, int(rng.integers(1, 100)), float(rng.uniform(5, 100)))
+    return portfolio
+
+
+@caso("ordens/comprar+vender")
+def _comprar_vender():
+    quantidade = 10_000
+    rng = np.random.default_rng(SEMENTE)
+    codigos = [f"TCK{i:04d}.SA" for i in rng.integers(0, 200, quantidade)]
+    qtds = rng.integers(1, 100, quantidade).tolist()
+    precos = rng.uniform(5, 100, quantidade).tolist()
+
+    def executar():
+        portfolio = PortfolioManager(saldo_inicial=1e12, provedor=_provedor())
+        for codigo, qtd, preco in zip(codigos, qtds, precos):
+            portfolio.comprar(codigo, qtd, preco)
+        for codigo, qtd, preco in zip(codigos, qtds, precos):
+            portfolio.vender(codigo, qtd, preco)
+    return _silencioso(executar), 2 * quantidade
+
+
+class _ProvedorCotacoesFixas(ProvedorLocal):
+    """Devolve cotações pré-calculadas, para medir só a marcação a mercado."""
+    def __init__(self, cotacoes):
+        super().__init__(semente=SEMENTE, data_final=DATA_FINAL)
+        self._cotacoes = cotacoes
+
+    def cotacoes(self, codigos):
+        return {codigo: self._cotacoes.get(codigo, np.nan) for codigo in codigos}
+
+
+@caso("carteira/atualizar_precos")
+def _atualizar_precos():
+    ativos = 2_000
+    rng = np.random.default_rng(SEMENTE)
+    cotacoes = dict(zip(_chaves(ativos), rng.uniform(5, 100, ativos).tolist()))
+    portfolio = _carteira(ativos, _ProvedorCotacoesFixas(cotacoes))
+    return _silencioso(portfolio.atualizar_precos), ativos
+
+
+@caso("carteira/get_distribuicao_por_ativo")
+def _distribuicao():
+    ativos = 2_000
+    portfolio = _carteira(ativos)
+    return portfolio.get_distribuicao_por_ativo, ativos
+
+
+def _analisador_aquecido(codigos):
+    analisador = FerramentasDeAnalise(provedor=_provedor())
+    # Preenche o cache para medir apenas o cálculo dos indicadores
+    for codigo in list(codigos) + ["^BVSP"]:
+        analisador._get_dados_historicos(codigo, periodo="1y")
+        analisador._get_dados_historicos(codigo, periodo="2y")
+    return analisador
+
+
+def _caso_indicador(nome_metodo):
+    codigos = _chaves(50)
+    analisador = _analisador_aquecido(codigos)
+    metodo = getattr(analisador, nome_metodo)
+
+    def executar():
+        for codigo in codigos:
+            metodo(codigo)
+    return executar, len(codigos)
+
+
+CASOS["analise/calcular_volatilidade"] = lambda: _caso_indicador("calcular_volatilidade")
+CASOS["analise/calcular_rsi"] = lambda: _caso_indicador("calcular_rsi")
+CASOS["analise/calcular_beta"] = lambda: _caso_indicador("calcular_beta")
+
+
+@caso("analise/calcular_indicadores")
+def _indicadores_vetorizados():
+    codigos = _chaves(50)
+    analisador = _analisador_aquecido(codigos)
+    return (lambda: analisador.calcular_indicadores(codigos)), len(codigos)
+
+
+def preparar(nome):
+    """Monta o caso, aquece e calibra quantas chamadas cabem em uma medida."""
+    funcao, operacoes = CASOS[nome]()
+    t0 = time.perf_counter()
+    funcao()
+    chamadas = max(1, int(TEMPO_MINIMO / max(time.perf_counter() - t0, 1e-9)))
+    return funcao, operacoes, chamadas
+
+
+def medir(funcao, chamadas):
+    """Tempo médio de uma chamada de `funcao`, em segundos, com o coletor de lixo desligado."""
+    gc_ligado = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        return (time.perf_counter() - t0) / chamadas
+    finally:
+        if gc_ligado:
+            gc.enable()
+
+
+def executar(filtro=None, repeticoes=7):
+    """
+    Mede os casos em rodadas: cada rodada mede uma vez cada caso. Assim as
+    medidas de um caso ficam espalhadas pela execução inteira, e um período
+    lento da máquina (outro processo, frequência da CPU) atinge uma rodada
+    de todos os casos, em vez de todas as medidas de alguns.
+    """
+    casos = {nome: preparar(nome) for nome in CASOS if not filtro or filtro in nome}
+    tempos = {nome: [] for nome in casos}
+    for _ in range(repeticoes):
+        for nome, (funcao, _, chamadas) in casos.items():
+            tempos[nome].append(medir(funcao, chamadas))
+    resultados = {}
+    for nome, (_, operacoes, chamadas) in casos.items():
+        melhor = min(tempos[nome])
+        mediana = float(np.median(tempos[nome]))
+        resultados[nome] = {
+            "operacoes": operacoes,
+            "chamadas_por_medida": chamadas,
+            "melhor_s": melhor,
+            "mediana_s": mediana,
+            "ruido": mediana / melhor - 1,
+            "us_por_operacao": melhor / operacoes * 1e6,
+            "tempos_s": tempos[nome],
+        }
+        print(f"{nome:<48}{resultados[nome]['us_por_operacao']:>12.3f} us/op")
+    return {
+        "ambiente": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "semente": SEMENTE,
+            "repeticoes": repeticoes,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(atual, base, tolerancia):
+    """
+    Imprime a variação de cada caso e devolve a lista de regressões. O
+    limite de cada caso é a maior entre `tolerancia` e FATOR_RUIDO vezes o
+    ruído medido na base ou na execução atual.
+    """
+    regressoes = []
+    print(f"\n{'caso':<48}{'base':>12}{'atual':>12}{'variação':>10}{'limite':>9}")
+    for nome, resultado in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if anterior is None:
+            print(f"{nome:<48}{'-':>12}{resultado['us_por_operacao']:>12.3f}{'novo':>10}")
+            continue
+        razao = resultado["us_por_operacao"] / anterior["us_por_operacao"]
+        # Resultados gravados antes de o ruído ser medido contam como sem ruído
+        ruido = max(resultado.get("ruido", 0.0), anterior.get("ruido", 0.0))
+        limite = max(tolerancia, FATOR_RUIDO * ruido)
+        marca = ""
+        if razao > 1 + limite:
+            regressoes.append(nome)
+            marca = "  REGRESSÃO"
+        print(f"{nome:<48}{anterior['us_por_operacao']:>12.3f}{resultado['us_por_operacao']:>12.3f}"
+              f"{(razao - 1) * 100:>+9.1f}%{limite * 100:>8.0f}%{marca}")
+    return regressoes
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos do portfólio.")
+    parser.add_argument("--saida", help="arquivo JSON para gravar os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior, usado como base")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo de tempo aceito antes de acusar regressão, no mínimo (padrão 0.2)")
+    parser.add_argument("--filtro", help="executa apenas os casos cujo nome contém o texto")
+    parser.add_argument("--repeticoes", type=int, default=7)
+    opcoes = parser.parse_args(argumentos)
+
+    atual = executar(opcoes.filtro, opcoes.repeticoes)
+    if opcoes.saida:
+        with open(opcoes.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(atual, base, opcoes.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima do limite.")
+            return 1
+        print("\nNenhuma regressão.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
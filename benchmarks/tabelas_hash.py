@@ -0,0 +1,73 @@
+"""
+Comparativo entre TabelaHashEncadeada e TabelaHashAberta.
+
+Mede a memória por entrada (via tracemalloc) e o tempo de put/get/delete
+para diferentes quantidades de chaves, sem acesso à rede.
+
+Uso:
+    python benchmarks/tabelas_hash.py [quantidade ...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estruturas_dados import TabelaHashEncadeada, TabelaHashAberta
+
+
+def _gerar_chaves(quantidade):
+    return [f"TCK{i:05d}.SA" for i in range(quantidade)]
+
+
+def medir_memoria(tipo_tabela, chaves):
+    """Bytes alocados pela estrutura (chaves e valores são pré-alocados)."""
+    valores = list(range(len(chaves)))
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    tabela = tipo_tabela()
+    for chave, valor in zip(chaves, valores):
+        tabela.put(chave, valor)
+    fim, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return fim - inicio
+
+
+def medir_tempos(tipo_tabela, chaves, repeticoes=3):
+    """Melhor tempo (em segundos) de cada operação sobre todas as chaves."""
+    melhores = {"put": float("inf"), "get": float("inf"), "delete": float("inf")}
+    for _ in range(repeticoes):
+        tabela = tipo_tabela()
+        t0 = time.perf_counter()
+        for i, chave in enumerate(chaves):
+            tabela.put(chave, i)
+        t1 = time.perf_counter()
+        for chave in chaves:
+            tabela.get(chave)
+        t2 = time.perf_counter()
+        for chave in chaves:
+            tabela.delete(chave)
+        t3 = time.perf_counter()
+        melhores["put"] = min(melhores["put"], t1 - t0)
+        melhores["get"] = min(melhores["get"], t2 - t1)
+        melhores["delete"] = min(melhores["delete"], t3 - t2)
+    return melhores
+
+
+def main(quantidades):
+    tipos = [TabelaHashEncadeada, TabelaHashAberta]
+    print(f"{'tabela':<22}{'n':>8}{'bytes/entrada':>15}{'put (us)':>10}{'get (us)':>10}{'delete (us)':>13}")
+    for n in quantidades:
+        chaves = _gerar_chaves(n)
+        for tipo in tipos:
+            memoria = medir_memoria(tipo, chaves)
+            tempos = medir_tempos(tipo, chaves)
+            print(f"{tipo.__name__:<22}{n:>8}{memoria / n:>15.1f}"
+                  f"{tempos['put'] / n * 1e6:>10.3f}{tempos['get'] / n * 1e6:>10.3f}"
+                  f"{tempos['delete'] / n * 1e6:>13.3f}")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:]]
+    main(argumentos or [1_000, 10_000, 100_000])
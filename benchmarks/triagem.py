@@ -0,0 +1,59 @@
+"""
+Tempo da triagem (triagem.Triagem) de um universo de tickers sintéticos.
+
+Meta: 1.000 tickers em poucos segundos com o histórico local já em disco
+("quente"), com o resultado igual ao de `calcular_indicadores` sobre o
+universo inteiro. A primeira passada ("fria") grava o histórico em uma pasta
+temporária; as seguintes usam um analisador novo, como depois de um
+reinício, e leem só do disco.
+
+Uso:
+    python benchmarks/triagem.py [quantidade_tickers] [processos]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portifolio_manager import FerramentasDeAnalise
+from provedores_dados import ProvedorLocal
+from triagem import Triagem
+
+META_SEGUNDOS_QUENTE = 10.0
+
+
+def medir(nome, analisador, codigos, processos):
+    triagem = Triagem(analisador, processos=processos)
+    t0 = time.perf_counter()
+    resultado = triagem.executar(codigos, criterios={"rsi": (None, 50)}, ordenar_por="volatilidade", ascendente=False)
+    tempo = time.perf_counter() - t0
+    print(f"{nome:<6} {len(codigos):>6,} tickers em {tempo:.2f} s ({processos} processo(s)), "
+          f"{len(resultado)} aprovados")
+    return tempo
+
+
+def main(quantidade, processos):
+    provedor = ProvedorLocal(semente=7)
+    codigos = [f"TRG{i:04d}.SA" for i in range(quantidade)]
+    with tempfile.TemporaryDirectory() as pasta:
+        medir("fria", FerramentasDeAnalise(provedor=provedor, diretorio_historico=pasta), codigos, 1)
+        tempo = medir("quente", FerramentasDeAnalise(provedor=provedor, diretorio_historico=pasta), codigos, processos)
+
+        referencia = FerramentasDeAnalise(provedor=provedor, diretorio_historico=pasta).calcular_indicadores(codigos)
+        calculado = Triagem(FerramentasDeAnalise(provedor=provedor, diretorio_historico=pasta),
+                            processos=processos).calcular(codigos)
+        consistente = np.allclose(calculado.loc[referencia.index].to_numpy(), referencia.to_numpy(), equal_nan=True)
+
+    print(f"resultado {'igual' if consistente else 'DIFERENTE'} ao de calcular_indicadores")
+    atingida = tempo <= META_SEGUNDOS_QUENTE and consistente
+    print(f"meta (quente em até {META_SEGUNDOS_QUENTE:.0f} s): {'OK' if atingida else 'NÃO ATINGIDA'}")
+    return 0 if atingida else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)))
@@ -0,0 +1,194 @@
+import threading
+import time
+
+from estruturas_dados import TabelaHashEncadeada
+from metricas import METRICAS
+
+
+class _NoLRU:
+    """Nó da lista duplamente encadeada que mantém a ordem de uso do cache."""
+    __slots__ = ("chave", "valor", "tamanho", "expira_em", "anterior", "proximo")
+
+    def __init__(self, chave=None, valor=None, tamanho=0, expira_em=0.0):
+        self.chave = chave
+        self.valor = valor
+        self.tamanho = tamanho
+        self.expira_em = expira_em
+        self.anterior = None
+        self.proximo = None
+
+
+class _Voo:
+    """Carga em andamento de uma chave, compartilhada pelas threads que a aguardam."""
+    __slots__ = ("evento", "valor", "erro")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+def tamanho_em_bytes(valor):
+    """Estimativa do tamanho de um DataFrame (ou de qualquer objeto com memory_usage)."""
+    if hasattr(valor, "memory_usage"):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum()) if hasattr(uso, "sum") else int(uso)
+    return 0
+
+
+class CacheHistorico:
+    """
+    Cache limitado para os históricos de preços.
+
+    A tabela hash indexa os nós de uma lista duplamente encadeada ordenada do
+    mais recente para o menos recente (LRU). Cada entrada expira após `ttl`
+    segundos, e as menos usadas são descartadas sempre que a soma dos tamanhos
+    ultrapassa `limite_bytes`. Se várias threads pedirem a mesma chave ausente
+    ao mesmo tempo, apenas uma executa a carga (single-flight) e as demais
+    aguardam o resultado. Os contadores de acertos, faltas, expirações e
+    despejos ficam disponíveis em `estatisticas()`.
+    """
+    def __init__(self, limite_bytes=256 * 1024 * 1024, ttl=3600.0, tipo_tabela=TabelaHashEncadeada,
+                 medir_tamanho=tamanho_em_bytes, relogio=time.monotonic):
+        self.limite_bytes = limite_bytes
+        self.ttl = ttl
+        self.medir_tamanho = medir_tamanho
+        self.relogio = relogio
+        self._indice = tipo_tabela()
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        # Sentinela: _cabeca.proximo é o mais recente, _cabeca.anterior o menos recente
+        self._cabeca = _NoLRU()
+        self._cabeca.anterior = self._cabeca.proximo = self._cabeca
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.expirados = 0
+        self.despejos = 0
+
+    def __len__(self):
+        return len(self._indice)
+
+    def _desligar(self, no):
+        no.anterior.proximo = no.proximo
+        no.proximo.anterior = no.anterior
+
+    def _inserir_no_inicio(self, no):
+        no.anterior = self._cabeca
+        no.proximo = self._cabeca.proximo
+        self._cabeca.proximo.anterior = no
+        self._cabeca.proximo = no
+
+    def _remover(self, no):
+        self._desligar(no)
+        self._indice.delete(no.chave)
+        self.bytes_usados -= no.tamanho
+
+    def _buscar(self, chave):
+        """Retorna o valor e atualiza a ordem LRU. Deve ser chamado com a trava."""
+        no = self._indice.get(chave)
+        if no is None:
+            return None
+        if self.relogio() >= no.expira_em:
+            self._remover(no)
+            self.expirados += 1
+            return None
+        self._desligar(no)
+        self._inserir_no_inicio(no)
+        return no.valor
+
+    def _guardar(self, chave, valor):
+        """Insere a entrada e despeja as menos recentes até caber no limite."""
+        antigo = self._indice.get(chave)
+        if antigo is not None:
+            self._remover(antigo)
+        tamanho = self.medir_tamanho(valor)
+        if tamanho > self.limite_bytes:
+            return
+        no = _NoLRU(chave, valor, tamanho, self.relogio() + self.ttl)
+        self._indice.put(chave, no)
+        self._inserir_no_inicio(no)
+        self.bytes_usados += tamanho
+        while self.bytes_usados > self.limite_bytes:
+            self._remover(self._cabeca.anterior)
+            self.despejos += 1
+
+    def get(self, chave):
+        with self._trava:
+            valor = self._buscar(chave)
+            if valor is None:
+                self.faltas += 1
+            else:
+                self.acertos += 1
+        METRICAS.contar("cache_consultas", cache="historico", resultado="falta" if valor is None else "acerto")
+        return valor
+
+    def put(self, chave, valor):
+        with self._trava:
+            self._guardar(chave, valor)
+
+    def delete(self, chave):
+        with self._trava:
+            no = self._indice.get(chave)
+            if no is None:
+                return False
+            self._remover(no)
+            return True
+
+    def obter(self, chave, carregar):
+        """
+        Retorna o valor da chave, chamando `carregar()` em caso de falta.
+        Cargas simultâneas da mesma chave são feitas uma única vez. Se a carga
+        retornar None, nada é guardado; exceções são repassadas a todas as
+        threads que aguardavam.
+        """
+        with self._trava:
+            valor = self._buscar(chave)
+            if valor is not None:
+                self.acertos += 1
+                METRICAS.contar("cache_consultas", cache="historico", resultado="acerto")
+                return valor
+            self.faltas += 1
+            METRICAS.contar("cache_consultas", cache="historico", resultado="falta")
+            voo = self._em_andamento.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_andamento[chave] = _Voo()
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.valor
+
+        try:
+            voo.valor = carregar()
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._trava:
+                if voo.erro is None and voo.valor is not None:
+                    self._guardar(chave, voo.valor)
+                del self._em_andamento[chave]
+            voo.evento.set()
+        return voo.valor
+
+    def limpar(self):
+        with self._trava:
+            while self._cabeca.proximo is not self._cabeca:
+                self._remover(self._cabeca.proximo)
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.faltas
+            return {
+                "entradas": len(self._indice),
+                "bytes_usados": self.bytes_usados,
+                "limite_bytes": self.limite_bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "expirados": self.expirados,
+                "despejos": self.despejos,
+            }
@@ -0,0 +1,64 @@
+"""
+Cálculos vetorizados compartilhados pela carteira (`PortfolioManager.executar_lote`)
+e pelo backtest (`backtest.simular_historico`).
+"""
+from importacao_tardia import np, pd
+
+
+def fechamentos_diarios(dados):
+    """Série de fechamentos indexada por data (sem fuso), para alinhar ativo e índice."""
+    fechamentos = dados['Close']
+    indice = fechamentos.index.tz_localize(None) if fechamentos.index.tz is not None else fechamentos.index
+    return pd.Series(fechamentos.to_numpy(), index=indice.normalize())
+
+
+def soma_por_segmento(valores, inicio_segmento):
+    """Soma acumulada que reinicia em cada posição marcada em `inicio_segmento`."""
+    # Acumula cada segmento separadamente: subtrair de uma soma global perderia
+    # precisão quando segmentos anteriores acumulam valores muito maiores
+    segmentos = np.cumsum(inicio_segmento)
+    return pd.Series(valores).groupby(segmentos).cumsum().to_numpy()
+
+
+def preco_medio_vetorizado(qtd_sinal, precos, qtd_depois, inicio_grupo, pm_inicial):
+    """
+    Preço médio após cada ordem, com as ordens já agrupadas por ativo.
+
+    O custo da posição é resolvido em vez do preço médio: uma compra soma
+    q * p ao custo e uma venda parcial o multiplica pela fração de ações
+    mantida, f = Q_depois / Q_antes (o preço médio não muda). Com F o
+    produto acumulado das frações, custo = F * (custo_inicial + soma(q * p / F)),
+    e todas as parcelas são positivas, sem cancelamento. O preço médio é
+    custo / Q nas compras e se repete nas vendas. Uma compra sobre posição
+    zerada reinicia o segmento (custo inicial zero).
+    """
+    qtd_antes = qtd_depois - qtd_sinal
+    compra = qtd_sinal > 0
+    reinicio = compra & (qtd_antes == 0)
+    inicio_segmento = inicio_grupo | reinicio
+    indices = np.arange(len(qtd_sinal))
+    inicio = np.maximum.accumulate(np.where(inicio_segmento, indices, 0))
+    pm_base = np.where(reinicio, 0.0, pm_inicial)[inicio]
+    custo_base = pm_base * qtd_antes[inicio]
+
+    # Vendas que zeram a posição só podem ser seguidas de um reinício: contam como fração 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fracao = np.where(~compra & (qtd_depois > 0), qtd_depois / qtd_antes, 1.0)
+    with np.errstate(over="ignore", under="ignore", divide="ignore", invalid="ignore"):
+        fator = np.exp(soma_por_segmento(np.log(fracao), inicio_segmento))
+        custo = fator * (custo_base + soma_por_segmento(np.where(compra, qtd_sinal * precos / fator, 0.0),
+                                                         inicio_segmento))
+        pm_compra = custo / qtd_depois
+    ultimo = np.maximum.accumulate(np.where(compra | inicio_segmento, indices, 0))
+    pm = np.where(compra, pm_compra, pm_base)[ultimo]
+
+    if not np.isfinite(pm).all() or (fator < 1e-200).any():
+        # Muitas vendas parciais seguidas podem zerar o fator: recalcula em laço
+        pm = np.empty(len(qtd_sinal))
+        atual = 0.0
+        for i in indices:
+            atual = pm_base[i] if inicio_segmento[i] else atual
+            if compra[i]:
+                atual = (qtd_antes[i] * atual + qtd_sinal[i] * precos[i]) / qtd_depois[i]
+            pm[i] = atual
+    return pm
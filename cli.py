@@ -0,0 +1,133 @@
+"""
+Linha de comando para tarefas sem o dashboard (ex.: cron).
+
+Comandos:
+    python cli.py mostrar              exibe a carteira salva
+    python cli.py reavaliar            busca as cotações, marca a carteira a mercado e salva um snapshot
+    python cli.py compactar            reaplica o diário de transações e o substitui por um snapshot
+    python cli.py lote ordens.csv      executa um lote de ordens (colunas codigo, tipo, quantidade, preco)
+    python cli.py ticks ticks.csv      reproduz um fluxo de ticks (arquivo CSV/Parquet ou socket Unix) e salva um snapshot
+
+Opções comuns: --dados (pasta do diário, padrão "dados_portfolio", a mesma do
+dashboard) e --provedor ("yfinance" ou "local"; padrão: variável PROVEDOR_DADOS).
+
+Os módulos pesados são importados só pelos comandos que precisam deles: exibir
+ou compactar a carteira não importa pandas nem yfinance (a menos que haja
+registros no diário a reaplicar), e o NumPy só é importado quando há posições
+na carteira (`--help` e uma carteira vazia não o importam).
+"""
+import argparse
+import sys
+
+
+def _carregar(opcoes):
+    """Abre o diário e restaura o portfólio, sem importar nada além do necessário."""
+    from diario import DiarioTransacoes
+    from portifolio_manager import PortfolioManager
+    from provedores_dados import criar_provedor
+
+    diario = DiarioTransacoes(opcoes.dados)
+    portfolio = PortfolioManager(provedor=criar_provedor(opcoes.provedor))
+    reaplicados = diario.restaurar(portfolio)
+    portfolio.diario = diario
+    return portfolio, diario, reaplicados
+
+
+def comando_mostrar(opcoes):
+    portfolio, _, _ = _carregar(opcoes)
+    portfolio.mostrar_portfolio()
+    return 0
+
+
+def comando_reavaliar(opcoes):
+    portfolio, diario, _ = _carregar(opcoes)
+    if not portfolio.ativos:
+        print("Carteira vazia, nada para reavaliar.")
+        return 0
+    portfolio.atualizar_precos()
+    # O snapshot guarda os preços atualizados para a próxima execução
+    if not diario.salvar_snapshot(portfolio):
+        return 1
+    if opcoes.mostrar:
+        portfolio.mostrar_portfolio()
+    else:
+        print(f"Valor do Portfólio: R$ {portfolio.ativos.valor_total_carteira():.2f}")
+    return 0
+
+
+def comando_compactar(opcoes):
+    portfolio, diario, reaplicados = _carregar(opcoes)
+    if not diario.salvar_snapshot(portfolio):
+        return 1
+    print(f"{reaplicados} registro(s) reaplicado(s); snapshot salvo em {diario.caminho_snapshot}.")
+    return 0
+
+
+def comando_lote(opcoes):
+    portfolio, _, _ = _carregar(opcoes)
+    resultado = portfolio.executar_lote(opcoes.arquivo)
+    ordens = resultado["ordens"]
+    if not resultado["sucesso"]:
+        rejeitada = ordens[ordens["status"] == "rejeitada"].iloc[0]
+        print(f"ERRO: Lote rejeitado ({rejeitada['codigo']}: {rejeitada['motivo']}). Nenhuma ordem foi aplicada.")
+        return 1
+    print(f"SUCESSO: {len(ordens)} ordem(ns) executada(s). "
+          f"Lucro realizado: R$ {ordens['lucro_realizado'].sum():.2f}. Saldo: R$ {resultado['saldo']:.2f}")
+    return 0
+
+
+def comando_ticks(opcoes):
+    from fluxo_cotacoes import IngestorCotacoes, abrir_fonte
+
+    fonte = abrir_fonte(opcoes.origem)
+    if fonte is None:
+        return 1
+    portfolio, diario, _ = _carregar(opcoes)
+    ingestor = IngestorCotacoes(portfolio, fonte, intervalo_lote=opcoes.intervalo)
+    estatisticas = ingestor.iniciar().aguardar()
+    if ingestor.erro is not None:
+        return 1
+    if not diario.salvar_snapshot(portfolio):
+        return 1
+    print(f"{estatisticas['recebidos']} tick(s) recebido(s), {estatisticas['coalescidos']} coalescido(s), "
+          f"{estatisticas['aplicados']} preço(s) aplicado(s) em {estatisticas['lotes']} lote(s).")
+    print(f"Valor do Portfólio: R$ {portfolio.ativos.valor_total_carteira():.2f}")
+    return 0
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gerenciador de portfólio sem interface gráfica.")
+    parser.add_argument("--dados", default="dados_portfolio", help="pasta do diário de transações")
+    parser.add_argument("--provedor", default=None, help='fonte de dados: "yfinance" ou "local"')
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comandos.add_parser("mostrar", help="exibe a carteira salva").set_defaults(executar=comando_mostrar)
+
+    reavaliar = comandos.add_parser("reavaliar", help="atualiza os preços e salva um snapshot")
+    reavaliar.add_argument("--mostrar", action="store_true", help="exibe a carteira ao final")
+    reavaliar.set_defaults(executar=comando_reavaliar)
+
+    comandos.add_parser("compactar", help="reaplica o diário e salva um snapshot").set_defaults(
+        executar=comando_compactar)
+
+    lote = comandos.add_parser("lote", help="executa um lote de ordens de um CSV")
+    lote.add_argument("arquivo", help="CSV com as colunas codigo, tipo, quantidade e preco")
+    lote.set_defaults(executar=comando_lote)
+
+    ticks = comandos.add_parser("ticks", help="aplica um fluxo de cotações local e salva um snapshot")
+    ticks.add_argument("origem", help="CSV/Parquet com as colunas codigo e preco, ou caminho de um socket Unix")
+    ticks.add_argument("--intervalo", type=float, default=0.01, help="segundos entre micro-lotes (padrão 0.01)")
+    ticks.set_defaults(executar=comando_ticks)
+
+    opcoes = parser.parse_args(argumentos)
+    from diario import DiarioEmUso
+    try:
+        return opcoes.executar(opcoes)
+    except DiarioEmUso as e:
+        # Ex.: o dashboard está aberto sobre a mesma pasta
+        print(f"ERRO: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,32 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import plotly.graph_objects as go
 import time
+import os
+import json
 import numpy as np
+from estruturas_dados import TabelaHashEncadeada
 from portifolio_manager import PortfolioManager
+from diario import DiarioTransacoes
+from provedores_dados import criar_provedor
+from servico_cotacoes import ServicoCotacoes
+from fluxo_cotacoes import IngestorCotacoes, abrir_fonte
+from reamostragem import PiramideOHLC, reduzir_linha
+from triagem import ACOES_POR_SETOR, Triagem
+from metricas import METRICAS, tabela_instrumentada
+
+# Máximo de candles enviados ao navegador (~2 px por candle em um gráfico de 1200 px)
+MAX_BARRAS_GRAFICO = 600
+# Segundos entre as aplicações das cotações do fluxo local (FLUXO_COTACOES)
+INTERVALO_FLUXO = float(os.environ.get("FLUXO_INTERVALO", "2"))
 
 
 @st.cache_data(ttl=300)
 def buscar_dados_historicos(ticker, periodo, intervalo):
     try:
-        dados = yf.Ticker(ticker).history(period=periodo, interval=intervalo)
-        if dados.empty:
+        # Passa pelo cache e pelo histórico em disco do analisador
+        dados = st.session_state.portfolio.analisador._get_dados_historicos(ticker, periodo=periodo, intervalo=intervalo)
+        if dados is None or dados.empty:
             st.warning(f"Não foram encontrados dados para '{ticker}' com os parâmetros selecionados.")
             return None
         return dados
@@ -19,20 +34,198 @@ def buscar_dados_historicos(ticker, periodo, intervalo):
         st.error(f"Erro ao buscar dados da API: {e}")
         return None
 
-def exibir_grafico_candlestick(ticker, periodo, intervalo):
+@st.cache_resource
+def servico_cotacoes():
+    # Um único serviço (e um único pool de threads) para todas as sessões,
+    # em vez de um por sessão que nunca seria encerrado
+    return ServicoCotacoes(criar_provedor())
+
+@st.cache_resource
+def portfolio_compartilhado():
+    # O diário em disco preserva a carteira entre reinícios do Streamlit. Só
+    # pode haver um diário por pasta, então todas as sessões usam esta mesma
+    # carteira, no modo concorrente (cada sessão roda em uma thread própria).
+    # Com as métricas ligadas, as tabelas hash também registram a latência de put/get/delete
+    tipo_tabela = tabela_instrumentada(TabelaHashEncadeada, "portfolio") if METRICAS.habilitado else TabelaHashEncadeada
+    return PortfolioManager(tipo_tabela=tipo_tabela,
+                            diario=DiarioTransacoes("dados_portfolio"),
+                            diretorio_historico="dados_historicos",
+                            provedor=servico_cotacoes(),
+                            concorrente=True)
+
+@st.cache_resource
+def ingestor_compartilhado(origem):
+    # Uma única leitura da fonte para todas as sessões. A leitura roda em
+    # segundo plano e os preços são aplicados por painel_fluxo; a carteira
+    # concorrente aceita isso de qualquer sessão. None se a fonte não existir.
+    fonte = abrir_fonte(origem)
+    if fonte is None:
+        return None
+    return IngestorCotacoes(portfolio_compartilhado(), fonte).iniciar(consumir=False)
+
+@st.cache_resource(ttl=300)
+def piramide_ohlc(ticker, periodo, intervalo):
+    # Os níveis agregados ficam guardados entre execuções, sem cópia
     df = buscar_dados_historicos(ticker, periodo, intervalo)
     if df is None or df.empty:
+        return None
+    return PiramideOHLC(df)
+
+@st.fragment(run_every=INTERVALO_FLUXO)
+def painel_fluxo(ingestor):
+    # Reexecutado sozinho a cada INTERVALO_FLUXO segundos, sem esperar uma
+    # interação: aplica os ticks pendentes e mostra os totais ao vivo. O
+    # restante da página (tabelas e gráficos) reflete os novos preços na
+    # próxima execução completa do script.
+    ingestor.aplicar_pendentes()
+    fluxo = ingestor.estatisticas()
+    totais = st.session_state.portfolio.totais()
+    st.caption(f"Cotações ao vivo: {fluxo['recebidos']:,} ticks recebidos, {fluxo['coalescidos']:,} coalescidos, "
+               f"{fluxo['lotes']} lotes aplicados. Valor do portfólio: R$ {totais['valor_mercado']:.2f} "
+               f"(não realizado: R$ {totais['lucro_nao_realizado']:.2f}).")
+
+def memoizar(nome, chave, calcular):
+    """
+    Guarda em st.session_state o resultado de `calcular()` junto com a chave
+    usada. Nas próximas execuções do script, o valor é reaproveitado enquanto
+    a chave (ex.: a versão do portfólio) não mudar.
+    """
+    if "memo" not in st.session_state:
+        st.session_state.memo = {}
+    entrada = st.session_state.memo.get(nome)
+    if entrada is None or entrada[0] != chave:
+        entrada = st.session_state.memo[nome] = (chave, calcular())
+    return entrada[1]
+
+def criar_grafico_distribuicao(labels, valores):
+    # Cria a figura do gráfico de pizza/rosca
+    fig = go.Figure(data=[go.Pie(
+        labels=labels, 
+        values=valores, 
+        hole=.3, # Cria o buraco no meio (gráfico de rosca)
+        pull=[0.05 if i == np.argmax(valores) else 0 for i in range(len(valores))] # Destaca a maior fatia
+    )])
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(
+        showlegend=False,
+        margin=dict(t=0, b=0, l=0, r=0)
+    )
+    fig.update_layout(
+        width=350,  # Largura em pixels
+        height=300  # Altura em pixels
+    )
+    return fig
+
+@METRICAS.cronometrado("dashboard_secao_segundos", secao="tabela_carteira")
+def montar_tabela_carteira(portfolio):
+    # Cópia coerente das posições: outras sessões podem estar operando a mesma carteira
+    posicoes = portfolio.instantaneo()["posicoes"]
+    codigos = list(posicoes.index)
+    # Indicadores e informações só mudam com os tickers da carteira ou com novas cotações
+    chave_mercado = (tuple(codigos), portfolio.versao_precos)
+    # Todos os indicadores da carteira em uma única chamada vetorizada
+    indicadores = memoizar("indicadores", chave_mercado, lambda: portfolio.analisador.calcular_indicadores(codigos))
+    # Informações de todos os ativos buscadas em paralelo
+    infos_ativos = memoizar("infos", chave_mercado, lambda: portfolio.provedor.infos(codigos))
+    ao_vivo = portfolio.analisador.valores_ao_vivo(codigos)
+    df_data = []
+    for codigo, quantidade, preco_medio, desempenho in zip(codigos, posicoes["quantidade"].tolist(),
+                                                           posicoes["preco_medio"].tolist(),
+                                                           posicoes["lucro_prejuizo_%"].fillna(0).tolist()):
+        volatilidade, rsi, beta = indicadores.loc[codigo, ["volatilidade", "rsi", "beta"]]
+        # Com cotações ao vivo, os indicadores incrementais incluem o último tick
+        vivos = ao_vivo.get(codigo, {})
+        rsi = vivos.get("rsi") if vivos.get("rsi") is not None else rsi
+        volatilidade = vivos.get("volatilidade") if vivos.get("volatilidade") is not None else volatilidade
+        beta = vivos.get("beta") if vivos.get("beta") is not None else beta
+        infos = infos_ativos.get(codigo) or {}
+        df_data.append({
+            "Empresa": infos.get("shortName", None),
+            "Ação": codigo,
+            "Quantidade": quantidade,
+            "Preço Médio (R$)": preco_medio,
+            "Preço Atual (R$)": infos.get("currentPrice", None),
+            "Desempenho (%)": desempenho,
+            "RSI (14d)":  rsi,
+            "Volatilidade (60d)": volatilidade,
+            "Beta (1a)": beta if pd.notna(beta) else infos.get("beta", None),
+        })
+    return pd.DataFrame(df_data)
+
+def _rotulos(rotulos):
+    return ", ".join(f"{k}={v}" for k, v in rotulos.items())
+
+def exibir_diagnostico(portfolio):
+    with st.expander("Diagnóstico de desempenho"):
+        if not METRICAS.habilitado:
+            st.info("Métricas desligadas (defina METRICAS=1 para ativá-las).")
+            return
+        dados = METRICAS.para_json()
+        st.subheader("Latências")
+        if dados["histogramas"]:
+            st.dataframe(pd.DataFrame([{
+                "Métrica": h["nome"],
+                "Rótulos": _rotulos(h["rotulos"]),
+                "Chamadas": h["quantidade"],
+                "Média (ms)": h["media"] * 1000,
+                "p50 (ms)": h["p50"] * 1000,
+                "p95 (ms)": h["p95"] * 1000,
+                "Total (s)": h["soma"],
+            } for h in dados["histogramas"]]), use_container_width=True)
+        st.subheader("Contadores e taxas de acerto")
+        col_contadores, col_taxas = st.columns(2)
+        with col_contadores:
+            st.dataframe(pd.DataFrame([{"Métrica": c["nome"], "Rótulos": _rotulos(c["rotulos"]), "Valor": c["valor"]}
+                                       for c in dados["contadores"]]), use_container_width=True)
+        with col_taxas:
+            st.dataframe(pd.DataFrame([{"Métrica": t["nome"], "Rótulos": _rotulos(t["rotulos"]),
+                                        "Taxa de acerto (%)": t["taxa_acerto"] * 100}
+                                       for t in dados["taxas_acerto"]]), use_container_width=True)
+            st.json(portfolio.analisador.cache_dados_historicos.estatisticas())
+        col_prometheus, col_json = st.columns(2)
+        with col_prometheus:
+            st.download_button("Exportar (Prometheus)", METRICAS.para_prometheus(),
+                               file_name="metricas.prom", mime="text/plain")
+        with col_json:
+            st.download_button("Exportar (JSON)", json.dumps(dados, indent=2, ensure_ascii=False),
+                               file_name="metricas.json", mime="application/json")
+
+def exibir_grafico_candlestick(ticker, periodo, intervalo):
+    piramide = piramide_ohlc(ticker, periodo, intervalo)
+    if piramide is None:
         st.warning(f"Não há dados disponíveis para exibir o gráfico de '{ticker}'.")
         return
+    indice = piramide.indice
+    inicio, fim = None, None
+    if len(piramide) > MAX_BARRAS_GRAFICO:
+        # Séries longas: permite aproximar um trecho, que é exibido com mais detalhe
+        datas = indice.tz_localize(None) if indice.tz is not None else indice
+        inicio, fim = st.slider("Janela do gráfico", min_value=datas[0].to_pydatetime(),
+                                max_value=datas[-1].to_pydatetime(),
+                                value=(datas[0].to_pydatetime(), datas[-1].to_pydatetime()),
+                                key=f"janela_{ticker}_{periodo}_{intervalo}")
+        if indice.tz is not None:
+            inicio, fim = pd.Timestamp(inicio).tz_localize(indice.tz), pd.Timestamp(fim).tz_localize(indice.tz)
+    tipo_grafico = st.radio("Tipo de gráfico", ["Candlestick", "Linha"], horizontal=True, key="tipo_grafico")
+    # No máximo MAX_BARRAS_GRAFICO barras, lidas do nível pré-agregado adequado
+    df = piramide.janela(inicio, fim, MAX_BARRAS_GRAFICO)
+    if df.empty:
+        st.warning("Não há barras no intervalo selecionado.")
+        return
     fig = go.Figure()
-    fig.add_trace(go.Candlestick(
-        x=df.index,
-        open=df["Open"],
-        high=df["High"],
-        low=df["Low"],
-        close=df["Close"],
-        name="Candlestick"
-    ))
+    if tipo_grafico == "Linha":
+        # Para a linha, o LTTB escolhe os fechamentos que preservam o formato da série
+        fechamentos = reduzir_linha(piramide.janela(inicio, fim, len(piramide) + 1)["Close"], MAX_BARRAS_GRAFICO)
+        fig.add_trace(go.Scatter(x=fechamentos.index, y=fechamentos, mode="lines", name="Fechamento"))
+    else:
+        fig.add_trace(go.Candlestick(
+            x=df.index,
+            open=df["Open"],
+            high=df["High"],
+            low=df["Low"],
+            close=df["Close"],
+            name="Candlestick"
+        ))
     fig.add_trace(go.Bar(
         x=df.index,
         y=df["Volume"],
@@ -76,16 +269,27 @@ def exibir_grafico_candlestick(ticker, periodo, intervalo):
 
 if __name__ == "__main__":
     st.set_page_config(layout="wide")
+    inicio_execucao = time.perf_counter()
+    # No dashboard as métricas ficam ligadas, a menos que METRICAS=0
+    METRICAS.habilitar(os.environ.get("METRICAS", "1") != "0")
+
+    # Uma única carteira (e um único diário) para todas as sessões
+    st.session_state.portfolio = portfolio_compartilhado()
 
-    if 'portfolio' not in st.session_state:
-        st.session_state.portfolio = PortfolioManager()
+    # Fluxo de cotações local opcional (FLUXO_COTACOES=arquivo CSV/Parquet ou socket Unix).
+    origem_ticks = os.environ.get("FLUXO_COTACOES")
+    ingestor = ingestor_compartilhado(origem_ticks) if origem_ticks else None
+    if origem_ticks and ingestor is None:
+        st.warning(f"Fonte de cotações ao vivo indisponível: {origem_ticks}")
+    if ingestor is not None:
+        painel_fluxo(ingestor)
 
     #Para testar as funcionalidades da carteira, adiciona-se previamente alguns ativos ao portifólio agora:
     if st.button("Adicionar alguns ativos a carteira automaticamente", key="add_ativos", use_container_width=True):
         compras_ticker = ["PETR4.SA", "AAPL","BBAS3.SA"]
+        infos_compra = st.session_state.portfolio.provedor.infos(compras_ticker)
         for ticker in compras_ticker:
-            info_compra = yf.Ticker(ticker).info
-            preco_compra_atual = info_compra.get('currentPrice')
+            preco_compra_atual = (infos_compra.get(ticker) or {}).get('currentPrice')
             st.session_state.portfolio.comprar(ticker, 10, preco_compra_atual)
 
     
@@ -95,70 +299,44 @@ if __name__ == "__main__":
 
     col11, col12 = st.columns(2)
 
+    portfolio = st.session_state.portfolio
+    ativos = portfolio.ativos
+    # Os cálculos derivados são refeitos apenas quando o portfólio muda
+    versao = portfolio.chave_estado()
+
     with col11:
-        st.metric("Saldo em Conta", f"R$ {st.session_state.portfolio.saldo:.2f}")
-        portfolio_items = st.session_state.portfolio.ativos.get_all_items()
-        valor_total_carteira = sum(item[1].get('valor_total', 0) for item in portfolio_items)
+        st.metric("Saldo em Conta", f"R$ {portfolio.saldo:.2f}")
+        # Totais mantidos pelo próprio portfólio a cada ordem e atualização de preços
+        totais = portfolio.totais()
+
+        st.metric("Valor do Portfólio", f"R$ {totais['valor_mercado']:.2f}")
 
-        st.metric("Valor do Portfólio", f"R$ {valor_total_carteira:.2f}")
+        lucro_aberto = totais["lucro_nao_realizado"]
+        st.metric("Lucro/Prejuízo Não Realizado", f"R$ {lucro_aberto:.2f}",
+                  delta_color="normal" if lucro_aberto >= 0 else "inverse")
 
-        lucro_vendas = st.session_state.portfolio.lucro_vendas
+        lucro_vendas = portfolio.lucro_vendas
         cor_lucro = "normal" if lucro_vendas >= 0 else "inverse"
         st.metric("Lucro/Prejuízo Realizado", f"R$ {lucro_vendas:.2f}", delta_color=cor_lucro)
     
     with col12:
         st.text("Composição da Carteira por Ativo")
-        labels, valores = st.session_state.portfolio.get_distribuicao_por_ativo()
+        labels, valores = memoizar("distribuicao", versao, portfolio.get_distribuicao_por_ativo)
         
         if not labels:
             st.info("A carteira está vazia. Compre ativos para ver a composição.")
         else:
-            # Cria a figura do gráfico de pizza/rosca
-            fig = go.Figure(data=[go.Pie(
-                labels=labels, 
-                values=valores, 
-                hole=.3, # Cria o buraco no meio (gráfico de rosca)
-                pull=[0.05 if i == np.argmax(valores) else 0 for i in range(len(valores))] # Destaca a maior fatia
-            )])
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(
-                showlegend=False,
-                margin=dict(t=0, b=0, l=0, r=0)
-            )
-            fig.update_layout(
-    width=350,  # Largura em pixels
-    height=300  # Altura em pixels
-)
-            fig.update_layout(
-        margin=dict(l=0, r=0, t=0, b=0),  # Remove margens do gráfico
-    # Altura menor
-    )
+            fig = memoizar("grafico_distribuicao", versao, lambda: criar_grafico_distribuicao(labels, valores))
             st.plotly_chart(fig, use_container_width=True)
 
     st.header("Minha Carteira de Ativos")
-    if not portfolio_items:
+    if not ativos:
         st.info("Seu portfólio está vazio. Vá para a página 'Mercado de Ações' para começar a investir.")
     else:
-        df_data = []
         with st.spinner("Calculando indicadores de análise..."):
-            for codigo, dados in portfolio_items:
-                analisador = st.session_state.portfolio.analisador
-                volatilidade = analisador.calcular_volatilidade(codigo)
-                rsi = analisador.calcular_rsi(codigo)
-                beta = analisador.calcular_beta(codigo)
-                infos = yf.Ticker(codigo).info
-                df_data.append({
-                    "Empresa": infos.get("shortName", None),
-                    "Ação": codigo,
-                    "Quantidade": dados['quantidade'],
-                    "Preço Médio (R$)": dados['preco_medio'],
-                    "Preço Atual (R$)": infos.get("currentPrice", None),
-                    "Desempenho (%)": dados.get('lucro_prejuizo_%', 0),
-                    "RSI (14d)":  rsi,
-                    "Volatilidade (60d)": volatilidade,
-                    "Beta (1a)": beta if beta is not None else infos.get("beta", None),
-                })
-        df_portfolio = pd.DataFrame(df_data)
+            # Os ticks também mudam os indicadores ao vivo, que têm sua própria versão
+            df_portfolio = memoizar("tabela_carteira", (versao, portfolio.analisador.versao_ao_vivo),
+                                    lambda: montar_tabela_carteira(portfolio))
         def colorir_rsi(val):
             if isinstance(val, str) and val != "N/A":
                 rsi_val = float(val)
@@ -183,13 +361,6 @@ if __name__ == "__main__":
             st.rerun()
 
     col21,col22 = st.columns(2)
-    ACOES_POR_SETOR = {
-        "Financeiro": ["ITUB4.SA", "BBDC4.SA", "BBAS3.SA", "SANB11.SA", "BPAC11.SA"],
-        "Varejo": ["MGLU3.SA", "LREN3.SA", "BHIA3.SA", "AMER3.SA", "PETZ3.SA"],
-        "Energia e Matérias-Primas": ["PETR4.SA", "VALE3.SA", "SUZB3.SA", "ELET3.SA", "PRIO3.SA"],
-        "Saúde": ["RADL3.SA", "HAPV3.SA", "FLRY3.SA", "RDOR3.SA", "AALR3.SA"],
-        "Tecnologia": ["TOTS3.SA", "LWSA3.SA", "CASH3.SA", "SQIA3.SA", "ZENV4.SA"]
-    }
     with col21:
         st.header("Registrar Compra")
         usar_setores = st.checkbox("Buscar ativo por setor", key="compra_por_setor")
@@ -210,8 +381,7 @@ if __name__ == "__main__":
             if compra_submitted:
                 with st.spinner(f"Buscando cotação atual para {compra_ticker}..."):
                     try:
-                        info_compra = yf.Ticker(compra_ticker).info
-                        preco_compra_atual = info_compra.get('currentPrice')
+                        preco_compra_atual = st.session_state.portfolio.provedor.cotacao(compra_ticker)
 
                         if preco_compra_atual:
                             st.session_state.portfolio.comprar(compra_ticker, compra_qtd, preco_compra_atual)
@@ -224,18 +394,17 @@ if __name__ == "__main__":
     with col22:    
         st.header("Registrar Venda")
         with st.form("venda_form"):
-            lista_tickers = [item[0] for item in portfolio_items] if portfolio_items else []
+            lista_tickers = list(ativos.keys())
             venda_ticker = st.selectbox("Selecione o Ativo para Vender", lista_tickers, key="venda_ticker_select")
             venda_qtd = st.number_input("Quantidade a Vender", min_value=1, step=1)
             preco_venda_atual = 0
             if venda_ticker:
                 try:
-                    dados_venda = yf.Ticker(venda_ticker).info
-                    preco_venda_atual = dados_venda.get('currentPrice', 0)
+                    preco_venda_atual = st.session_state.portfolio.provedor.cotacao(venda_ticker) or 0
                     st.info(f"Preço de mercado atual para {venda_ticker}: R$ {preco_venda_atual:.2f}")
-                    for codigo, dados in portfolio_items:
-                        if codigo == venda_ticker:
-                            st.info(f"Preço médio pago por ação: R$ {dados['preco_medio']}")
+                    dados = ativos.get(venda_ticker)
+                    if dados is not None:
+                        st.info(f"Preço médio pago por ação: R$ {dados['preco_medio']}")
                 except Exception:
                     st.warning("Não foi possível obter o preço de mercado atual.")
             venda_submitted = st.form_submit_button("Executar Venda")
@@ -245,8 +414,41 @@ if __name__ == "__main__":
                     time.sleep(1)
                     st.rerun()
 
+    st.header("Triagem de Ativos")
+    with st.form("triagem_form"):
+        setores_triagem = st.multiselect("Setores", list(ACOES_POR_SETOR.keys()), default=list(ACOES_POR_SETOR.keys()))
+        col41, col42, col43, col44 = st.columns(4)
+        with col41:
+            faixa_rsi = st.slider("RSI (14d)", 0.0, 100.0, (0.0, 100.0))
+        with col42:
+            volatilidade_maxima = st.number_input("Volatilidade máxima (%)", min_value=0.0, value=100.0)
+        with col43:
+            faixa_beta = st.slider("Beta (1a)", -2.0, 4.0, (-2.0, 4.0))
+        with col44:
+            ordenar_por = st.selectbox("Ordenar por", ["rsi", "volatilidade", "beta"])
+            ascendente = st.checkbox("Ordem crescente", value=True)
+        triagem_submitted = st.form_submit_button("Executar Triagem")
+
+    if triagem_submitted:
+        universo = {setor: ACOES_POR_SETOR[setor] for setor in setores_triagem}
+        criterios = {"rsi": faixa_rsi, "volatilidade": (None, volatilidade_maxima), "beta": faixa_beta}
+        with st.spinner("Calculando indicadores dos ativos..."):
+            # Os processos leem o histórico em disco do analisador da carteira
+            st.session_state.triagem = Triagem(portfolio.analisador, processos=os.cpu_count()).executar(
+                universo, criterios, ordenar_por=ordenar_por, ascendente=ascendente)
+    if st.session_state.get("triagem") is not None:
+        if st.session_state.triagem.empty:
+            st.info("Nenhum ativo atende aos critérios da triagem.")
+        else:
+            st.dataframe(st.session_state.triagem.style.format({
+                             'volatilidade': '{:.2f}%',
+                             'rsi': '{:.2f}',
+                             'beta': '{:.2f}'
+                         }, na_rep="N/A"),
+                         use_container_width=True)
+
     st.header("Análise Gráfica de Ativos")
-    lista_tickers = [item[0] for item in portfolio_items] if portfolio_items else []
+    lista_tickers = list(ativos.keys())
     col31, col32, col33 = st.columns(3)
     with col31:
         ticker_selecionado = st.text_input("Insira o código do ativo")
@@ -273,3 +475,6 @@ if __name__ == "__main__":
             periodo=periodo_selecionado,
             intervalo=intervalo_selecionado
         )
+
+    METRICAS.observar("dashboard_execucao_segundos", time.perf_counter() - inicio_execucao)
+    exibir_diagnostico(st.session_state.portfolio)
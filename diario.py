@@ -0,0 +1,204 @@
+import atexit
+import json
+import os
+import time
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+# Diários abertos, fechados ao fim do processo sem impedir que sejam coletados antes
+_ABERTOS = weakref.WeakSet()
+
+
+class DiarioEmUso(RuntimeError):
+    """A pasta do diário já está aberta por outra instância de `DiarioTransacoes`."""
+
+
+@atexit.register
+def _fechar_abertos():
+    for diario in list(_ABERTOS):
+        diario.fechar()
+
+
+class DiarioTransacoes:
+    """
+    Diário de transações (append-only) com snapshots periódicos.
+
+    Cada compra, venda ou lote executado vira uma linha JSON no arquivo
+    `diario.jsonl`, com um número de sequência crescente. Toda linha é enviada
+    ao sistema operacional logo após a escrita (sobrevive a um crash do
+    processo), mas o `fsync` para o disco é feito em lotes: a cada
+    `fsync_a_cada` registros ou `fsync_intervalo` segundos, o que ocorrer
+    primeiro.
+
+    A cada `intervalo_snapshot` registros o estado completo do portfólio é
+    gravado em `snapshot.json` e o diário é reiniciado. Na inicialização basta
+    carregar o snapshot e reaplicar apenas as linhas posteriores a ele, de modo
+    que o tempo de carga não depende do histórico total de operações.
+
+    Cada pasta só pode ter um diário aberto por vez: o snapshot de uma
+    instância truncaria os registros de outra. O construtor trava a pasta
+    (`fcntl.flock` em `.trava`) e levanta `DiarioEmUso` se outra instância,
+    deste ou de outro processo, já a tiver aberto. Quem precisa da mesma
+    carteira em vários lugares (ex.: as sessões do dashboard) deve
+    compartilhar um único `PortfolioManager` com o seu diário.
+    """
+    def __init__(self, diretorio, intervalo_snapshot=1000, fsync_a_cada=64, fsync_intervalo=0.5):
+        self.diretorio = diretorio
+        self.intervalo_snapshot = intervalo_snapshot
+        self.fsync_a_cada = fsync_a_cada
+        self.fsync_intervalo = fsync_intervalo
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho_diario = os.path.join(diretorio, "diario.jsonl")
+        self.caminho_snapshot = os.path.join(diretorio, "snapshot.json")
+        self._trava = self._travar_pasta()
+
+        self.seq = 0
+        self.seq_snapshot = 0
+        # Fica falso se a reaplicação do diário falhar: o diário não pode mais ser truncado
+        self.integro = True
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+        self._arquivo = None
+        _ABERTOS.add(self)
+
+    def _travar_pasta(self):
+        if fcntl is None:
+            return None
+        trava = open(os.path.join(self.diretorio, ".trava"), "a")
+        try:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            trava.close()
+            raise DiarioEmUso(f"O diário em {self.diretorio} já está aberto por outra instância.") from None
+        return trava
+
+    def _abrir(self):
+        if self._arquivo is None:
+            if self._trava is None and fcntl is not None:
+                # Reaberto depois de fechar(): trava a pasta de novo
+                self._trava = self._travar_pasta()
+                _ABERTOS.add(self)
+            self._arquivo = open(self.caminho_diario, "a", encoding="utf-8")
+
+    def registrar(self, registro):
+        """Acrescenta um registro ao diário e devolve seu número de sequência."""
+        self._abrir()
+        self.seq += 1
+        registro = {"seq": self.seq, **registro}
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._arquivo.flush()
+        self._pendentes_fsync += 1
+        if (self._pendentes_fsync >= self.fsync_a_cada
+                or time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo):
+            self.sincronizar()
+        return self.seq
+
+    def sincronizar(self):
+        """Força o fsync dos registros pendentes."""
+        if self._arquivo is not None and self._pendentes_fsync:
+            os.fsync(self._arquivo.fileno())
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def precisa_snapshot(self):
+        return self.integro and self.seq - self.seq_snapshot >= self.intervalo_snapshot
+
+    def salvar_snapshot(self, portfolio):
+        """
+        Grava o estado do portfólio de forma atômica (arquivo temporário +
+        os.replace) e só então reinicia o diário.
+        Retorna False, sem gravar nada, se a última restauração falhou: o
+        snapshot não conteria as ordens do diário e truncá-lo as perderia.
+        """
+        if not self.integro:
+            print("ERRO: O diário não pôde ser reaplicado; snapshot não gravado para não perder ordens.")
+            return False
+        estado = {
+            "versao": 1,
+            "seq": self.seq,
+            "saldo": portfolio.saldo,
+            "lucro_vendas": portfolio.lucro_vendas,
+            "posicoes": {codigo: posicao.to_dict() for codigo, posicao in portfolio.ativos.items()},
+        }
+        temporario = self.caminho_snapshot + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(estado, arquivo, ensure_ascii=False)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_snapshot)
+        self.seq_snapshot = self.seq
+
+        # Registros anteriores ao snapshot não são mais necessários
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._arquivo = open(self.caminho_diario, "w", encoding="utf-8")
+        self._pendentes_fsync = 0
+        return True
+
+    def _ler_registros(self):
+        """Lê o diário ignorando uma última linha incompleta (escrita interrompida)."""
+        if not os.path.exists(self.caminho_diario):
+            return []
+        registros = []
+        with open(self.caminho_diario, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    break
+        return registros
+
+    def restaurar(self, portfolio):
+        """
+        Carrega o último snapshot no portfólio e reaplica os registros do
+        diário posteriores a ele, em um único `executar_lote`.
+        Retorna a quantidade de registros reaplicados. Se o lote for
+        rejeitado, nada é aplicado, a sequência não avança e `integro` fica
+        falso, bloqueando snapshots (e o truncamento do diário).
+        """
+        if os.path.exists(self.caminho_snapshot):
+            with open(self.caminho_snapshot, encoding="utf-8") as arquivo:
+                estado = json.load(arquivo)
+            portfolio.saldo = estado["saldo"]
+            portfolio.lucro_vendas = estado["lucro_vendas"]
+            for codigo, dados in estado["posicoes"].items():
+                portfolio.ativos.put(codigo, dados)
+            self.seq = self.seq_snapshot = estado["seq"]
+            portfolio._nova_versao(precos=True)
+
+        pendentes = [r for r in self._ler_registros() if r["seq"] > self.seq_snapshot]
+        ordens = []
+        for registro in pendentes:
+            if registro["tipo"] == "lote":
+                ordens.extend(registro["ordens"])
+            else:
+                ordens.append([registro["codigo"], registro["tipo"], registro["quantidade"], registro["preco"]])
+        if ordens:
+            # Desliga o diário durante a reaplicação para não registrar de novo
+            diario, portfolio.diario = portfolio.diario, None
+            try:
+                resultado = portfolio.executar_lote(ordens)
+            finally:
+                portfolio.diario = diario
+            if not resultado["sucesso"]:
+                print("ERRO: Não foi possível reaplicar o diário de transações; o diário foi preservado.")
+                self.integro = False
+                return 0
+        if pendentes:
+            self.seq = pendentes[-1]["seq"]
+        return len(pendentes)
+
+    def fechar(self):
+        """Grava o que falta, fecha o diário e libera a pasta para outra instância."""
+        if self._arquivo is not None:
+            self.sincronizar()
+            self._arquivo.close()
+            self._arquivo = None
+        if self._trava is not None:
+            self._trava.close()
+            self._trava = None
+        _ABERTOS.discard(self)
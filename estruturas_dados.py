@@ -1,5 +1,13 @@
+import itertools
+import random
+import threading
+
+
 class NoHash:
     """Nó para a lista encadeada, armazena o par {chave-valor}."""
+    # Sem __dict__ por nó: reduz bastante a memória de cada entrada
+    __slots__ = ("chave", "valor", "next")
+
     def __init__(self, chave, valor):
         self.chave = chave
         self.valor = valor
@@ -10,15 +18,19 @@ class ListaEncadeadaSimples:
     def __init__(self):
         self.head = None
         self.tail = None # Adicionado o ponteiro tail
+        self.comprimento = 0 # Quantidade de nós, mantida em O(1)
 
     def put(self, chave, valor):
-        """Adiciona ou atualiza um nó na lista. O append é O(1)."""
+        """
+        Adiciona ou atualiza um nó na lista. O append é O(1).
+        Retorna True se um novo nó foi criado e False se apenas atualizou.
+        """
         # Primeiro, verifica se a chave já existe para apenas atualizar o valor
         no_atual = self.head
         while no_atual:
             if no_atual.chave == chave:
                 no_atual.valor = valor
-                return
+                return False
             no_atual = no_atual.next
         
         # Se a chave não existe, adiciona um novo nó no final
@@ -32,15 +44,22 @@ class ListaEncadeadaSimples:
             # Lógica otimizada para O(1) usando o tail
             self.tail.next = novo_no
             self.tail = novo_no # Atualiza o tail para ser o novo nó
+        self.comprimento += 1
+        return True
 
-    def get(self, chave):
-        """Busca um valor pela chave na lista."""
+    def buscar_no(self, chave):
+        """Busca o nó que contém a chave, ou None se ela não estiver na lista."""
         no_atual = self.head
         while no_atual:
             if no_atual.chave == chave:
-                return no_atual.valor
+                return no_atual
             no_atual = no_atual.next
         return None
+
+    def get(self, chave):
+        """Busca um valor pela chave na lista."""
+        no = self.buscar_no(chave)
+        return no.valor if no is not None else None
     
     def delete(self, chave):
         """Deleta um nó pela chave, tratando o tail corretamente."""
@@ -53,6 +72,7 @@ class ListaEncadeadaSimples:
             # Se a lista ficou vazia, atualiza o tail também
             if self.head is None:
                 self.tail = None
+            self.comprimento -= 1
             return True
 
         # Caso 2: O nó está no meio ou no fim da lista
@@ -65,11 +85,21 @@ class ListaEncadeadaSimples:
                 
                 # Remove a referência ao nó
                 no_atual.next = no_atual.next.next
+                self.comprimento -= 1
                 return True
             no_atual = no_atual.next
             
         return False # Chave não encontrada
 
+    def __iter__(self):
+        """Gera os pares (chave, valor) da lista sem copiá-los."""
+        no_atual = self.head
+        while no_atual:
+            # Guarda o próximo antes de devolver o nó, permitindo removê-lo
+            proximo = no_atual.next
+            yield no_atual.chave, no_atual.valor
+            no_atual = proximo
+
     def get_items(self):
         """Retorna todos os itens da lista."""
         items = []
@@ -81,30 +111,635 @@ class ListaEncadeadaSimples:
 
 
 class TabelaHashEncadeada:
-    """Implementação da Tabela Hash com Encadeamento Separado."""
-    def __init__(self, tamanho=256):
+    """
+    Implementação da Tabela Hash com Encadeamento Separado.
+
+    A tabela cresce (e, opcionalmente, encolhe) conforme o fator de carga.
+    O rehash é incremental: ao iniciar um redimensionamento, a tabela passa a
+    manter dois arrays de slots e cada operação seguinte migra apenas alguns
+    slots do array antigo para o novo, evitando que um único `put` pague o
+    custo de mover todos os elementos.
+
+    Um índice dos slots não vazios permite iterar (`items`, `keys`, `values`)
+    visitando apenas os slots ocupados. Um iterador conclui o rehash em
+    andamento (a iteração já custa O(n)) e percorre as listas que estavam
+    ocupadas ao ser criado. A migração não altera essas listas, só troca os
+    slots por listas novas, então um iterador aberto não impede o rehash e
+    nenhum item é visitado duas vezes.
+    """
+    def __init__(self, tamanho=256, fator_carga_max=0.75, fator_carga_min=None, passos_rehash=4):
         self.tamanho = tamanho
+        self.tamanho_minimo = tamanho
+        self.fator_carga_max = fator_carga_max
+        # None desativa o encolhimento automático
+        self.fator_carga_min = fator_carga_min
+        self.passos_rehash = passos_rehash
         self.slots = [ListaEncadeadaSimples() for _ in range(self.tamanho)]
+        self.quantidade_elementos = 0
+        # Índices dos slots com pelo menos um nó
+        self._ocupados = set()
+
+        # Estado do rehash incremental (None quando não há rehash em andamento)
+        self._slots_novos = None
+        self._ocupados_novos = None
+        self._tamanho_novo = 0
 
     def _hash(self, chave):
         return hash(chave) % self.tamanho
 
+    def _hash_novo(self, chave):
+        return hash(chave) % self._tamanho_novo
+
+    def __len__(self):
+        return self.quantidade_elementos
+
+    def em_rehash(self):
+        """Indica se há um redimensionamento em andamento."""
+        return self._slots_novos is not None
+
+    def fator_carga(self):
+        """Razão entre a quantidade de elementos e a capacidade atual."""
+        capacidade = self._tamanho_novo if self.em_rehash() else self.tamanho
+        return self.quantidade_elementos / capacidade
+
+    def _iniciar_rehash(self, novo_tamanho):
+        self._slots_novos = [ListaEncadeadaSimples() for _ in range(novo_tamanho)]
+        self._ocupados_novos = set()
+        self._tamanho_novo = novo_tamanho
+
+    def _passo_rehash(self, passos=None):
+        """Migra até `passos` slots não vazios do array antigo para o novo."""
+        if not self.em_rehash():
+            return
+        passos = self.passos_rehash if passos is None else passos
+        while passos > 0 and self._ocupados:
+            indice = self._ocupados.pop()
+            no_atual = self.slots[indice].head
+            while no_atual:
+                h = self._hash_novo(no_atual.chave)
+                self._slots_novos[h].put(no_atual.chave, no_atual.valor)
+                self._ocupados_novos.add(h)
+                no_atual = no_atual.next
+            self.slots[indice] = ListaEncadeadaSimples()
+            passos -= 1
+
+        if not self._ocupados:
+            # Migração concluída: o array novo passa a ser o principal
+            self.slots = self._slots_novos
+            self._ocupados = self._ocupados_novos
+            self.tamanho = self._tamanho_novo
+            self._slots_novos = None
+            self._ocupados_novos = None
+            self._tamanho_novo = 0
+
+    def _verificar_redimensionamento(self):
+        if self.em_rehash():
+            return
+        fator = self.quantidade_elementos / self.tamanho
+        if fator > self.fator_carga_max:
+            self._iniciar_rehash(self.tamanho * 2)
+        elif (self.fator_carga_min is not None and fator < self.fator_carga_min
+                and self.tamanho // 2 >= self.tamanho_minimo):
+            self._iniciar_rehash(self.tamanho // 2)
+
     def put(self, chave, valor):
-        h = self._hash(chave)
-        self.slots[h].put(chave, valor)
+        self._passo_rehash()
+        if self.em_rehash():
+            # Chaves ainda no array antigo são atualizadas no lugar;
+            # chaves novas vão sempre para o array novo
+            no = self.slots[self._hash(chave)].buscar_no(chave)
+            if no is not None:
+                no.valor = valor
+                return
+            h, slots, ocupados = self._hash_novo(chave), self._slots_novos, self._ocupados_novos
+        else:
+            h, slots, ocupados = self._hash(chave), self.slots, self._ocupados
+        if slots[h].put(chave, valor):
+            ocupados.add(h)
+            self.quantidade_elementos += 1
+            self._verificar_redimensionamento()
 
     def get(self, chave):
-        h = self._hash(chave)
-        return self.slots[h].get(chave)
-    
+        self._passo_rehash()
+        if self.em_rehash():
+            valor = self._slots_novos[self._hash_novo(chave)].get(chave)
+            if valor is not None:
+                return valor
+        return self.slots[self._hash(chave)].get(chave)
+
+    def _remover(self, slots, ocupados, h, chave):
+        if not slots[h].delete(chave):
+            return False
+        if slots[h].head is None:
+            ocupados.discard(h)
+        return True
+
     def delete(self, chave):
-        h = self._hash(chave)
-        return self.slots[h].delete(chave)
+        self._passo_rehash()
+        removido = self._remover(self.slots, self._ocupados, self._hash(chave), chave)
+        if not removido and self.em_rehash():
+            removido = self._remover(self._slots_novos, self._ocupados_novos, self._hash_novo(chave), chave)
+        if removido:
+            self.quantidade_elementos -= 1
+            self._verificar_redimensionamento()
+        return removido
+
+    def estatisticas(self):
+        """
+        Retorna métricas de ocupação da tabela: quantidade de elementos,
+        capacidade, fator de carga e comprimento máximo/médio das listas
+        encadeadas (a média considera apenas os slots ocupados).
+        """
+        comprimentos = [self.slots[i].comprimento for i in self._ocupados]
+        if self.em_rehash():
+            comprimentos.extend(self._slots_novos[i].comprimento for i in self._ocupados_novos)
+        return {
+            "elementos": self.quantidade_elementos,
+            "capacidade": self._tamanho_novo if self.em_rehash() else self.tamanho,
+            "fator_carga": self.fator_carga(),
+            "comprimento_max": max(comprimentos, default=0),
+            "comprimento_medio": sum(comprimentos) / len(comprimentos) if comprimentos else 0.0,
+            "em_rehash": self.em_rehash(),
+        }
+
+    def items(self):
+        """Gera os pares (chave, valor) visitando apenas os slots ocupados."""
+        if self.em_rehash():
+            self._passo_rehash(len(self._ocupados))
+        listas = [self.slots[indice] for indice in self._ocupados]
+        return (item for lista in listas for item in lista)
+
+    def keys(self):
+        """Gera as chaves da tabela."""
+        for chave, _ in self.items():
+            yield chave
+
+    def values(self):
+        """Gera os valores da tabela."""
+        for _, valor in self.items():
+            yield valor
+
+    def __iter__(self):
+        return self.keys()
 
     def get_all_items(self):
         """Retorna todos os itens da tabela hash."""
-        todos_itens = []
-        for lista in self.slots:
-            todos_itens.extend(lista.get_items())
-        return todos_itens
+        return list(self.items())
+
+
+class TabelaHashConcorrente:
+    """
+    Tabela Hash com Encadeamento Separado segura para várias threads.
+
+    As escritas usam travas por faixa (lock striping): o slot h é protegido
+    pela trava h % faixas, e como a capacidade é sempre um múltiplo de
+    `faixas` (ambas potências de 2), cada chave fica na mesma faixa antes e
+    depois de um redimensionamento. Escritas em faixas diferentes não
+    disputam a mesma trava.
+
+    As leituras (`get`) não usam trava. Elas dependem de a atribuição de uma
+    referência ser atômica: a escrita só altera `valor`/`next` de um nó ou
+    `head`/`tail` de uma lista, então quem percorre a lista vê o estado de
+    antes ou de depois, nunca um intermediário. O redimensionamento segura
+    todas as faixas, monta um array novo com nós novos e troca `slots` de uma
+    vez; uma leitura em andamento termina no array antigo, que não é mais
+    alterado.
+
+    A iteração (`items`, `keys`, `values`) percorre um instantâneo tirado
+    com todas as faixas travadas: o conteúdo é o de um único momento, mesmo
+    com escritas acontecendo durante a iteração.
+    """
+    def __init__(self, tamanho=256, fator_carga_max=0.75, faixas=16):
+        self.faixas = 1 << max(faixas - 1, 0).bit_length()
+        self.tamanho = max(1 << max(tamanho - 1, 0).bit_length(), self.faixas)
+        self.fator_carga_max = fator_carga_max
+        self.slots = [ListaEncadeadaSimples() for _ in range(self.tamanho)]
+        self._travas = [threading.Lock() for _ in range(self.faixas)]
+        # Quantidade de elementos por faixa, alterada só com a trava da faixa
+        self._contagens = [0] * self.faixas
+
+    def __len__(self):
+        return sum(self._contagens)
+
+    def fator_carga(self):
+        return len(self) / self.tamanho
+
+    def _travar_todas(self):
+        # Sempre na mesma ordem, para não haver impasse entre duas threads
+        for trava in self._travas:
+            trava.acquire()
+
+    def _destravar_todas(self):
+        for trava in reversed(self._travas):
+            trava.release()
+
+    def _redimensionar(self):
+        self._travar_todas()
+        try:
+            if len(self) <= self.fator_carga_max * self.tamanho:
+                return  # outra thread já redimensionou
+            novo_tamanho = self.tamanho * 2
+            novos = [ListaEncadeadaSimples() for _ in range(novo_tamanho)]
+            for lista in self.slots:
+                for chave, valor in lista:
+                    novos[hash(chave) % novo_tamanho].put(chave, valor)
+            self.slots = novos
+            self.tamanho = novo_tamanho
+        finally:
+            self._destravar_todas()
+
+    def put(self, chave, valor):
+        h = hash(chave)
+        faixa = h % self.faixas
+        with self._travas[faixa]:
+            # `slots` é lido com a trava: um redimensionamento não o troca enquanto ela estiver segura
+            slots = self.slots
+            if not slots[h % len(slots)].put(chave, valor):
+                return
+            self._contagens[faixa] += 1
+        if len(self) > self.fator_carga_max * self.tamanho:
+            self._redimensionar()
+
+    def get(self, chave):
+        slots = self.slots
+        return slots[hash(chave) % len(slots)].get(chave)
+
+    def obter_ou_criar(self, chave, criar):
+        """
+        Retorna o valor da chave; se ela não existir, grava `criar()` e o
+        retorna. Threads que chamam ao mesmo tempo para a mesma chave recebem
+        o mesmo valor.
+        """
+        valor = self.get(chave)
+        if valor is not None:
+            return valor
+        h = hash(chave)
+        faixa = h % self.faixas
+        with self._travas[faixa]:
+            slots = self.slots
+            lista = slots[h % len(slots)]
+            valor = lista.get(chave)
+            if valor is not None:
+                return valor
+            valor = criar()
+            lista.put(chave, valor)
+            self._contagens[faixa] += 1
+        if len(self) > self.fator_carga_max * self.tamanho:
+            self._redimensionar()
+        return valor
+
+    def delete(self, chave):
+        h = hash(chave)
+        faixa = h % self.faixas
+        with self._travas[faixa]:
+            slots = self.slots
+            if not slots[h % len(slots)].delete(chave):
+                return False
+            self._contagens[faixa] -= 1
+        return True
+
+    def estatisticas(self):
+        self._travar_todas()
+        try:
+            comprimentos = [lista.comprimento for lista in self.slots if lista.comprimento]
+        finally:
+            self._destravar_todas()
+        elementos = sum(comprimentos)
+        return {
+            "elementos": elementos,
+            "capacidade": self.tamanho,
+            "fator_carga": elementos / self.tamanho,
+            "comprimento_max": max(comprimentos, default=0),
+            "comprimento_medio": elementos / len(comprimentos) if comprimentos else 0.0,
+            "faixas": self.faixas,
+        }
+
+    def get_all_items(self):
+        """Todos os itens, como estavam em um único momento."""
+        self._travar_todas()
+        try:
+            return [item for lista in self.slots for item in lista]
+        finally:
+            self._destravar_todas()
+
+    def items(self):
+        """Gera os pares (chave, valor) de um instantâneo da tabela."""
+        yield from self.get_all_items()
+
+    def keys(self):
+        for chave, _ in self.items():
+            yield chave
+
+    def values(self):
+        for _, valor in self.items():
+            yield valor
 
+    def __iter__(self):
+        return self.keys()
+
+
+# Marcadores das posições da tabela de endereçamento aberto
+_VAZIO = object()
+_REMOVIDO = object()
+
+
+class TabelaHashAberta:
+    """
+    Tabela Hash com Endereçamento Aberto e sondagem linear.
+
+    Alternativa compacta à `TabelaHashEncadeada`, com a mesma API
+    (`put`/`get`/`delete`/`get_all_items`). Em vez de um nó e uma lista por
+    entrada, guarda chaves, valores e hashes em três arrays paralelos.
+    Remoções deixam uma lápide (`_REMOVIDO`) para não quebrar as sequências de
+    sondagem; as lápides são descartadas no próximo redimensionamento.
+    """
+    def __init__(self, tamanho=256, fator_carga_max=0.6):
+        # Capacidade sempre potência de 2 para trocar o módulo por uma máscara
+        capacidade = 8
+        while capacidade < tamanho:
+            capacidade *= 2
+        self.fator_carga_max = fator_carga_max
+        self.quantidade_elementos = 0
+        self._alocar(capacidade)
+
+    def _alocar(self, capacidade):
+        self.tamanho = capacidade
+        self._mascara = capacidade - 1
+        self._chaves = [_VAZIO] * capacidade
+        self._valores = [None] * capacidade
+        self._hashes = [0] * capacidade
+        self._removidos = 0
+
+    def _procurar(self, chave, h):
+        """Retorna o índice da chave, ou -1 se ela não estiver na tabela."""
+        chaves, hashes, mascara = self._chaves, self._hashes, self._mascara
+        i = h & mascara
+        while True:
+            k = chaves[i]
+            if k is _VAZIO:
+                return -1
+            if k is not _REMOVIDO and hashes[i] == h and (k is chave or k == chave):
+                return i
+            i = (i + 1) & mascara
+
+    def _redimensionar(self, nova_capacidade):
+        itens = [(self._hashes[i], self._chaves[i], self._valores[i])
+                 for i in range(self.tamanho)
+                 if self._chaves[i] is not _VAZIO and self._chaves[i] is not _REMOVIDO]
+        self._alocar(nova_capacidade)
+        chaves, valores, hashes, mascara = self._chaves, self._valores, self._hashes, self._mascara
+        for h, chave, valor in itens:
+            i = h & mascara
+            while chaves[i] is not _VAZIO:
+                i = (i + 1) & mascara
+            chaves[i], valores[i], hashes[i] = chave, valor, h
+
+    def __len__(self):
+        return self.quantidade_elementos
+
+    def fator_carga(self):
+        """Razão entre a quantidade de elementos e a capacidade atual."""
+        return self.quantidade_elementos / self.tamanho
+
+    def put(self, chave, valor):
+        h = hash(chave)
+        chaves, mascara = self._chaves, self._mascara
+        i = h & mascara
+        primeira_lapide = -1
+        while True:
+            k = chaves[i]
+            if k is _VAZIO:
+                break
+            if k is _REMOVIDO:
+                if primeira_lapide < 0:
+                    primeira_lapide = i
+            elif self._hashes[i] == h and (k is chave or k == chave):
+                self._valores[i] = valor
+                return
+            i = (i + 1) & mascara
+
+        if primeira_lapide >= 0:
+            # Reaproveita a lápide mais próxima do início da sondagem
+            i = primeira_lapide
+            self._removidos -= 1
+        chaves[i] = chave
+        self._valores[i] = valor
+        self._hashes[i] = h
+        self.quantidade_elementos += 1
+
+        if self.quantidade_elementos + self._removidos > self.fator_carga_max * self.tamanho:
+            # Se a ocupação é causada por lápides, basta reconstruir no mesmo tamanho
+            if self.quantidade_elementos > self.fator_carga_max * self.tamanho / 2:
+                self._redimensionar(self.tamanho * 2)
+            else:
+                self._redimensionar(self.tamanho)
+
+    def get(self, chave):
+        i = self._procurar(chave, hash(chave))
+        return None if i < 0 else self._valores[i]
+
+    def delete(self, chave):
+        i = self._procurar(chave, hash(chave))
+        if i < 0:
+            return False
+        self._chaves[i] = _REMOVIDO
+        self._valores[i] = None
+        self._removidos += 1
+        self.quantidade_elementos -= 1
+        return True
+
+    def estatisticas(self):
+        """
+        Retorna métricas de ocupação da tabela: quantidade de elementos,
+        capacidade, fator de carga, lápides e a distância de sondagem
+        máxima/média das chaves em relação ao slot ideal.
+        """
+        distancias = []
+        for i in range(self.tamanho):
+            k = self._chaves[i]
+            if k is not _VAZIO and k is not _REMOVIDO:
+                distancias.append((i - (self._hashes[i] & self._mascara)) & self._mascara)
+        return {
+            "elementos": self.quantidade_elementos,
+            "capacidade": self.tamanho,
+            "fator_carga": self.fator_carga(),
+            "lapides": self._removidos,
+            "sondagem_max": max(distancias, default=0),
+            "sondagem_media": sum(distancias) / len(distancias) if distancias else 0.0,
+        }
+
+    def items(self):
+        """Gera os pares (chave, valor) sem montar uma lista intermediária."""
+        chaves, valores = self._chaves, self._valores
+        for i in range(len(chaves)):
+            k = chaves[i]
+            if k is not _VAZIO and k is not _REMOVIDO:
+                yield k, valores[i]
+
+    def keys(self):
+        """Gera as chaves da tabela."""
+        for chave, _ in self.items():
+            yield chave
+
+    def values(self):
+        """Gera os valores da tabela."""
+        for _, valor in self.items():
+            yield valor
+
+    def __iter__(self):
+        return self.keys()
+
+    def get_all_items(self):
+        """Retorna todos os itens da tabela hash."""
+        return list(self.items())
+
+
+class NoSalto:
+    """Nó da lista de saltos, com um ponteiro `proximos[i]` para cada nível."""
+    __slots__ = ("chave", "valor", "proximos")
+
+    def __init__(self, chave, valor, nivel):
+        self.chave = chave
+        self.valor = valor
+        self.proximos = [None] * nivel
+
+
+class ListaDeSaltos:
+    """
+    Lista de saltos (skip list): um mapa mantido em ordem de chave.
+
+    O nível 0 é uma lista encadeada ordenada com todos os nós; cada nó sobe
+    para o nível seguinte com probabilidade `p`, formando "atalhos". A busca
+    começa no nível mais alto e desce quando o próximo nó passaria da chave,
+    então `put`/`get`/`delete` custam O(log n) em média, e percorrer as
+    chaves a partir de uma posição (`items(inicio, fim)`, `com_prefixo`,
+    `primeiros`) custa O(log n + k) para k itens.
+
+    As chaves precisam ser comparáveis entre si (ex.: strings ou tuplas).
+    """
+    NIVEL_MAX = 32
+
+    def __init__(self, p=0.25, semente=None):
+        self.p = p
+        self._cabeca = NoSalto(None, None, self.NIVEL_MAX)
+        self.nivel = 1
+        self.quantidade_elementos = 0
+        self._aleatorio = random.Random(semente)
+
+    @classmethod
+    def de_itens_ordenados(cls, itens, p=0.25, semente=None):
+        """Monta a lista em O(n) a partir de pares (chave, valor) já em ordem crescente e sem repetição."""
+        lista = cls(p, semente)
+        ultimos = [lista._cabeca] * cls.NIVEL_MAX
+        for chave, valor in itens:
+            nivel = lista._sortear_nivel()
+            no = NoSalto(chave, valor, nivel)
+            for i in range(nivel):
+                ultimos[i].proximos[i] = no
+                ultimos[i] = no
+            if nivel > lista.nivel:
+                lista.nivel = nivel
+            lista.quantidade_elementos += 1
+        return lista
+
+    def __len__(self):
+        return self.quantidade_elementos
+
+    def _sortear_nivel(self):
+        nivel = 1
+        while nivel < self.NIVEL_MAX and self._aleatorio.random() < self.p:
+            nivel += 1
+        return nivel
+
+    def _anteriores(self, chave):
+        """Último nó com chave menor que `chave` em cada nível."""
+        anteriores = [self._cabeca] * self.NIVEL_MAX
+        no = self._cabeca
+        for i in range(self.nivel - 1, -1, -1):
+            proximo = no.proximos[i]
+            while proximo is not None and proximo.chave < chave:
+                no = proximo
+                proximo = no.proximos[i]
+            anteriores[i] = no
+        return anteriores
+
+    def _primeiro_a_partir(self, chave):
+        """Primeiro nó com chave maior ou igual a `chave` (None se não houver)."""
+        no = self._cabeca
+        for i in range(self.nivel - 1, -1, -1):
+            proximo = no.proximos[i]
+            while proximo is not None and proximo.chave < chave:
+                no = proximo
+                proximo = no.proximos[i]
+        return no.proximos[0]
+
+    def put(self, chave, valor):
+        """Insere ou atualiza a chave. Retorna True se um novo nó foi criado."""
+        anteriores = self._anteriores(chave)
+        no = anteriores[0].proximos[0]
+        if no is not None and no.chave == chave:
+            no.valor = valor
+            return False
+        nivel = self._sortear_nivel()
+        if nivel > self.nivel:
+            # Nos níveis novos o anterior é a própria cabeça, já em `anteriores`
+            self.nivel = nivel
+        novo = NoSalto(chave, valor, nivel)
+        for i in range(nivel):
+            novo.proximos[i] = anteriores[i].proximos[i]
+            anteriores[i].proximos[i] = novo
+        self.quantidade_elementos += 1
+        return True
+
+    def get(self, chave):
+        no = self._primeiro_a_partir(chave)
+        return no.valor if no is not None and no.chave == chave else None
+
+    def delete(self, chave):
+        anteriores = self._anteriores(chave)
+        no = anteriores[0].proximos[0]
+        if no is None or no.chave != chave:
+            return False
+        for i in range(len(no.proximos)):
+            anteriores[i].proximos[i] = no.proximos[i]
+        while self.nivel > 1 and self._cabeca.proximos[self.nivel - 1] is None:
+            self.nivel -= 1
+        self.quantidade_elementos -= 1
+        return True
+
+    def items(self, inicio=None, fim=None):
+        """Gera os pares (chave, valor) em ordem, com chaves no intervalo [inicio, fim)."""
+        no = self._cabeca.proximos[0] if inicio is None else self._primeiro_a_partir(inicio)
+        while no is not None and (fim is None or no.chave < fim):
+            # Guarda o próximo antes de devolver o nó, permitindo removê-lo
+            proximo = no.proximos[0]
+            yield no.chave, no.valor
+            no = proximo
+
+    def primeiros(self, k):
+        """Os k primeiros pares (chave, valor), em ordem."""
+        return list(itertools.islice(self.items(), k))
+
+    def com_prefixo(self, prefixo):
+        """Gera os pares cujas chaves (strings) começam com `prefixo`."""
+        for chave, valor in self.items(prefixo):
+            if not chave.startswith(prefixo):
+                return
+            yield chave, valor
+
+    def keys(self):
+        """Gera as chaves em ordem."""
+        for chave, _ in self.items():
+            yield chave
+
+    def values(self):
+        """Gera os valores na ordem das chaves."""
+        for _, valor in self.items():
+            yield valor
+
+    def __iter__(self):
+        return self.keys()
+
+    def get_all_items(self):
+        """Retorna todos os itens, em ordem de chave."""
+        return list(self.items())
@@ -0,0 +1,265 @@
+import os
+import socket
+import stat
+import threading
+import time
+
+from importacao_tardia import pd
+from metricas import METRICAS
+
+
+class FilaCoalescente:
+    """
+    Fila limitada de cotações que guarda apenas o último preço de cada ticker.
+
+    O produtor grava blocos de ticks com `colocar_lote`; se o ticker já está
+    pendente, o preço é substituído, pois o tick anterior ficou obsoleto. O
+    consumidor retira de uma vez tudo o que está pendente com `retirar`.
+    Assim, quando o consumidor atrasa, a fila cresce com a quantidade de
+    tickers distintos, e não com a de ticks.
+
+    `capacidade` limita os tickers pendentes: ao atingi-la, o produtor espera
+    o consumidor (contrapressão). Como cada bloco é gravado inteiro, o limite
+    pode ser excedido em até um bloco.
+    """
+    def __init__(self, capacidade=10_000):
+        self.capacidade = capacidade
+        self._pendentes = {}
+        self._condicao = threading.Condition()
+        self._fechada = False
+        self.recebidos = 0
+        self.coalescidos = 0
+        self.esperas = 0
+
+    def __len__(self):
+        return len(self._pendentes)
+
+    @property
+    def fechada(self):
+        return self._fechada
+
+    def colocar_lote(self, codigos, precos, timeout=None):
+        """
+        Grava um bloco de ticks (listas alinhadas de tickers e preços, na
+        ordem em que ocorreram). Retorna False se a fila for fechada, ou o
+        tempo acabar, antes de haver espaço.
+        """
+        with self._condicao:
+            if len(self._pendentes) >= self.capacidade and not self._fechada:
+                self.esperas += 1
+                if not self._condicao.wait_for(
+                        lambda: len(self._pendentes) < self.capacidade or self._fechada, timeout):
+                    return False
+            if self._fechada:
+                return False
+            antes = len(self._pendentes)
+            # Em um dict, o último preço de cada ticker no bloco prevalece
+            self._pendentes.update(zip(codigos, precos))
+            coalescidos = len(codigos) - (len(self._pendentes) - antes)
+            self.recebidos += len(codigos)
+            self.coalescidos += coalescidos
+            self._condicao.notify_all()
+        METRICAS.contar("ticks_recebidos", len(codigos))
+        METRICAS.contar("ticks_coalescidos", coalescidos)
+        return True
+
+    def colocar(self, codigo, preco, timeout=None):
+        return self.colocar_lote((codigo,), (preco,), timeout)
+
+    def retirar(self, timeout=None):
+        """
+        Retira tudo o que está pendente, como {ticker: último preço}. Espera
+        até `timeout` segundos por um tick; devolve um dict vazio se nada
+        chegar ou se a fila estiver fechada e vazia.
+        """
+        with self._condicao:
+            if not self._pendentes and not self._fechada:
+                self._condicao.wait_for(lambda: self._pendentes or self._fechada, timeout)
+            lote, self._pendentes = self._pendentes, {}
+            self._condicao.notify_all()
+        return lote
+
+    def fechar(self):
+        """Recusa novos ticks; os pendentes ainda podem ser retirados."""
+        with self._condicao:
+            self._fechada = True
+            self._condicao.notify_all()
+
+
+def em_blocos(ticks, tamanho_bloco=10_000):
+    """Agrupa um iterável de ticks (codigo, preco) nos blocos (codigos, precos) usados pela fila."""
+    codigos, precos = [], []
+    for codigo, preco in ticks:
+        codigos.append(codigo)
+        precos.append(preco)
+        if len(codigos) >= tamanho_bloco:
+            yield codigos, precos
+            codigos, precos = [], []
+    if codigos:
+        yield codigos, precos
+
+
+def ticks_de_arquivo(caminho, tamanho_bloco=50_000):
+    """
+    Reproduz ticks gravados em CSV ou Parquet (colunas codigo e preco, na
+    ordem em que ocorreram), o mais rápido possível, em blocos (codigos, precos).
+    """
+    if caminho.endswith(".parquet"):
+        df = pd.read_parquet(caminho, columns=["codigo", "preco"])
+        blocos = (df.iloc[i:i + tamanho_bloco] for i in range(0, len(df), tamanho_bloco))
+    else:
+        blocos = pd.read_csv(caminho, usecols=["codigo", "preco"], dtype={"codigo": str, "preco": float},
+                             chunksize=tamanho_bloco)
+    for bloco in blocos:
+        yield bloco["codigo"].tolist(), bloco["preco"].tolist()
+
+
+def ticks_de_socket(caminho, tamanho_leitura=1 << 16):
+    """
+    Lê ticks de um socket Unix no formato texto "CODIGO,PRECO", um por
+    linha, e devolve em um bloco tudo o que chega a cada leitura. Linhas
+    inválidas são ignoradas. Termina quando o outro lado fecha a conexão.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        conexao.connect(caminho)
+        resto = b""
+        while True:
+            dados = conexao.recv(tamanho_leitura)
+            if not dados:
+                break
+            linhas = (resto + dados).split(b"\n")
+            resto = linhas.pop()  # linha ainda incompleta
+            codigos, precos = [], []
+            for linha in linhas:
+                codigo, _, preco = linha.partition(b",")
+                try:
+                    precos.append(float(preco))
+                except ValueError:
+                    continue
+                codigos.append(codigo.strip().decode())
+            if codigos:
+                yield codigos, precos
+
+
+def abrir_fonte(origem, tamanho_bloco=50_000):
+    """
+    Fonte de ticks a partir de um caminho: socket Unix ou arquivo CSV/Parquet.
+    Retorna None se o caminho não existir ou não puder ser acessado.
+    """
+    try:
+        modo = os.stat(origem).st_mode
+    except OSError as e:
+        print(f"ERRO: Fonte de cotações indisponível ({origem}): {e.strerror}.")
+        return None
+    if stat.S_ISSOCK(modo):
+        return ticks_de_socket(origem)
+    return ticks_de_arquivo(origem, tamanho_bloco)
+
+
+class IngestorCotacoes:
+    """
+    Leva cotações de uma fonte local até o `PortfolioManager`.
+
+    Uma thread produtora percorre a fonte, que é um iterável de blocos
+    (codigos, precos) como os de `ticks_de_arquivo`, `ticks_de_socket` ou
+    `em_blocos`, e grava os blocos na `FilaCoalescente`. O consumo é feito em
+    micro-lotes: cada lote contém o último preço de cada ticker desde o lote
+    anterior e é aplicado com `aplicar_cotacoes`, que marca só as linhas
+    afetadas e mantém os totais da carteira.
+
+    Há dois modos de consumo:
+    - `iniciar(consumir=True)`: uma thread aplica um lote a cada
+      `intervalo_lote` segundos, segurando `trava`. Quem alterar o portfólio
+      em outras threads deve usar a mesma trava, ou criá-lo com
+      `PortfolioManager(concorrente=True)`;
+    - `iniciar(consumir=False)` e `aplicar_pendentes()` chamado pelo dono do
+      portfólio quando quiser (ex.: periodicamente pelo dashboard), sem
+      nenhuma concorrência sobre o portfólio.
+
+    Um `intervalo_lote` maior coalesce mais ticks e faz menos marcações.
+
+    Com `indicadores=True`, os preços de cada lote que pertencem à carteira
+    (e o do ^BVSP) também alimentam os indicadores ao vivo do analisador do
+    portfólio (`FerramentasDeAnalise.registrar_cotacoes`).
+    """
+    def __init__(self, portfolio, fonte, capacidade=10_000, intervalo_lote=0.01, trava=None, indicadores=True):
+        self.portfolio = portfolio
+        self.indicadores = indicadores
+        self.fonte = fonte
+        self.fila = FilaCoalescente(capacidade)
+        self.intervalo_lote = intervalo_lote
+        self.trava = trava if trava is not None else threading.Lock()
+        self.lotes = 0
+        self.aplicados = 0
+        self.erro = None
+        self._parar = threading.Event()
+        self._produtor = None
+        self._consumidor = None
+
+    def _produzir(self):
+        try:
+            for codigos, precos in self.fonte:
+                if self._parar.is_set() or not self.fila.colocar_lote(codigos, precos):
+                    break
+        except Exception as e:
+            self.erro = e
+            print(f"ERRO na fonte de cotações: {e}")
+        finally:
+            self.fila.fechar()
+
+    def aplicar_pendentes(self, timeout=0):
+        """Aplica um micro-lote com o que estiver na fila. Retorna quantas posições foram atualizadas."""
+        lote = self.fila.retirar(timeout)
+        if not lote:
+            return 0
+        with METRICAS.cronometro("lote_cotacoes_segundos"), self.trava:
+            atualizados = self.portfolio.aplicar_cotacoes(lote)
+            em_carteira = self.portfolio.cotacoes_em_carteira(lote) if self.indicadores else None
+        if em_carteira:
+            # Fora da trava: a primeira cotação de um ativo busca o histórico para semear os indicadores
+            self.portfolio.analisador.registrar_cotacoes(em_carteira)
+        self.lotes += 1
+        self.aplicados += atualizados
+        return atualizados
+
+    def _consumir(self):
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            self.aplicar_pendentes(timeout=0.1)
+            if self.fila.fechada and not len(self.fila):
+                break
+            # Espera o restante do intervalo para acumular (e coalescer) mais ticks
+            espera = self.intervalo_lote - (time.monotonic() - inicio)
+            if espera > 0:
+                self._parar.wait(espera)
+
+    def iniciar(self, consumir=True):
+        self._produtor = threading.Thread(target=self._produzir, name="ticks-produtor", daemon=True)
+        self._produtor.start()
+        if consumir:
+            self._consumidor = threading.Thread(target=self._consumir, name="ticks-consumidor", daemon=True)
+            self._consumidor.start()
+        return self
+
+    def aguardar(self, timeout=None):
+        """Espera a fonte terminar e a fila esvaziar (no modo com consumidor próprio)."""
+        for thread in (self._produtor, self._consumidor):
+            if thread is not None:
+                thread.join(timeout)
+        return self.estatisticas()
+
+    def parar(self):
+        """Interrompe a leitura da fonte e o consumidor; os ticks ainda na fila são descartados."""
+        self._parar.set()
+        self.fila.fechar()
+        self.aguardar(timeout=1.0)
+
+    def estatisticas(self):
+        return {
+            "recebidos": self.fila.recebidos,
+            "coalescidos": self.fila.coalescidos,
+            "lotes": self.lotes,
+            "aplicados": self.aplicados,
+            "esperas_produtor": self.fila.esperas,
+            "pendentes": len(self.fila),
+        }
@@ -0,0 +1,220 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+import numpy as np
+from importacao_tardia import pd
+
+from metricas import METRICAS
+from provedores_dados import DIAS_POR_PERIODO
+
+# Colunas OHLCV e o tipo binário de cada uma
+COLUNAS = {"Open": np.float64, "High": np.float64, "Low": np.float64, "Close": np.float64, "Volume": np.float64}
+
+# Validade padrão dos históricos diários ou mais longos, em segundos
+VALIDADE_DIARIA = 12 * 3600
+# Duração em segundos das barras intradiárias: um histórico desses vence junto com a sua última barra
+DURACAO_INTRADIARIA = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800,
+                       "60m": 3600, "90m": 5400, "1h": 3600}
+
+
+class ArmazemHistorico:
+    """
+    Armazenamento local e colunar dos históricos OHLCV.
+
+    Cada par (ticker, intervalo) fica em uma pasta com um arquivo binário por
+    coluna (`tempo.bin` com os instantes em ns UTC e um `.bin` para cada coluna
+    OHLCV) e um `meta.json` com a quantidade de linhas válidas. Os arquivos são
+    abertos com `np.memmap`, então ler um intervalo de datas carrega apenas as
+    linhas da fatia (localizadas por busca binária em `tempo.bin`).
+
+    Ao atualizar, apenas as barras posteriores à última gravada são buscadas no
+    provedor e acrescentadas ao fim dos arquivos. A última barra é sempre
+    regravada, pois pode ter sido salva ainda em formação. O `meta.json` é
+    atualizado por último e de forma atômica: se o processo cair no meio de uma
+    escrita, as linhas extras são descartadas na próxima atualização.
+
+    Um histórico é considerado atual, sem consultar o provedor, por
+    `validade` segundos. Sem `validade`, o prazo depende do intervalo: a
+    duração de uma barra nos intradiários (15 minutos para "15m") e
+    `VALIDADE_DIARIA` nos demais.
+
+    Leituras e atualizações de um mesmo (ticker, intervalo) são serializadas
+    por uma trava por pasta, entre as threads desta instância, e por `flock`
+    no arquivo `.trava` da pasta, entre processos (ex.: os da `Triagem`) e
+    outras instâncias sobre o mesmo diretório. Tickers diferentes não
+    disputam a mesma trava.
+    """
+    def __init__(self, diretorio, provedor, validade=None):
+        self.diretorio = diretorio
+        self.provedor = provedor
+        self.validade = validade
+        self._travas = {}
+        self._trava_travas = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def validade_para(self, intervalo):
+        """Segundos em que um histórico do `intervalo` é considerado atual."""
+        if self.validade is not None:
+            return self.validade
+        return min(VALIDADE_DIARIA, DURACAO_INTRADIARIA.get(intervalo, VALIDADE_DIARIA))
+
+    def _pasta(self, codigo, intervalo):
+        nome = "".join(c if c.isalnum() or c in ".-_" else "_" for c in codigo)
+        return os.path.join(self.diretorio, f"{nome}__{intervalo}")
+
+    @contextlib.contextmanager
+    def _travado(self, pasta):
+        """Acesso exclusivo à pasta de um (ticker, intervalo)."""
+        with self._trava_travas:
+            trava = self._travas.setdefault(pasta, threading.Lock())
+        with trava:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, ".trava"), "a") as arquivo:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+    def _ler_meta(self, pasta):
+        caminho = os.path.join(pasta, "meta.json")
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+
+    def _gravar_meta(self, pasta, meta):
+        temporario = os.path.join(pasta, "meta.json.tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, os.path.join(pasta, "meta.json"))
+
+    def _coluna(self, pasta, nome, dtype, linhas):
+        caminho = os.path.join(pasta, f"{nome}.bin")
+        if linhas == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(caminho, dtype=dtype, mode="r", shape=(linhas,))
+
+    def _gravar(self, pasta, meta, dados, a_partir_de):
+        """Escreve `dados` a partir da linha `a_partir_de`, truncando o que vier depois."""
+        os.makedirs(pasta, exist_ok=True)
+        indice = dados.index
+        fuso = str(indice.tz) if indice.tz is not None else None
+        tempos = (indice.tz_convert("UTC").tz_localize(None) if fuso else indice).as_unit("ns").asi8
+        colunas = {"tempo": (tempos, np.int64)}
+        colunas.update({nome: (dados[nome].to_numpy(dtype=dtype), dtype) for nome, dtype in COLUNAS.items()})
+        for nome, (valores, dtype) in colunas.items():
+            caminho = os.path.join(pasta, f"{nome}.bin")
+            with open(caminho, "ab") as arquivo:
+                arquivo.truncate(a_partir_de * np.dtype(dtype).itemsize)
+                arquivo.write(np.ascontiguousarray(valores, dtype=dtype).tobytes())
+        meta = dict(meta or {})
+        meta["linhas"] = a_partir_de + len(dados)
+        meta["fuso"] = fuso if fuso else meta.get("fuso")
+        meta["atualizado_em"] = time.time()
+        self._gravar_meta(pasta, meta)
+        return meta
+
+    def atualizar(self, codigo, intervalo="1d", periodo="1y"):
+        """
+        Garante que o histórico local cubra `periodo` e esteja em dia,
+        buscando no provedor apenas o que falta. Retorna o meta atualizado.
+        """
+        pasta = self._pasta(codigo, intervalo)
+        with self._travado(pasta):
+            return self._atualizar(pasta, codigo, intervalo, periodo)
+
+    def _atualizar(self, pasta, codigo, intervalo, periodo):
+        meta = self._ler_meta(pasta)
+        inicio_desejado = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=DIAS_POR_PERIODO.get(periodo, 365))
+
+        if meta is None or meta["linhas"] == 0 or inicio_desejado.value < meta["inicio_coberto"]:
+            # Sem dados ou período maior que o coberto: busca o período inteiro
+            METRICAS.contar("historico_local_atualizacoes", tipo="completa")
+            with METRICAS.cronometro("provedor_segundos", operacao="historico"):
+                dados = self.provedor.historico(codigo, periodo=periodo, intervalo=intervalo)
+            if dados is None or dados.empty:
+                return meta
+            meta = self._gravar(pasta, {"inicio_coberto": inicio_desejado.value}, dados, 0)
+            return meta
+
+        if time.time() - meta["atualizado_em"] < self.validade_para(intervalo):
+            METRICAS.contar("historico_local_atualizacoes", tipo="em_dia")
+            return meta
+
+        linhas = meta["linhas"]
+        ultimo = int(self._coluna(pasta, "tempo", np.int64, linhas)[-1])
+        inicio = pd.Timestamp(ultimo, tz="UTC")
+        METRICAS.contar("historico_local_atualizacoes", tipo="incremental")
+        with METRICAS.cronometro("provedor_segundos", operacao="historico_desde"):
+            novos = self.provedor.historico_desde(codigo, inicio, intervalo=intervalo)
+        if novos is None or novos.empty:
+            meta["atualizado_em"] = time.time()
+            self._gravar_meta(pasta, meta)
+            return meta
+        tempos_novos = np.array([_em_ns(t) for t in novos.index])
+        novos = novos.loc[tempos_novos >= ultimo]
+        if novos.empty:
+            return meta
+        # Regrava a última barra (pode ter sido salva incompleta) e acrescenta as novas
+        a_partir_de = linhas - 1 if _em_ns(novos.index[0]) == ultimo else linhas
+        return self._gravar(pasta, meta, novos, a_partir_de)
+
+    def ler(self, codigo, intervalo="1d", inicio=None, fim=None):
+        """DataFrame OHLCV com as barras em [inicio, fim], lendo apenas essa fatia do disco."""
+        pasta = self._pasta(codigo, intervalo)
+        if not os.path.isdir(pasta):
+            return None
+        with self._travado(pasta):
+            return self._ler(pasta, inicio, fim)
+
+    def _ler(self, pasta, inicio=None, fim=None, dias=None):
+        """
+        Como `ler`, com a trava já tomada. Com `dias`, o início é contado a
+        partir da última barra gravada.
+        """
+        meta = self._ler_meta(pasta)
+        if meta is None or meta["linhas"] == 0:
+            return None
+        linhas = meta["linhas"]
+        tempos = self._coluna(pasta, "tempo", np.int64, linhas)
+        if dias is not None:
+            inicio = pd.Timestamp(int(tempos[-1])) - pd.Timedelta(days=dias)
+        a = 0 if inicio is None else int(np.searchsorted(tempos, _em_ns(inicio), side="left"))
+        b = linhas if fim is None else int(np.searchsorted(tempos, _em_ns(fim), side="right"))
+        indice = pd.DatetimeIndex(np.array(tempos[a:b]).view("datetime64[ns]"))
+        if meta.get("fuso"):
+            indice = indice.tz_localize("UTC").tz_convert(meta["fuso"])
+        colunas = {nome: np.array(self._coluna(pasta, nome, dtype, linhas)[a:b]) for nome, dtype in COLUNAS.items()}
+        return pd.DataFrame(colunas, index=indice)
+
+    def historico(self, codigo, periodo="1y", intervalo="1d"):
+        """
+        Atualiza se necessário e devolve o período pedido a partir do disco.
+        O período termina na última barra gravada, e não no relógio: um
+        provedor com data final fixa (ex.: `ProvedorLocal`) ou um mercado
+        fechado não encurtam o resultado.
+        """
+        pasta = self._pasta(codigo, intervalo)
+        with self._travado(pasta):
+            self._atualizar(pasta, codigo, intervalo, periodo)
+            return self._ler(pasta, dias=DIAS_POR_PERIODO.get(periodo, 365))
+
+
+def _em_ns(instante):
+    """Instante em nanossegundos UTC (datas sem fuso são tratadas como UTC)."""
+    instante = pd.Timestamp(instante)
+    if instante.tz is not None:
+        instante = instante.tz_convert("UTC").tz_localize(None)
+    return instante.value
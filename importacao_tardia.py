@@ -0,0 +1,31 @@
+import importlib
+
+
+class ModuloTardio:
+    """
+    Substituto de um módulo pesado que só o importa no primeiro acesso a um
+    atributo (ex.: `pd.DataFrame`). Cada atributo lido fica guardado no
+    próprio objeto, então os acessos seguintes custam o mesmo que no módulo.
+
+    Os módulos que usam o pandas ou o NumPy apenas em parte das funções os
+    importam assim, no topo, em vez de repetir o import em cada função:
+    importar esses módulos, ou carregar e exibir a carteira (ver cli.py),
+    não paga o custo dos dois.
+    """
+    def __init__(self, nome):
+        self._nome = nome
+
+    def __getattr__(self, atributo):
+        if atributo == "_nome":
+            # Cópia ou desserialização ainda sem __init__
+            raise AttributeError(atributo)
+        valor = getattr(importlib.import_module(self._nome), atributo)
+        setattr(self, atributo, valor)
+        return valor
+
+    def __repr__(self):
+        return f"ModuloTardio({self._nome!r})"
+
+
+np = ModuloTardio("numpy")
+pd = ModuloTardio("pandas")
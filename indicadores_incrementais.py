@@ -0,0 +1,308 @@
+from collections import deque
+import math
+
+
+class _MomentosJanela:
+    """
+    Média e variância de uma janela deslizante pelo método de Welford,
+    com inserção e remoção em O(1). Valores None ocupam posição na janela,
+    mas não entram nas estatísticas (como o NaN de um pct_change).
+    """
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self.valores = deque()
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def _incluir(self, x):
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (x - self.media)
+
+    def _excluir(self, x):
+        if self.n == 1:
+            self.n, self.media, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self.media
+        self.media -= delta / self.n
+        self.m2 -= delta * (x - self.media)
+
+    def adicionar(self, x):
+        self.valores.append(x)
+        if x is not None:
+            self._incluir(x)
+        if len(self.valores) > self.tamanho:
+            antigo = self.valores.popleft()
+            if antigo is not None:
+                self._excluir(antigo)
+
+    def substituir_ultimo(self, x):
+        antigo = self.valores.pop()
+        if antigo is not None:
+            self._excluir(antigo)
+        self.valores.append(x)
+        if x is not None:
+            self._incluir(x)
+
+    def variancia(self):
+        return self.m2 / (self.n - 1) if self.n >= 2 else None
+
+
+class RSIIncremental:
+    """
+    RSI atualizado em O(1) a cada nova barra ou tick.
+
+    metodo="simples" reproduz `FerramentasDeAnalise.calcular_rsi` (média
+    móvel simples dos ganhos e perdas); metodo="wilder" usa a suavização
+    exponencial de Wilder. `adicionar` abre uma nova barra; `revisar` troca o
+    fechamento da barra atual (ex.: um novo tick do mesmo dia).
+    """
+    def __init__(self, periodo=14, metodo="simples"):
+        self.periodo = periodo
+        self.metodo = metodo
+        self.quantidade = 0
+        self._penultimo = None
+        self._ultimo = None
+        # Modo simples: variações da janela e suas somas
+        self._variacoes = deque()
+        self._soma_ganhos = 0.0
+        self._soma_perdas = 0.0
+        # Modo Wilder: médias antes e depois da barra atual
+        self._medias_anteriores = (0.0, 0.0)
+        self._medias = (0.0, 0.0)
+
+    def semear(self, precos):
+        for preco in precos:
+            self.adicionar(preco)
+        return self
+
+    def _aplicar_variacao(self, variacao):
+        ganho, perda = max(variacao, 0.0), max(-variacao, 0.0)
+        if self.metodo == "wilder":
+            media_ganhos, media_perdas = self._medias_anteriores
+            n = min(self.quantidade - 1, self.periodo)
+            if n <= 0:
+                self._medias = (0.0, 0.0)
+            else:
+                self._medias = ((media_ganhos * (n - 1) + ganho) / n, (media_perdas * (n - 1) + perda) / n)
+            return
+        self._variacoes.append(variacao)
+        self._soma_ganhos += ganho
+        self._soma_perdas += perda
+        if len(self._variacoes) > self.periodo:
+            antiga = self._variacoes.popleft()
+            self._soma_ganhos -= max(antiga, 0.0)
+            self._soma_perdas -= max(-antiga, 0.0)
+
+    def _desfazer_variacao(self):
+        if self.metodo == "wilder":
+            return
+        antiga = self._variacoes.pop()
+        self._soma_ganhos -= max(antiga, 0.0)
+        self._soma_perdas -= max(-antiga, 0.0)
+
+    def adicionar(self, preco):
+        """Fecha a barra atual e abre uma nova com o preço informado."""
+        self.quantidade += 1
+        self._penultimo, self._ultimo = self._ultimo, preco
+        self._medias_anteriores = self._medias
+        # A primeira barra não tem variação: conta como zero, como no pandas
+        variacao = 0.0 if self._penultimo is None else preco - self._penultimo
+        self._aplicar_variacao(variacao)
+        return self.valor
+
+    def revisar(self, preco):
+        """Substitui o fechamento da barra atual."""
+        if self.quantidade == 0:
+            return self.adicionar(preco)
+        self._desfazer_variacao()
+        self._ultimo = preco
+        variacao = 0.0 if self._penultimo is None else preco - self._penultimo
+        self._aplicar_variacao(variacao)
+        return self.valor
+
+    @property
+    def valor(self):
+        if self.quantidade < self.periodo:
+            return None
+        if self.metodo == "wilder":
+            media_ganhos, media_perdas = self._medias
+        else:
+            media_ganhos, media_perdas = self._soma_ganhos / self.periodo, self._soma_perdas / self.periodo
+        if media_perdas == 0:
+            return 100.0 if media_ganhos > 0 else None
+        return 100 - (100 / (1 + media_ganhos / media_perdas))
+
+
+class VolatilidadeIncremental:
+    """
+    Volatilidade anualizada (%) dos retornos das últimas `janela` barras,
+    atualizada em O(1) por variância de Welford em janela deslizante.
+    Reproduz `FerramentasDeAnalise.calcular_volatilidade`.
+    """
+    def __init__(self, janela=60, periodos_por_ano=252):
+        self.janela = janela
+        self.periodos_por_ano = periodos_por_ano
+        self.quantidade = 0
+        self._penultimo = None
+        self._ultimo = None
+        self._momentos = _MomentosJanela(janela)
+
+    def semear(self, precos):
+        for preco in precos:
+            self.adicionar(preco)
+        return self
+
+    def _retorno(self, preco):
+        return None if self._penultimo is None else preco / self._penultimo - 1
+
+    def adicionar(self, preco):
+        self.quantidade += 1
+        self._penultimo, self._ultimo = self._ultimo, preco
+        self._momentos.adicionar(self._retorno(preco))
+        return self.valor
+
+    def revisar(self, preco):
+        if self.quantidade == 0:
+            return self.adicionar(preco)
+        self._ultimo = preco
+        self._momentos.substituir_ultimo(self._retorno(preco))
+        return self.valor
+
+    @property
+    def valor(self):
+        variancia = self._momentos.variancia()
+        if self.quantidade < self.janela or variancia is None:
+            return None
+        return math.sqrt(max(variancia, 0.0)) * math.sqrt(self.periodos_por_ano) * 100
+
+
+class BetaIncremental:
+    """
+    Beta dos retornos do ativo contra os do mercado nas últimas `janela`
+    barras, com covariância e variância mantidas em O(1) por atualização.
+    Cada barra recebe o par (preço do ativo, preço do mercado).
+    """
+    def __init__(self, janela=252):
+        self.janela = janela
+        self._anteriores = None
+        self._ultimos = None
+        self._pares = deque()
+        self.n = 0
+        self.media_ativo = 0.0
+        self.media_mercado = 0.0
+        self.comomento = 0.0
+        self.m2_mercado = 0.0
+
+    def semear(self, precos_ativo, precos_mercado):
+        for ativo, mercado in zip(precos_ativo, precos_mercado):
+            self.adicionar(ativo, mercado)
+        return self
+
+    def _incluir(self, x, y):
+        self.n += 1
+        dx = x - self.media_ativo
+        dy = y - self.media_mercado
+        self.media_ativo += dx / self.n
+        self.media_mercado += dy / self.n
+        self.comomento += dx * (y - self.media_mercado)
+        self.m2_mercado += dy * (y - self.media_mercado)
+
+    def _excluir(self, x, y):
+        if self.n == 1:
+            self.n, self.media_ativo, self.media_mercado, self.comomento, self.m2_mercado = 0, 0.0, 0.0, 0.0, 0.0
+            return
+        self.n -= 1
+        dx = x - self.media_ativo
+        dy = y - self.media_mercado
+        self.media_ativo -= dx / self.n
+        self.media_mercado -= dy / self.n
+        self.comomento -= dx * (y - self.media_mercado)
+        self.m2_mercado -= dy * (y - self.media_mercado)
+
+    def _par_de_retornos(self, ativo, mercado):
+        if self._anteriores is None:
+            return None
+        ativo_anterior, mercado_anterior = self._anteriores
+        return ativo / ativo_anterior - 1, mercado / mercado_anterior - 1
+
+    def adicionar(self, ativo, mercado):
+        self._anteriores, self._ultimos = self._ultimos, (ativo, mercado)
+        par = self._par_de_retornos(ativo, mercado)
+        if par is None:
+            return self.valor
+        self._pares.append(par)
+        self._incluir(*par)
+        if len(self._pares) > self.janela:
+            self._excluir(*self._pares.popleft())
+        return self.valor
+
+    def revisar(self, ativo, mercado):
+        if self._ultimos is None:
+            return self.adicionar(ativo, mercado)
+        self._ultimos = (ativo, mercado)
+        par = self._par_de_retornos(ativo, mercado)
+        if par is None:
+            return self.valor
+        self._excluir(*self._pares.pop())
+        self._pares.append(par)
+        self._incluir(*par)
+        return self.valor
+
+    @property
+    def valor(self):
+        if self.n < self.janela or self.m2_mercado <= 0:
+            return None
+        return self.comomento / self.m2_mercado
+
+
+class IndicadoresAoVivo:
+    """
+    Conjunto de indicadores incrementais de um ativo. Um preço com data
+    posterior à da última barra abre uma nova barra; um preço do mesmo dia
+    apenas revisa o fechamento atual. `metodo_rsi` escolhe o RSI por média
+    simples ou de Wilder (ver `RSIIncremental`).
+    """
+    def __init__(self, periodo_rsi=14, janela_volatilidade=60, janela_beta=252, metodo_rsi="simples"):
+        self.rsi = RSIIncremental(periodo_rsi, metodo_rsi)
+        self.volatilidade = VolatilidadeIncremental(janela_volatilidade)
+        self.beta = BetaIncremental(janela_beta)
+        self.data_ultima_barra = None
+        self.ultimo_preco_mercado = None
+
+    def semear(self, fechamentos, fechamentos_mercado=None):
+        """Inicializa a partir de Series de fechamentos diários (índice de datas)."""
+        fechamentos = fechamentos.dropna()
+        self.rsi.semear(fechamentos.to_numpy(dtype=float))
+        self.volatilidade.semear(fechamentos.to_numpy(dtype=float))
+        if fechamentos_mercado is not None:
+            alinhado = fechamentos.to_frame("ativo").join(fechamentos_mercado.dropna().rename("mercado"), how="inner")
+            self.beta.semear(alinhado["ativo"].to_numpy(dtype=float), alinhado["mercado"].to_numpy(dtype=float))
+            if len(alinhado):
+                self.ultimo_preco_mercado = float(alinhado["mercado"].iloc[-1])
+        if len(fechamentos):
+            self.data_ultima_barra = fechamentos.index[-1].date()
+        return self
+
+    def atualizar(self, preco, data, preco_mercado=None):
+        if preco_mercado is not None:
+            self.ultimo_preco_mercado = preco_mercado
+        nova_barra = self.data_ultima_barra is None or data > self.data_ultima_barra
+        if nova_barra:
+            self.data_ultima_barra = data
+            self.rsi.adicionar(preco)
+            self.volatilidade.adicionar(preco)
+            if self.ultimo_preco_mercado is not None:
+                self.beta.adicionar(preco, self.ultimo_preco_mercado)
+        else:
+            self.rsi.revisar(preco)
+            self.volatilidade.revisar(preco)
+            if self.ultimo_preco_mercado is not None:
+                self.beta.revisar(preco, self.ultimo_preco_mercado)
+        return self.valores()
+
+    def valores(self):
+        return {"rsi": self.rsi.valor, "volatilidade": self.volatilidade.valor, "beta": self.beta.valor}
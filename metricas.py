@@ -0,0 +1,236 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Limites (em segundos) dos baldes dos histogramas de latência
+LIMITES_PADRAO = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histograma:
+    """Histograma de baldes fixos, no formato cumulativo do Prometheus na exportação."""
+    __slots__ = ("limites", "contagens", "soma", "quantidade")
+
+    def __init__(self, limites=LIMITES_PADRAO):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # o último balde é o +Inf
+        self.soma = 0.0
+        self.quantidade = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.quantidade += 1
+
+    def quantil(self, q):
+        """Estimativa do quantil pelo limite superior do balde em que ele cai."""
+        if self.quantidade == 0:
+            return None
+        alvo = q * self.quantidade
+        acumulado = 0
+        for limite, contagem in zip(self.limites + (float("inf"),), self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float("inf")
+
+
+class _CronometroNulo:
+    """Usado quando as métricas estão desligadas: não mede nada."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+
+_NULO = _CronometroNulo()
+
+
+class _Cronometro:
+    __slots__ = ("metricas", "chave", "inicio")
+
+    def __init__(self, metricas, chave):
+        self.metricas = metricas
+        self.chave = chave
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self.metricas._observar_chave(self.chave, time.perf_counter() - self.inicio)
+        return False
+
+
+class Metricas:
+    """
+    Contadores e histogramas de latência dos caminhos críticos (buscas de
+    dados, caches, tabelas hash e ordens), identificados por nome e rótulos.
+
+    Desligadas, `contar` e `observar` retornam logo na primeira linha e
+    `cronometro` devolve um objeto vazio compartilhado, então o custo é de
+    uma chamada de função. O estado é protegido por uma trava, pois as
+    cotações são buscadas em várias threads.
+
+    Exportação: `para_prometheus()` (formato texto do Prometheus) e
+    `para_json()` / `salvar_json(caminho)`.
+    """
+    def __init__(self, habilitado=False, prefixo="portfolio"):
+        self.habilitado = habilitado
+        self.prefixo = prefixo
+        self._contadores = {}
+        self._histogramas = {}
+        self._trava = threading.Lock()
+
+    def habilitar(self, habilitado=True):
+        self.habilitado = habilitado
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted(rotulos.items()))
+
+    def contar(self, nome, valor=1, **rotulos):
+        if not self.habilitado:
+            return
+        chave = self._chave(nome, rotulos)
+        with self._trava:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def _observar_chave(self, chave, valor):
+        with self._trava:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = _Histograma()
+            histograma.observar(valor)
+
+    def observar(self, nome, valor, **rotulos):
+        if not self.habilitado:
+            return
+        self._observar_chave(self._chave(nome, rotulos), valor)
+
+    def cronometro(self, nome, **rotulos):
+        """Context manager que registra a duração do bloco no histograma `nome`."""
+        if not self.habilitado:
+            return _NULO
+        return _Cronometro(self, self._chave(nome, rotulos))
+
+    def cronometrado(self, nome, **rotulos):
+        """Decorador equivalente a envolver a função inteira em `cronometro`."""
+        def decorar(funcao):
+            chave = self._chave(nome, rotulos)
+
+            def medida(*args, **kwargs):
+                if not self.habilitado:
+                    return funcao(*args, **kwargs)
+                with _Cronometro(self, chave):
+                    return funcao(*args, **kwargs)
+            medida.__name__, medida.__doc__, medida.__wrapped__ = funcao.__name__, funcao.__doc__, funcao
+            return medida
+        return decorar
+
+    def limpar(self):
+        with self._trava:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def taxas_de_acerto(self):
+        """
+        Taxa de acerto de cada contador que tenha o rótulo resultado="acerto"/"falta"
+        (ex.: consultas de cache). Devolve {(nome, rótulos sem resultado): taxa}.
+        """
+        totais = {}
+        with self._trava:
+            for (nome, rotulos), valor in self._contadores.items():
+                outros = tuple(r for r in rotulos if r[0] != "resultado")
+                resultado = dict(rotulos).get("resultado")
+                if resultado not in ("acerto", "falta"):
+                    continue
+                acertos, consultas = totais.get((nome, outros), (0, 0))
+                totais[(nome, outros)] = (acertos + (valor if resultado == "acerto" else 0), consultas + valor)
+        return {chave: acertos / consultas for chave, (acertos, consultas) in totais.items() if consultas}
+
+    def para_json(self):
+        with self._trava:
+            contadores = [{"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                          for (nome, rotulos), valor in sorted(self._contadores.items())]
+            histogramas = [{
+                "nome": nome,
+                "rotulos": dict(rotulos),
+                "quantidade": h.quantidade,
+                "soma": h.soma,
+                "media": h.soma / h.quantidade if h.quantidade else None,
+                "p50": h.quantil(0.5),
+                "p95": h.quantil(0.95),
+                "p99": h.quantil(0.99),
+                "limites": list(h.limites),
+                "contagens": list(h.contagens),
+            } for (nome, rotulos), h in sorted(self._histogramas.items())]
+        taxas = [{"nome": nome, "rotulos": dict(rotulos), "taxa_acerto": taxa}
+                 for (nome, rotulos), taxa in sorted(self.taxas_de_acerto().items())]
+        return {"instante": time.time(), "contadores": contadores, "histogramas": histogramas,
+                "taxas_acerto": taxas}
+
+    def salvar_json(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(self.para_json(), arquivo, indent=2, ensure_ascii=False)
+
+    def para_prometheus(self):
+        linhas = []
+
+        def formatar(rotulos):
+            if not rotulos:
+                return ""
+            itens = ",".join(f'{k}="{str(v)}"' for k, v in rotulos)
+            return "{" + itens + "}"
+
+        with self._trava:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(self._histogramas.items())
+            tipos_declarados = set()
+            for (nome, rotulos), valor in contadores:
+                nome_completo = f"{self.prefixo}_{nome}_total"
+                if nome_completo not in tipos_declarados:
+                    linhas.append(f"# TYPE {nome_completo} counter")
+                    tipos_declarados.add(nome_completo)
+                linhas.append(f"{nome_completo}{formatar(rotulos)} {valor}")
+            for (nome, rotulos), h in histogramas:
+                nome_completo = f"{self.prefixo}_{nome}"
+                if nome_completo not in tipos_declarados:
+                    linhas.append(f"# TYPE {nome_completo} histogram")
+                    tipos_declarados.add(nome_completo)
+                acumulado = 0
+                for limite, contagem in zip(h.limites + (float("inf"),), h.contagens):
+                    acumulado += contagem
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    linhas.append(f"{nome_completo}_bucket{formatar(rotulos + (('le', le),))} {acumulado}")
+                linhas.append(f"{nome_completo}_sum{formatar(rotulos)} {h.soma}")
+                linhas.append(f"{nome_completo}_count{formatar(rotulos)} {h.quantidade}")
+        return "\n".join(linhas) + "\n"
+
+
+def tabela_instrumentada(tipo_tabela, nome="tabela"):
+    """
+    Subclasse de `tipo_tabela` com put/get/delete cronometrados. Como a
+    tabela é escolhida por injeção (`tipo_tabela=`), a versão instrumentada
+    só é usada quando pedida; a tabela original continua sem custo extra.
+    """
+    def operacao(metodo, rotulo):
+        def medido(self, *args):
+            with METRICAS.cronometro("tabela_hash_segundos", tabela=nome, operacao=rotulo):
+                return metodo(self, *args)
+        return medido
+
+    return type(f"{tipo_tabela.__name__}Instrumentada", (tipo_tabela,), {
+        "put": operacao(tipo_tabela.put, "put"),
+        "get": operacao(tipo_tabela.get, "get"),
+        "delete": operacao(tipo_tabela.delete, "delete"),
+    })
+
+
+# Instância usada por todo o projeto; ligada pela variável de ambiente METRICAS=1
+# ou por METRICAS.habilitar()
+METRICAS = Metricas(habilitado=os.environ.get("METRICAS", "0") == "1")
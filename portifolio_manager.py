@@ -1,126 +1,533 @@
-import pandas as pd 
-import yfinance as yf
-import numpy as np
-from estruturas_dados import TabelaHashEncadeada
+# pandas e NumPy só são importados no primeiro uso (ver importacao_tardia.py),
+# para que a carteira possa ser carregada e exibida (ver cli.py) sem esse custo
+import contextlib
+import math
+import threading
+
+from importacao_tardia import np, pd
+from estruturas_dados import TabelaHashEncadeada, TabelaHashConcorrente
+from posicoes import TabelaPosicoes
+from provedores_dados import criar_provedor
+from cache_historico import CacheHistorico
+from indicadores_incrementais import IndicadoresAoVivo
+from metricas import METRICAS
+from calculos_carteira import fechamentos_diarios, soma_por_segmento, preco_medio_vetorizado
+
+# Usado no lugar das travas fora do modo concorrente
+_SEM_TRAVA = contextlib.nullcontext()
+
+
+class _SecaoEscrita:
+    """
+    Seção em que o estado da carteira é alterado (ver `PortfolioManager._escrita`):
+    segura a trava de estado e deixa `_sequencia` ímpar enquanto dura.
+    """
+    __slots__ = ("portfolio",)
 
-class PortfolioManager:
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+
+    def __enter__(self):
+        self.portfolio._trava_estado.__enter__()
+        self.portfolio._sequencia += 1
+        return self
+
+    def __exit__(self, *excecao):
+        self.portfolio._sequencia += 1
+        self.portfolio._trava_estado.__exit__(*excecao)
+        return False
 
-    def __init__(self, saldo_inicial=10000.0):
-        self.ativos = TabelaHashEncadeada()
+
+class PortfolioManager:
+    """
+    Carteira de um cliente: saldo, posições e lucro realizado.
+
+    Com `concorrente=True`, a carteira pode ser usada por várias threads ao
+    mesmo tempo (ex.: sessões do Streamlit e tarefas em segundo plano):
+    - cada ordem segura a trava do seu ativo, então a leitura e a alteração
+      de uma posição não se intercalam com outra ordem no mesmo ativo
+      (`executar_lote` segura as travas de todos os ativos do lote);
+    - a aplicação de cada alteração (saldo, posição, totais, versão e
+      diário) é feita em `_escrita`, uma seção curta serializada por uma
+      única trava. Ordens em ativos diferentes só se encontram nela;
+    - as leituras (`instantaneo`, `totais`, ...) não usam trava: são
+      refeitas se uma escrita aconteceu no meio (ver `_ler_consistente`),
+      então nunca bloqueiam as ordens nem umas às outras.
+    Nesse modo, a carteira deve ser alterada apenas pelos seus métodos.
+
+    Limite: toda alteração ainda passa pela única trava de estado, porque o
+    saldo é comum a todos os ativos. `executar_lote` valida o lote e calcula
+    os preços médios fora dela, com as travas dos seus ativos, e a segura só
+    para conferir o saldo e aplicar o resultado; mas a aplicação de ordens
+    em ativos diferentes nunca roda em paralelo, mesmo sem o GIL. As travas
+    por ativo garantem a correção, não ganho de vazão (ver
+    benchmarks/concorrencia.py).
+    """
+    def __init__(self, saldo_inicial=10000.0, tipo_tabela=TabelaHashEncadeada, diario=None, provedor=None,
+                 diretorio_historico=None, analisador=None, concorrente=False):
+        # tipo_tabela permite trocar a implementação da tabela hash
+        # (ex.: TabelaHashAberta, mais compacta em memória)
+        # As posições ficam em arrays colunares; a tabela hash guarda ticker -> linha.
+        # No modo concorrente a tabela precisa aceitar leituras sem trava.
+        self.concorrente = concorrente
+        self.ativos = TabelaPosicoes(tipo_tabela=TabelaHashConcorrente if concorrente else tipo_tabela)
+        self._trava_estado = threading.Lock() if concorrente else _SEM_TRAVA
+        # ticker -> trava do ativo, criada no primeiro uso
+        self._travas_ativos = TabelaHashConcorrente() if concorrente else None
+        # Ímpar durante uma escrita (ver _escrita e _ler_consistente)
+        self._sequencia = 0
+        self._secao_escrita = _SecaoEscrita(self)
         self.saldo = float(saldo_inicial)
         self.lucro_vendas = 0.0
-        self.analisador = FerramentasDeAnalise()
+        # Contadores de versão: `versao` avança a cada alteração do estado
+        # (ordens, preços, restauração) e `versao_precos` apenas quando os
+        # preços de mercado mudam. Servem de chave para memoizar cálculos derivados.
+        self.versao = 0
+        self.versao_precos = 0
+        # Fonte de cotações e históricos (ver provedores_dados.py)
+        self.provedor = provedor if provedor is not None else criar_provedor()
+        # Um analisador pode ser compartilhado por vários portfólios (ver registro_portfolios.py)
+        if analisador is None:
+            analisador = FerramentasDeAnalise(tipo_tabela=tipo_tabela, provedor=self.provedor,
+                                              diretorio_historico=diretorio_historico)
+        self.analisador = analisador
+
+        # Diário de transações opcional (ver diario.py): restaura o estado salvo
+        self.diario = diario
+        if self.diario is not None:
+            self.diario.restaurar(self)
+
+    def _trava_do_ativo(self, codigo):
+        if self._travas_ativos is None:
+            return _SEM_TRAVA
+        return self._travas_ativos.obter_ou_criar(codigo, threading.Lock)
+
+    def _travas_dos_ativos(self, codigos):
+        """Segura as travas de vários ativos, sempre em ordem alfabética para não haver impasse."""
+        if self._travas_ativos is None:
+            return _SEM_TRAVA
+        pilha = contextlib.ExitStack()
+        for codigo in sorted(set(codigos)):
+            pilha.enter_context(self._trava_do_ativo(codigo))
+        return pilha
+
+    def _escrita(self):
+        """
+        Seção em que o estado (saldo, posições, totais e versão) é alterado.
+        No modo concorrente é serializada pela trava de estado.
+        """
+        return self._secao_escrita
+
+    def _ler_consistente(self, ler, tentativas=100):
+        """
+        Executa `ler` sem trava e a repete se uma escrita começou ou terminou
+        no meio dela (o esquema de um seqlock): o resultado é sempre o de um
+        único momento. Se as escritas não derem trégua em `tentativas`, lê
+        com a trava de estado.
+        """
+        if not self.concorrente:
+            return ler()
+        for _ in range(tentativas):
+            inicio = self._sequencia
+            if inicio % 2:
+                # Há uma escrita em andamento: espera ela terminar (sem impedir a próxima)
+                with self._trava_estado:
+                    pass
+                continue
+            try:
+                resultado = ler()
+            except Exception:
+                # Uma leitura interrompida por uma escrita pode falhar; só conta se não houve escrita
+                if self._sequencia == inicio:
+                    raise
+            else:
+                if self._sequencia == inicio:
+                    return resultado
+        with self._trava_estado:
+            return ler()
+
+    def _ler_posicao(self, codigo):
+        """(Posicao, quantidade, preço médio) do ativo, ou None se ele não estiver na carteira."""
+        posicao = self.ativos.get(codigo)
+        return None if posicao is None else (posicao, posicao["quantidade"], posicao["preco_medio"])
+
+    def _nova_versao(self, precos=False):
+        self.versao += 1
+        if precos:
+            self.versao_precos += 1
+
+    def chave_estado(self):
+        """Par (versao, versao_precos) que identifica o estado atual do portfólio."""
+        return self.versao, self.versao_precos
+
+    def _registrar_no_diario(self, registro):
+        if self.diario is None:
+            return
+        self.diario.registrar(registro)
+        if self.diario.precisa_snapshot():
+            self.diario.salvar_snapshot(self)
 
+    @METRICAS.cronometrado("ordem_segundos", tipo="compra")
     def comprar(self, codigo, quantidade, preco_compra):
+        if not float(quantidade).is_integer():
+            print(f"ERRO: A quantidade deve ser um número inteiro de ações.")
+            METRICAS.contar("ordens", tipo="compra", status="rejeitada")
+            return False
         custo_total = quantidade * preco_compra
-        if custo_total > self.saldo:
+        with self._trava_do_ativo(codigo):
+            # Só ordens com a trava do ativo alteram a sua quantidade e o seu preço médio
+            atual = self._ler_consistente(lambda: self._ler_posicao(codigo))
+            with self._escrita():
+                executada = custo_total <= self.saldo
+                if executada:
+                    self.saldo -= custo_total
+                    if atual is None:
+                        novo_ativo = {
+                            "quantidade": quantidade,
+                            "preco_medio": preco_compra,
+                            "valor_total": custo_total
+                        }
+                        self.ativos.put(codigo, novo_ativo)
+
+                    else:
+                        # Já possui o ativo, apenas recalcula o preço médio
+                        dados_acao, qtd_antiga, preco_medio_antigo = atual
+                        nova_qtd_total = qtd_antiga + quantidade
+                        novo_preco_medio = ((qtd_antiga * preco_medio_antigo) + (quantidade * preco_compra)) / nova_qtd_total
+
+                        # Sem preço de mercado, a posição vale o custo, como em vender e executar_lote
+                        preco_recente = dados_acao.get('preco_atual', novo_preco_medio)
+                        # A Posicao escreve direto no armazenamento, não é preciso um novo put
+                        dados_acao.update({
+                            "quantidade": nova_qtd_total,
+                            "preco_medio": novo_preco_medio,
+                            "valor_total": nova_qtd_total * preco_recente,
+                        })
+
+                    self._nova_versao()
+                    self._registrar_no_diario({"tipo": "compra", "codigo": codigo, "quantidade": quantidade,
+                                               "preco": preco_compra})
+
+        if not executada:
             print(f"ERRO: Saldo insuficiente.")
+            METRICAS.contar("ordens", tipo="compra", status="rejeitada")
             return False
-
-        self.saldo -= custo_total
-        dados_acao = self.ativos.get(codigo)
-
-        if dados_acao is None:
-            novo_ativo = {
-                "quantidade": quantidade,
-                "preco_medio": preco_compra,
-                "valor_total": custo_total
-            
-            }
-            self.ativos.put(codigo, novo_ativo)
-            # Acessa o novo ativo para adicionar a transação
-            dados_acao = self.ativos.get(codigo)
-
-        else:
-            # Já possui o ativo, apenas recalcula o preço médio
-            qtd_antiga, preco_medio_antigo = dados_acao["quantidade"], dados_acao["preco_medio"]
-            nova_qtd_total = qtd_antiga + quantidade
-            novo_preco_medio = ((qtd_antiga * preco_medio_antigo) + (quantidade * preco_compra)) / nova_qtd_total
-            dados_acao["quantidade"] = nova_qtd_total
-            dados_acao["preco_medio"] = novo_preco_medio
-
-            preco_recente = dados_acao.get('preco_atual', preco_compra)
-            dados_acao['valor_total'] = nova_qtd_total * preco_recente
-
-        # Adiciona a transação de compra ao histórico do ativo
-        
-        self.ativos.put(codigo, dados_acao) # Garante que a atualização seja salva
-
+        METRICAS.contar("ordens", tipo="compra", status="executada")
         print(f"SUCESSO: Compra de {quantidade} de {codigo} registrada.")
         return True
 
+    @METRICAS.cronometrado("ordem_segundos", tipo="venda")
     def vender(self, codigo, quantidade, preco_venda):
-        dados_acao = self.ativos.get(codigo)
-
-        if dados_acao is None or dados_acao["quantidade"] < quantidade:
-            print(f"ERRO: Venda inválida.")
+        if not float(quantidade).is_integer():
+            print(f"ERRO: A quantidade deve ser um número inteiro de ações.")
+            METRICAS.contar("ordens", tipo="venda", status="rejeitada")
             return False
-
-        # Lógica de venda...
-        valor_venda = quantidade * preco_venda
-        self.saldo += valor_venda
-        self.lucro_vendas += (preco_venda - dados_acao["preco_medio"]) * quantidade
-        dados_acao["quantidade"] -= quantidade
-
-        if dados_acao["quantidade"] == 0:
-            self.ativos.delete(codigo)
-        else:
-            self.ativos.put(codigo, dados_acao)
-
+        with self._trava_do_ativo(codigo):
+            # A validação não precisa da escrita: a quantidade só muda com a trava do ativo
+            atual = self._ler_consistente(lambda: self._ler_posicao(codigo))
+
+            if atual is None or atual[1] < quantidade:
+                print(f"ERRO: Venda inválida.")
+                METRICAS.contar("ordens", tipo="venda", status="rejeitada")
+                return False
+
+            # Lógica de venda...
+            dados_acao, qtd_antiga, preco_medio = atual
+            valor_venda = quantidade * preco_venda
+            restante = qtd_antiga - quantidade
+            with self._escrita():
+                self.saldo += valor_venda
+                self.lucro_vendas += (preco_venda - preco_medio) * quantidade
+
+                if restante == 0:
+                    self.ativos.delete(codigo)
+                else:
+                    # Reavalia a posição restante, como em comprar
+                    preco_recente = dados_acao.get('preco_atual', preco_medio)
+                    dados_acao.update({"quantidade": restante, "valor_total": restante * preco_recente})
+
+                self._nova_versao()
+                self._registrar_no_diario({"tipo": "venda", "codigo": codigo, "quantidade": quantidade,
+                                           "preco": preco_venda})
+
+        METRICAS.contar("ordens", tipo="venda", status="executada")
         print(f"SUCESSO: Venda de {quantidade} de {codigo} registrada.")
         return True
 
 
+    @METRICAS.cronometrado("ordem_segundos", tipo="lote")
+    def executar_lote(self, ordens):
+        """
+        Executa um lote de ordens de forma atômica: ou todas são aplicadas, ou
+        nenhuma. `ordens` pode ser um DataFrame, o caminho de um CSV ou um
+        iterável de dicts/tuplas com as colunas codigo, tipo ("compra" ou
+        "venda"), quantidade e preco.
+
+        As ordens são validadas na sequência em que aparecem (saldo nunca
+        negativo e nenhuma venda acima da quantidade em carteira) e o preço
+        médio resultante é calculado de forma vetorizada por ativo. Não imprime
+        nada: retorna um dict com "sucesso", "saldo" e um DataFrame "ordens"
+        com o status, o valor e o lucro realizado de cada ordem.
+        """
+        df = _normalizar_ordens(ordens)
+        # No modo concorrente, as travas dos ativos do lote impedem ordens
+        # avulsas neles entre a validação e a aplicação
+        with self._travas_dos_ativos(df["codigo"]):
+            return self._executar_lote(df)
+
+    def _ler_linhas(self, codigos):
+        """Linha (-1 se ausente), quantidade e preço médio de cada ativo."""
+        linhas = self.ativos.linhas(codigos)
+        existe = linhas >= 0
+        qtd = np.where(existe, self.ativos.quantidade[np.maximum(linhas, 0)], 0).astype(np.float64)
+        pm = np.where(existe, self.ativos.preco_medio[np.maximum(linhas, 0)], 0.0)
+        return linhas, qtd, pm
+
+    def _executar_lote(self, df):
+        """
+        Valida e calcula o lote sem a escrita: com as travas dos ativos do
+        lote, as posições deles não mudam até o fim. Só o saldo (que ordens
+        em outros ativos alteram) é conferido, junto com a aplicação, na escrita.
+        """
+        n = len(df)
+        tipos = df["tipo"].to_numpy()
+        quantidades = df["quantidade"].to_numpy(dtype=np.float64)
+        precos = df["preco"].to_numpy(dtype=np.float64)
+        compra = tipos == "compra"
+
+        status = np.full(n, "executada", dtype=object)
+        motivo = np.full(n, "", dtype=object)
+        lucro = np.zeros(n)
+
+        def _rejeitar(mascara, texto):
+            # Rejeita a primeira ordem problemática e cancela as demais
+            primeira = int(np.argmax(mascara))
+            status[:] = "cancelada"
+            motivo[:] = f"lote revertido pela ordem {primeira}"
+            status[primeira] = "rejeitada"
+            motivo[primeira] = texto
+            lucro[:] = 0.0
+            METRICAS.contar("ordens", n, tipo="lote", status="rejeitada")
+            return self._resultado_lote(df, status, motivo, lucro, False, self.saldo)
+
+        if n == 0:
+            return self._resultado_lote(df, status, motivo, lucro, True, self.saldo)
+
+        invalidas = (~np.isin(tipos, ("compra", "venda")) | ~(quantidades > 0) | ~(precos > 0)
+                     | (quantidades != np.floor(quantidades)))
+        if invalidas.any():
+            return _rejeitar(invalidas, "ordem inválida")
+
+        qtd_sinal = np.where(compra, quantidades, -quantidades)
+        gastos = np.cumsum(qtd_sinal * precos)
+
+        # Agrupa as ordens por ativo mantendo a ordem original dentro de cada grupo
+        ids, codigos_unicos = pd.factorize(df["codigo"])
+        codigos_unicos = list(codigos_unicos)
+        ordem = np.argsort(ids, kind="stable")
+        ids_o, s, p = ids[ordem], qtd_sinal[ordem], precos[ordem]
+        inicio_grupo = np.r_[True, ids_o[1:] != ids_o[:-1]]
+
+        linhas, qtd_inicial, pm_inicial = self._ler_consistente(lambda: self._ler_linhas(codigos_unicos))
+        existe = linhas >= 0
+
+        qtd_depois = qtd_inicial[ids_o] + soma_por_segmento(s, inicio_grupo)
+        sem_quantidade = np.zeros(n, dtype=bool)
+        sem_quantidade[ordem[qtd_depois < 0]] = True
+        if not sem_quantidade.any():
+            pm_depois = preco_medio_vetorizado(s, p, qtd_depois, inicio_grupo, pm_inicial[ids_o])
+            vendas = s < 0
+            lucro[ordem] = np.where(vendas, -s * (p - pm_depois), 0.0)
+            fim_grupo = np.r_[inicio_grupo[1:], True]
+            qtd_final = qtd_depois[fim_grupo].astype(np.int64)
+            pm_final = pm_depois[fim_grupo]
+            mantidas = qtd_final > 0
+            registro = {"tipo": "lote", "ordens": [
+                [str(c), t, int(q), float(pr)] for c, t, q, pr in zip(df["codigo"], tipos, quantidades, precos)
+            ]}
+
+        with self._escrita():
+            saldos = self.saldo - gastos
+            sem_saldo = saldos < -1e-9
+            if sem_quantidade.any() or sem_saldo.any():
+                # Reporta a primeira ordem (na sequência original) que invalida o lote
+                if sem_saldo.any() and (not sem_quantidade.any() or np.argmax(sem_saldo) < np.argmax(sem_quantidade)):
+                    rejeicao = (sem_saldo, "saldo insuficiente")
+                else:
+                    rejeicao = (sem_quantidade, "quantidade insuficiente")
+            else:
+                rejeicao = None
+                # Commit: o estado só é alterado depois de todo o lote ser validado
+                for i in np.flatnonzero(~existe & mantidas):
+                    self.ativos.put(codigos_unicos[i], {"quantidade": 0, "preco_medio": 0.0})
+                linhas = self.ativos.linhas(codigos_unicos)
+                self.ativos.definir_linhas(linhas[mantidas], qtd_final[mantidas], pm_final[mantidas])
+                for i in np.flatnonzero(existe & ~mantidas):
+                    self.ativos.delete(codigos_unicos[i])
+
+                self.saldo = float(saldos[-1])
+                self.lucro_vendas += float(lucro.sum())
+                self._nova_versao()
+                self._registrar_no_diario(registro)
+            saldo = self.saldo
+
+        if rejeicao is not None:
+            return _rejeitar(*rejeicao)
+        METRICAS.contar("ordens", n, tipo="lote", status="executada")
+        return self._resultado_lote(df, status, motivo, lucro, True, saldo)
+
+    def _resultado_lote(self, df, status, motivo, lucro, sucesso, saldo):
+        resultado = df.copy()
+        resultado["valor"] = resultado["quantidade"] * resultado["preco"]
+        resultado["lucro_realizado"] = lucro
+        resultado["status"] = status
+        resultado["motivo"] = motivo
+        return {"sucesso": sucesso, "saldo": saldo, "ordens": resultado}
+
     def atualizar_precos(self):
         """Busca os preços atuais de mercado para todos os ativos na carteira."""
         print("\nBuscando cotações de mercado...")
-        todos_ativos = self.ativos.get_all_items()
-        if not todos_ativos:
+        if not self.ativos:
             print("Carteira vazia, nada para atualizar.")
             return
 
-        tickers = [ativo[0] for ativo in todos_ativos]
+        tickers = list(self.ativos.keys())
         try:
-            dados_yf = yf.download(tickers, period="1d", interval="15m", progress=False, multi_level_index=False)['Close']
-            
-            for codigo, dados in todos_ativos:
-                preco_atual = dados_yf[codigo].iloc[-1] if len(tickers) > 1 else dados_yf.iloc[-1]
-                if pd.notna(preco_atual):
-                    dados['preco_atual'] = preco_atual
-                    dados['valor_total'] = dados['quantidade'] * preco_atual
-                    dados['lucro_prejuizo_%'] = ((preco_atual / dados['preco_medio']) - 1) * 100
-                    self.ativos.put(codigo, dados)
+            # Latência da busca de cotações de toda a carteira
+            with METRICAS.cronometro("atualizar_precos_segundos"):
+                cotacoes = self.provedor.cotacoes(tickers)
+            self.aplicar_cotacoes(cotacoes)
             print("Preços atualizados com sucesso.")
         except Exception as e:
-            print(f"ERRO ao buscar dados da API yfinance: {e}")
+            print(f"ERRO ao buscar dados de mercado: {e}")
+
+    def aplicar_cotacoes(self, cotacoes):
+        """
+        Marca a carteira a mercado com um dict {codigo: preço} já obtido
+        (tickers ausentes ou com NaN mantêm o preço anterior).
+        """
+        # Os preços não alteram quantidades: basta a escrita, sem as travas dos ativos
+        with self._escrita():
+            if len(cotacoes) < len(self.ativos) // 4:
+                # Poucas cotações (ex.: um micro-lote de ticks): marca só as linhas afetadas
+                codigos = list(cotacoes)
+                precos = np.array([cotacoes[codigo] for codigo in codigos], dtype=float)
+                linhas = self.ativos.linhas(codigos)
+                validos = (linhas >= 0) & ~np.isnan(precos)
+                atualizados = self.ativos.marcar_linhas(linhas[validos], precos[validos])
+            else:
+                # Último preço de cada ticker, alinhado com as linhas do armazenamento colunar
+                precos = np.array([cotacoes.get(codigo, np.nan) for codigo in self.ativos.codigos()], dtype=float)
+                atualizados = self.ativos.marcar_a_mercado(precos)
+            if atualizados:
+                self._nova_versao(precos=True)
+        return atualizados
+
+    @staticmethod
+    def aplicar_cotacoes_em_varios(portfolios, cotacoes):
+        """
+        Como `aplicar_cotacoes`, para vários portfólios de uma vez: as linhas
+        de todos eles são marcadas juntas por `TabelaPosicoes.marcar_varias`.
+        Segura a escrita de todos durante a marcação (nenhuma ordem nem
+        leitor vê uma carteira pela metade); as travas são tomadas uma vez por
+        portfólio e sempre na mesma ordem, para que chamadas simultâneas com
+        listas sobrepostas não se bloqueiem. Retorna as linhas atualizadas de
+        cada portfólio, na ordem recebida.
+        """
+        portfolios = list(portfolios)
+        unicos = sorted({id(portfolio): portfolio for portfolio in portfolios if portfolio.ativos}.values(), key=id)
+        with contextlib.ExitStack() as pilha:
+            for portfolio in unicos:
+                if portfolio.concorrente:
+                    pilha.enter_context(portfolio._escrita())
+            atualizados = TabelaPosicoes.marcar_varias([portfolio.ativos for portfolio in unicos], cotacoes)
+            for portfolio, quantos in zip(unicos, atualizados):
+                if quantos:
+                    portfolio._nova_versao(precos=True)
+        por_id = {id(portfolio): quantos for portfolio, quantos in zip(unicos, atualizados)}
+        return [por_id.get(id(portfolio), 0) for portfolio in portfolios]
+
+    def cotacoes_em_carteira(self, cotacoes):
+        """
+        Filtra um dict {codigo: preço} para os ativos da carteira (e o ^BVSP,
+        usado no beta), sem preços NaN: o que deve alimentar os indicadores
+        ao vivo do `analisador`.
+        """
+        codigos = list(cotacoes)
+        linhas = self._ler_consistente(lambda: self.ativos.linhas(codigos))
+        return {codigo: cotacoes[codigo] for codigo, linha in zip(codigos, linhas.tolist())
+                if (linha >= 0 or codigo == "^BVSP") and not math.isnan(cotacoes[codigo])}
+
+    def totais(self):
+        """
+        Valor de mercado, custo e lucro/prejuízo não realizado da carteira.
+        Os totais são mantidos a cada ordem e atualização de preços, sem
+        percorrer as posições.
+        """
+        valor_mercado, custo = self._ler_consistente(
+            lambda: (self.ativos.valor_total_carteira(), self.ativos.custo_total()))
+        return {"valor_mercado": valor_mercado, "custo": custo, "lucro_nao_realizado": valor_mercado - custo}
+
+    def instantaneo(self):
+        """
+        Cópia do estado da carteira em um único momento: saldo, lucro
+        realizado, versão, totais e as posições (DataFrame indexado pelo
+        ticker). No modo concorrente é lida sem trava, mesmo com ordens
+        sendo executadas, e os números são sempre coerentes entre si.
+        """
+
+        def ler():
+            ativos = self.ativos
+            n = ativos.n
+            colunas = {campo: getattr(ativos, nome)[:n].copy() for campo, nome in ativos.CAMPOS.items()}
+            return (self.saldo, self.lucro_vendas, self.versao, ativos.valor_total_carteira(),
+                    ativos.custo_total(), ativos.codigos(), colunas)
+
+        saldo, lucro_vendas, versao, valor_mercado, custo, codigos, colunas = self._ler_consistente(ler)
+        return {
+            "saldo": saldo,
+            "lucro_vendas": lucro_vendas,
+            "versao": versao,
+            "valor_mercado": valor_mercado,
+            "custo": custo,
+            "posicoes": pd.DataFrame(colunas, index=pd.Index(codigos, name="codigo")),
+        }
+
+    def maiores_posicoes(self, n=10):
+        """As n posições de maior valor de mercado: [(ticker, valor)], em ordem decrescente."""
+        # O índice por valor é reorganizado na consulta, então ela também é uma escrita
+        with self._trava_estado:
+            return self.ativos.maiores(n)
+
+    def buscar_ativos(self, prefixo=None, sufixo=None, inicio=None, fim=None):
+        """
+        Tickers da carteira por um dos critérios: começam com `prefixo`,
+        terminam com `sufixo` (ex.: ".SA") ou estão no intervalo alfabético
+        [inicio, fim). Usa os índices ordenados em vez de percorrer a tabela.
+        """
+        if prefixo is not None:
+            return self._ler_consistente(lambda: self.ativos.com_prefixo(prefixo))
+        if sufixo is not None:
+            return self._ler_consistente(lambda: self.ativos.com_sufixo(sufixo))
+        return self._ler_consistente(lambda: self.ativos.no_intervalo(inicio, fim))
 
     def get_distribuicao_por_ativo(self):
         """
         Prepara os dados para o gráfico de pizza. Agora é mais robusto,
         calculando um valor de fallback se o 'valor_total' não estiver presente.
         """
-        todos_ativos = self.ativos.get_all_items()
-        if not todos_ativos:
+        if not self.ativos:
             return [], []
 
-        labels = []
-        valores = []
-
-        for codigo, dados in todos_ativos:
-            # Tenta pegar o valor_total (baseado no preço de mercado mais recente)
-            valor_do_ativo = dados.get('valor_total')
+        # Usa o valor_total (preço de mercado mais recente) ou, se os preços
+        # ainda não foram atualizados, o valor baseado no custo (preço médio).
+        valores, codigos = self._ler_consistente(
+            lambda: (self.ativos.valores_de_mercado(), self.ativos.codigos()))
 
-            # Se 'valor_total' não existir (preços ainda não atualizados),
-            # calcula o valor baseado no custo (preço médio).
-            if valor_do_ativo is None:
-                valor_do_ativo = dados.get('quantidade', 0) * dados.get('preco_medio', 0)
-
-            # Apenas inclui ativos com valor maior que zero no gráfico
-            if valor_do_ativo > 0:
-                labels.append(codigo)
-                valores.append(valor_do_ativo)
-            
-        return labels, valores
+        # Apenas inclui ativos com valor maior que zero no gráfico
+        positivos = np.flatnonzero(valores > 0)
+        labels = [codigos[i] for i in positivos]
+        return labels, valores[positivos].tolist()
 
     #Funções para acompanhar o portifolio direto do terminal, sem o dashboard
     def mostrar_portfolio(self):
@@ -130,15 +537,13 @@ class PortfolioManager:
         print("="*40)
         print(f"Saldo em Conta: R$ {self.saldo:.2f}")
         
-        portfolio_items = self.ativos.get_all_items()
-        
-        if not portfolio_items:
+        if not self.ativos:
             print("A carteira de ativos está vazia.")
             valor_total_carteira = 0
         else:
             df_data = []
             valor_total_carteira = 0
-            for codigo, dados in portfolio_items:
+            for codigo, dados in self.ativos.items():
                 valor_total_ativo = dados.get('valor_total', dados['quantidade'] * dados['preco_medio'])
                 valor_total_carteira += valor_total_ativo
                 df_data.append({
@@ -149,8 +554,7 @@ class PortfolioManager:
                     "Valor Total": f"R$ {valor_total_ativo:.2f}",
                     "Desempenho": f"{dados.get('lucro_prejuizo_%', 0):.2f}%"
                 })
-            df = pd.DataFrame(df_data)
-            print(df.to_string(index=False))
+            print(_tabela_em_texto(df_data))
 
         print(f"\nValor Total do Portfólio: R$ {valor_total_carteira:.2f}")
         print(f"Lucro/Prejuízo Realizado com Vendas: R$ {self.lucro_vendas:.2f}")
@@ -158,30 +562,74 @@ class PortfolioManager:
         print(f"Patrimônio Total (Saldo + Portfólio): R$ {patrimonio_total:.2f}")
         print("="*40 + "\n")
 
-    
+
+
+def _tabela_em_texto(linhas):
+    """Tabela alinhada à direita, como DataFrame.to_string(index=False), sem importar pandas."""
+    colunas = list(linhas[0])
+    celulas = [colunas] + [[str(linha[c]) for c in colunas] for linha in linhas]
+    larguras = [max(len(c[i]) for c in celulas) for i in range(len(colunas))]
+    return "\n".join(" ".join(c.rjust(l) for c, l in zip(linha, larguras)) for linha in celulas)
+
+
+def _normalizar_ordens(ordens):
+    """Converte as ordens de entrada em um DataFrame com as colunas padrão."""
+    colunas = ["codigo", "tipo", "quantidade", "preco"]
+    if isinstance(ordens, str):
+        ordens = pd.read_csv(ordens)
+    if isinstance(ordens, pd.DataFrame):
+        df = ordens[colunas].copy()
+    else:
+        registros = [o if isinstance(o, dict) else dict(zip(colunas, o)) for o in ordens]
+        df = pd.DataFrame.from_records(registros, columns=colunas)
+    df["tipo"] = df["tipo"].astype(str).str.lower()
+    df = df.reset_index(drop=True)
+    return df
+
 
 class FerramentasDeAnalise:
     """
     Uma classe dedicada a fornecer ferramentas de análise técnica e quantitativa.
     Funciona de forma independente e utiliza seu próprio cache com uma tabela hash para otimização.
     """
-    def __init__(self):
-        # A Tabela Hash aqui funciona como um cache para dados históricos
-        self.cache_dados_historicos = TabelaHashEncadeada()
-
-    def _get_dados_historicos(self, codigo, periodo="1y"):
-        """Busca dados históricos de um ativo."""
-        dados = self.cache_dados_historicos.get(codigo)
-        if dados is not None:
-            return dados.copy()
-        
+    def __init__(self, tipo_tabela=TabelaHashEncadeada, provedor=None, cache=None, diretorio_historico=None,
+                 metodo_rsi_ao_vivo="simples"):
+        # Cache LRU/TTL limitado em bytes, indexado por (ticker, período, intervalo)
+        self.cache_dados_historicos = cache if cache is not None else CacheHistorico(tipo_tabela=tipo_tabela)
+        self.provedor = provedor if provedor is not None else criar_provedor()
+        # Indicadores incrementais por ticker, alimentados por cotações ao vivo
+        # (ex.: pelo IngestorCotacoes); "wilder" troca o RSI simples pelo de Wilder
+        self.indicadores_ao_vivo = tipo_tabela()
+        self.metodo_rsi_ao_vivo = metodo_rsi_ao_vivo
+        # Avança a cada cotação registrada: chave de memoização para quem exibe os valores
+        self.versao_ao_vivo = 0
+        self._ultimo_preco_mercado = None
+        self._trava_ao_vivo = threading.Lock()
+        # Histórico em disco opcional: evita buscar de novo o ano inteiro a cada reinício
+        self.historico_local = None
+        if diretorio_historico is not None:
+            from historico_local import ArmazemHistorico
+            self.historico_local = ArmazemHistorico(diretorio_historico, self.provedor)
+
+    def _get_dados_historicos(self, codigo, periodo="1y", intervalo="1d", copiar=True):
+        """
+        Busca dados históricos de um ativo. Com copiar=False devolve o próprio
+        DataFrame do cache, que não deve ser alterado.
+        """
+        def carregar():
+            fonte = self.historico_local if self.historico_local is not None else self.provedor
+            nome_fonte = "disco" if self.historico_local is not None else "provedor"
+            with METRICAS.cronometro("historico_carga_segundos", fonte=nome_fonte):
+                dados = fonte.historico(codigo, periodo=periodo, intervalo=intervalo)
+            return None if dados is None or dados.empty else dados
+
         try:
-            dados = yf.Ticker(codigo).history(period=periodo, interval="1d")
-            if dados.empty: return None
-            self.cache_dados_historicos.put(codigo, dados)
-            return dados.copy()
+            dados = self.cache_dados_historicos.obter((codigo, periodo, intervalo), carregar)
         except Exception:
             return None
+        if dados is None or not copiar:
+            return dados
+        return dados.copy()
 
     def calcular_volatilidade(self, codigo, janela_dias=60):
         """Calcula a volatilidade anualizada para um ativo nos últimos X dias."""
@@ -228,5 +676,153 @@ class FerramentasDeAnalise:
         
         beta = covariancia / variancia_mercado
         return beta
-    
-    
+
+    def registrar_cotacao(self, codigo, preco, instante=None):
+        """
+        Atualiza em O(1) o RSI, a volatilidade e o beta de um ativo a partir de
+        uma nova cotação. Na primeira cotação do ativo os indicadores são
+        semeados com o histórico; depois, cotações do mesmo dia revisam a barra
+        atual e as de um dia novo abrem uma barra. Cotações do ^BVSP apenas
+        atualizam o preço de mercado usado no beta.
+        Retorna um dict com os valores atuais (None onde não há dados).
+        """
+        data = pd.Timestamp(instante if instante is not None else pd.Timestamp.now()).date()
+        if codigo == "^BVSP":
+            with self._trava_ao_vivo:
+                self._ultimo_preco_mercado = preco
+                self.versao_ao_vivo += 1
+            return None
+
+        with self._trava_ao_vivo:
+            indicadores = self.indicadores_ao_vivo.get(codigo)
+        if indicadores is None:
+            # Semeia fora da trava: a busca do histórico não segura quem só lê os valores
+            indicadores = IndicadoresAoVivo(metodo_rsi=self.metodo_rsi_ao_vivo)
+            dados = self._get_dados_historicos(codigo, periodo="2y", copiar=False)
+            dados_ibov = self._get_dados_historicos("^BVSP", periodo="2y", copiar=False)
+            if dados is not None:
+                indicadores.semear(fechamentos_diarios(dados), None if dados_ibov is None else fechamentos_diarios(dados_ibov))
+        with self._trava_ao_vivo:
+            existentes = self.indicadores_ao_vivo.get(codigo)
+            if existentes is None:
+                self.indicadores_ao_vivo.put(codigo, indicadores)
+            else:
+                indicadores = existentes
+            self.versao_ao_vivo += 1
+            return indicadores.atualizar(preco, data, self._ultimo_preco_mercado)
+
+    def registrar_cotacoes(self, cotacoes, instante=None):
+        """
+        `registrar_cotacao` para um dict {codigo: preço} (ex.: um micro-lote de
+        ticks). O ^BVSP é registrado primeiro, para que o beta dos demais já
+        use o novo preço de mercado. Retorna {codigo: valores}.
+        """
+        if "^BVSP" in cotacoes:
+            self.registrar_cotacao("^BVSP", cotacoes["^BVSP"], instante)
+        return {codigo: self.registrar_cotacao(codigo, preco, instante)
+                for codigo, preco in cotacoes.items() if codigo != "^BVSP"}
+
+    def valores_ao_vivo(self, codigos):
+        """{codigo: valores} dos indicadores ao vivo dos ativos que já receberam cotações."""
+        with self._trava_ao_vivo:
+            return {codigo: indicadores.valores() for codigo in codigos
+                    if (indicadores := self.indicadores_ao_vivo.get(codigo)) is not None}
+
+    @METRICAS.cronometrado("indicadores_segundos", metodo="vetorizado")
+    def calcular_indicadores(self, codigos, janela_volatilidade=60, periodo_rsi=14, janela_beta=252):
+        """
+        Calcula volatilidade, RSI e beta de vários ativos de uma só vez.
+
+        Os fechamentos são alinhados em matrizes (uma coluna por ativo) e cada
+        indicador é calculado em uma única passada vetorizada sobre as colunas,
+        com a série do Ibovespa buscada uma única vez. Os resultados são os
+        mesmos de `calcular_volatilidade`, `calcular_rsi` e `calcular_beta`.
+        Retorna um DataFrame indexado pelo código, com NaN onde o indicador
+        não pode ser calculado.
+        """
+        codigos = list(codigos)
+        resultado = pd.DataFrame(np.nan, index=pd.Index(codigos, name="codigo"),
+                                 columns=["volatilidade", "rsi", "beta"])
+        if not codigos:
+            return resultado
+
+        # Volatilidade e RSI: últimos fechamentos de cada ativo alinhados pelo fim
+        fechamentos = [self._get_dados_historicos(c, copiar=False) for c in codigos]
+        tamanhos = np.array([0 if d is None else len(d) for d in fechamentos])
+        linhas = max(janela_volatilidade, periodo_rsi) + 1
+        matriz = np.full((linhas, len(codigos)), np.nan)
+        for j, dados in enumerate(fechamentos):
+            if dados is not None:
+                ultimos = dados['Close'].to_numpy(dtype=float)[-linhas:]
+                matriz[linhas - len(ultimos):, j] = ultimos
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            retornos = matriz[1:] / matriz[:-1] - 1
+            ultimos_retornos = retornos[-janela_volatilidade:]
+            validos = (~np.isnan(ultimos_retornos)).sum(axis=0)
+            volatilidade = np.full(len(codigos), np.nan)
+            ok = validos >= 2
+            volatilidade[ok] = np.nanstd(ultimos_retornos[:, ok], axis=0, ddof=1) * np.sqrt(252) * 100
+            resultado["volatilidade"] = np.where(tamanhos >= janela_volatilidade, volatilidade, np.nan)
+
+            diferenca = np.diff(matriz, axis=0)[-periodo_rsi:]
+            # Como em calcular_rsi, diferenças ausentes contam como zero
+            media_ganhos = np.where(diferenca > 0, diferenca, 0).mean(axis=0)
+            media_perdas = np.where(diferenca < 0, -diferenca, 0).mean(axis=0)
+            rsi = 100 - (100 / (1 + media_ganhos / media_perdas))
+            resultado["rsi"] = np.where(tamanhos >= periodo_rsi, rsi, np.nan)
+
+        resultado["beta"] = self._betas_vetorizados(codigos, janela_beta)
+        return resultado
+
+    def _betas_vetorizados(self, codigos, janela_dias):
+        """
+        Beta de cada ativo contra o ^BVSP, reproduzindo `calcular_beta`: a
+        janela são as últimas `janela_dias` + 1 datas em que o ativo ou o índice
+        têm cotação, e o beta só existe se ambos tiverem cotação em todas elas.
+        """
+        betas = np.full(len(codigos), np.nan)
+        dados_ibov = self._get_dados_historicos("^BVSP", periodo="2y", copiar=False)
+        if dados_ibov is None:
+            return betas
+        series = {}
+        for j, codigo in enumerate(codigos):
+            dados = self._get_dados_historicos(codigo, periodo="2y", copiar=False)
+            if dados is not None:
+                series[j] = dados['Close']
+        if not series:
+            return betas
+
+        alinhado = pd.concat([dados_ibov['Close'].rename(-1)] + [s.rename(j) for j, s in series.items()], axis=1)
+        ibov = alinhado[-1].to_numpy(dtype=float)
+        colunas = list(series)
+        matriz = alinhado[colunas].to_numpy(dtype=float)
+        presente = ~np.isnan(matriz)
+        ambos = presente & ~np.isnan(ibov)[:, None]
+        algum = presente | ~np.isnan(ibov)[:, None]
+
+        # Datas em que só um dos dois tem cotação invalidam a janela que as contém
+        ruins = algum & ~ambos
+        indices = np.arange(len(matriz))[:, None]
+        ultimo_ruim = np.where(ruins, indices, -1).max(axis=0)
+        apos_ultimo_ruim = (ambos & (indices > ultimo_ruim)).sum(axis=0)
+        elegiveis = apos_ultimo_ruim >= janela_dias + 1
+        if not elegiveis.any():
+            return betas
+
+        # Seleciona, para cada ativo elegível, as últimas janela_dias + 1 datas com ambos
+        posicao_do_fim = np.cumsum(ambos[::-1], axis=0)[::-1]
+        selecao = (ambos & (posicao_do_fim <= janela_dias + 1))[:, elegiveis]
+        # np.nonzero(selecao.T) devolve as linhas de cada coluna em ordem crescente
+        linhas_sel = np.nonzero(selecao.T)[1].reshape(-1, janela_dias + 1).T
+        precos_ativo = np.take_along_axis(matriz[:, elegiveis], linhas_sel, axis=0)
+        precos_ibov = ibov[linhas_sel]
+
+        retornos_ativo = precos_ativo[1:] / precos_ativo[:-1] - 1
+        retornos_ibov = precos_ibov[1:] / precos_ibov[:-1] - 1
+        desvio_ativo = retornos_ativo - retornos_ativo.mean(axis=0)
+        desvio_ibov = retornos_ibov - retornos_ibov.mean(axis=0)
+        covariancia = (desvio_ativo * desvio_ibov).sum(axis=0) / (janela_dias - 1)
+        variancia = (desvio_ibov ** 2).sum(axis=0) / (janela_dias - 1)
+        betas[np.array(colunas)[elegiveis]] = covariancia / variancia
+        return betas
@@ -0,0 +1,471 @@
+import math
+import threading
+
+from importacao_tardia import np
+from estruturas_dados import TabelaHashEncadeada, ListaDeSaltos
+
+# Campos que alteram o valor de mercado ou o custo de uma posição
+_CAMPOS_DO_VALOR = ("quantidade", "preco_medio", "valor_total")
+
+# Serializa a criação preguiçosa das colunas (ver TabelaPosicoes.__getattr__)
+_TRAVA_COLUNAS = threading.Lock()
+
+
+class Posicao:
+    """
+    Visão de uma linha da `TabelaPosicoes`, com interface de dicionário.
+
+    Ler ou alterar um campo (ex.: `posicao["quantidade"] += 10`) acessa
+    diretamente os arrays colunares, então o código que antes manipulava o
+    dict de cada ativo continua funcionando sem alterações. Depois que a
+    posição é removida da tabela, a visão fica desligada (`linha` -1) e
+    qualquer acesso levanta `KeyError`.
+    """
+    __slots__ = ("_tabela", "codigo", "linha")
+
+    def __init__(self, tabela, codigo, linha):
+        self._tabela = tabela
+        self.codigo = codigo
+        self.linha = linha
+
+    def __getitem__(self, campo):
+        valor = self._tabela._ler(self.linha, campo)
+        if valor is None:
+            raise KeyError(campo)
+        return valor
+
+    def __setitem__(self, campo, valor):
+        self._tabela._escrever(self.linha, campo, valor)
+
+    def update(self, campos):
+        """Altera vários campos de uma vez (totais e índices são ajustados uma única vez)."""
+        self._tabela._escrever_varios(self.linha, campos)
+
+    def __contains__(self, campo):
+        return campo in TabelaPosicoes.CAMPOS and self._tabela._ler(self.linha, campo) is not None
+
+    def get(self, campo, padrao=None):
+        if campo not in TabelaPosicoes.CAMPOS:
+            return padrao
+        valor = self._tabela._ler(self.linha, campo)
+        return padrao if valor is None else valor
+
+    def keys(self):
+        return [campo for campo in TabelaPosicoes.CAMPOS if campo in self]
+
+    def items(self):
+        return [(campo, self[campo]) for campo in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        if self.linha < 0:
+            return f"Posicao({self.codigo!r}, removida)"
+        return f"Posicao({self.codigo!r}, {self.to_dict()!r})"
+
+
+class TabelaPosicoes:
+    """
+    Armazenamento colunar das posições da carteira.
+
+    Cada campo de posição é um array NumPy contíguo (int64 para a
+    quantidade, que precisa ser inteira, e float64 para os preços e valores)
+    e a tabela hash guarda o mapeamento ticker -> linha, na forma de uma
+    `Posicao`. Expõe a mesma API da tabela
+    hash (`put`/`get`/`delete`/`items`/`keys`/`values`/`len`), de modo que
+    `PortfolioManager.ativos` continua sendo usado da mesma forma, mas a
+    marcação a mercado e os totais da carteira passam a ser operações
+    vetorizadas sobre todas as linhas.
+
+    Campos float com NaN são tratados como ausentes (ex.: `preco_atual`
+    antes da primeira atualização de preços).
+
+    Ao lado da tabela hash ficam:
+    - os totais da carteira (valor de mercado e custo), ajustados pela
+      diferença a cada escrita, de modo que `valor_total_carteira()` e
+      `custo_total()` são O(1);
+    - índices ordenados em listas de saltos: por ticker (prefixo e
+      intervalo), por ticker invertido (sufixo, ex.: ".SA") e por valor de
+      mercado (`maiores`), todos consultados em O(log n + k).
+
+    O índice por valor é atualizado sob demanda: cada escrita apenas marca o
+    ticker como alterado, e `maiores` reposiciona os marcados antes de
+    consultar (várias ordens no mesmo ticker custam uma única
+    reindexação). Quando muitas linhas mudam de uma vez, como na marcação a
+    mercado de toda a carteira, os totais são recalculados de forma
+    vetorizada e o índice por valor é reconstruído na próxima consulta.
+    """
+    # campo do dicionário -> nome do array
+    CAMPOS = {
+        "quantidade": "quantidade",
+        "preco_medio": "preco_medio",
+        "valor_total": "valor_total",
+        "preco_atual": "preco_atual",
+        "lucro_prejuizo_%": "lucro_prejuizo",
+    }
+
+    def __init__(self, capacidade=64, tipo_tabela=TabelaHashEncadeada):
+        self._indice = tipo_tabela()
+        self._posicoes = []  # linha -> Posicao
+        self.n = 0
+        # As colunas só são criadas no primeiro acesso (ver __getattr__)
+        self._capacidade = capacidade
+        self._soma_valor = 0.0
+        self._soma_custo = 0.0
+        self._por_codigo = ListaDeSaltos()
+        self._por_sufixo = ListaDeSaltos()
+        # Chave (-valor, ticker): o início da lista são as maiores posições.
+        # None indica que o índice precisa ser reconstruído por inteiro.
+        self._por_valor = ListaDeSaltos()
+        self._valor_indexado = {}  # ticker -> valor com que está em _por_valor
+        self._alterados = set()  # tickers a reposicionar em _por_valor
+
+    def __getattr__(self, nome):
+        # Chamado só para atributos ainda inexistentes: cria as colunas, o que
+        # importa o NumPy, quando a carteira é de fato lida ou alterada. Uma
+        # carteira vazia (ex.: `cli.py --help` ou `mostrar` sem posições) não o importa.
+        if nome in TabelaPosicoes.CAMPOS.values() and "_capacidade" in self.__dict__:
+            self._alocar_colunas()
+            return self.__dict__[nome]
+        raise AttributeError(nome)
+
+    def _alocar_colunas(self):
+        # No modo concorrente um leitor sem trava pode chegar aqui junto com a
+        # primeira escrita: as colunas são criadas uma única vez e publicadas
+        # todas juntas, para ninguém trocar arrays que outra thread já preencheu.
+        with _TRAVA_COLUNAS:
+            if "quantidade" in self.__dict__:
+                return
+            capacidade = self._capacidade
+            self.__dict__.update(
+                quantidade=np.zeros(capacidade, dtype=np.int64),
+                preco_medio=np.zeros(capacidade, dtype=np.float64),
+                valor_total=np.full(capacidade, np.nan),
+                preco_atual=np.full(capacidade, np.nan),
+                lucro_prejuizo=np.full(capacidade, np.nan),
+            )
+
+    def _crescer(self):
+        capacidade = max(2 * len(self.quantidade), 1)
+        for nome in self.CAMPOS.values():
+            antigo = getattr(self, nome)
+            novo = np.full(capacidade, np.nan) if antigo.dtype == np.float64 else np.zeros(capacidade, dtype=antigo.dtype)
+            novo[:self.n] = antigo[:self.n]
+            setattr(self, nome, novo)
+
+    @staticmethod
+    def _conferir_linha(linha):
+        if linha < 0:
+            raise KeyError("posição removida da tabela")
+
+    def _ler(self, linha, campo):
+        self._conferir_linha(linha)
+        # .item() já devolve int/float do Python, sem criar um escalar NumPy
+        valor = getattr(self, self.CAMPOS[campo]).item(linha)
+        if campo == "quantidade":
+            return valor
+        return None if math.isnan(valor) else valor
+
+    @staticmethod
+    def _conferir_valor(campo, valor):
+        # O array da quantidade é int64: gravar 2.5 viraria 2 sem aviso
+        if campo == "quantidade" and not float(valor).is_integer():
+            raise ValueError(f"quantidade deve ser um número inteiro: {valor!r}")
+
+    def _gravar(self, linha, campo, valor):
+        getattr(self, self.CAMPOS[campo])[linha] = np.nan if valor is None else valor
+
+    def _escrever(self, linha, campo, valor):
+        self._conferir_linha(linha)
+        if campo not in self.CAMPOS:
+            raise KeyError(campo)
+        self._conferir_valor(campo, valor)
+        if campo not in _CAMPOS_DO_VALOR:
+            self._gravar(linha, campo, valor)
+            return
+        antes = self._valor_e_custo(linha)
+        self._gravar(linha, campo, valor)
+        self._reindexar(linha, antes)
+
+    def _escrever_varios(self, linha, campos):
+        self._conferir_linha(linha)
+        for campo, valor in campos.items():
+            if campo not in self.CAMPOS:
+                raise KeyError(campo)
+            self._conferir_valor(campo, valor)
+        antes = self._valor_e_custo(linha)
+        for campo, valor in campos.items():
+            self._gravar(linha, campo, valor)
+        self._reindexar(linha, antes)
+
+    def _valor_e_custo(self, linha):
+        """Valor de mercado (o custo, sem preço de mercado) e custo de uma linha."""
+        custo = self.quantidade.item(linha) * self.preco_medio.item(linha)
+        valor = self.valor_total.item(linha)
+        return (custo if math.isnan(valor) else valor), custo
+
+    def _valores_e_custos(self, linhas):
+        custo = self.quantidade[linhas] * self.preco_medio[linhas]
+        valor = self.valor_total[linhas]
+        return np.where(np.isnan(valor), custo, valor), custo
+
+    def _reindexar(self, linha, antes):
+        """Ajusta os totais e marca o ticker no índice por valor depois de uma escrita na linha."""
+        valor, custo = self._valor_e_custo(linha)
+        self._soma_valor += valor - antes[0]
+        self._soma_custo += custo - antes[1]
+        if valor != antes[0] and self._por_valor is not None:
+            self._alterados.add(self._posicoes[linha].codigo)
+
+    def _reindexar_linhas(self, linhas, valor_antes, custo_antes):
+        """Versão de `_reindexar` para várias linhas alteradas de uma vez."""
+        if len(linhas) > self._limite_em_bloco():
+            # Boa parte da carteira mudou: é mais barato recalcular tudo
+            self.recalcular_totais()
+            self._por_valor = None
+            return
+        valor_depois, custo_depois = self._valores_e_custos(linhas)
+        self._soma_valor += float((valor_depois - valor_antes).sum())
+        self._soma_custo += float((custo_depois - custo_antes).sum())
+        if self._por_valor is not None:
+            self._alterados.update(self._posicoes[linha].codigo for linha in linhas[valor_depois != valor_antes].tolist())
+
+    def _limite_em_bloco(self):
+        return max(32, self.n // 8)
+
+    def _indice_por_valor(self):
+        """O índice por valor, com os tickers alterados já reposicionados."""
+        if self._por_valor is not None and len(self._alterados) > self._limite_em_bloco():
+            self._por_valor = None
+        if self._por_valor is None:
+            valores = self.valores_de_mercado().tolist()
+            self._por_valor = ListaDeSaltos.de_itens_ordenados(sorted(
+                ((-valor, posicao.codigo), posicao) for valor, posicao in zip(valores, self._posicoes)))
+            self._valor_indexado = {posicao.codigo: valor for valor, posicao in zip(valores, self._posicoes)}
+            self._alterados.clear()
+            return self._por_valor
+        for codigo in self._alterados:
+            antigo = self._valor_indexado.pop(codigo, None)
+            if antigo is not None:
+                self._por_valor.delete((-antigo, codigo))
+            posicao = self._indice.get(codigo)
+            if posicao is not None:
+                valor = self._valor_e_custo(posicao.linha)[0]
+                self._por_valor.put((-valor, codigo), posicao)
+                self._valor_indexado[codigo] = valor
+        self._alterados.clear()
+        return self._por_valor
+
+    def recalcular_totais(self):
+        """Recalcula os totais somando todas as linhas (descarta o erro de arredondamento acumulado)."""
+        n = self.n
+        self._soma_valor = float(self.valores_de_mercado().sum())
+        self._soma_custo = float((self.quantidade[:n] * self.preco_medio[:n]).sum())
+
+    def __len__(self):
+        return self.n
+
+    def get(self, codigo):
+        return self._indice.get(codigo)
+
+    def put(self, codigo, dados):
+        """Insere ou sobrescreve a posição com os campos do dicionário `dados`."""
+        posicao = self._indice.get(codigo)
+        if posicao is dados:
+            # A visão já escreve direto nos arrays: nada a fazer
+            return
+        self._conferir_valor("quantidade", dados.get("quantidade", 0))
+        nova = posicao is None
+        if nova:
+            if self.n == len(self.quantidade):
+                self._crescer()
+            posicao = Posicao(self, codigo, self.n)
+            self._posicoes.append(posicao)
+            self.n += 1
+            self._indice.put(codigo, posicao)
+            antes = (0.0, 0.0)
+        else:
+            antes = self._valor_e_custo(posicao.linha)
+        linha = posicao.linha
+        for campo in self.CAMPOS:
+            padrao = 0 if campo == "quantidade" else None
+            self._gravar(linha, campo, dados.get(campo, padrao))
+        if nova:
+            self._por_codigo.put(codigo, posicao)
+            self._por_sufixo.put(codigo[::-1], posicao)
+            if self._por_valor is not None:
+                self._alterados.add(codigo)
+        self._reindexar(linha, antes)
+
+    def delete(self, codigo):
+        """Remove a posição movendo a última linha para o espaço liberado."""
+        posicao = self._indice.get(codigo)
+        if posicao is None:
+            return False
+        self._indice.delete(codigo)
+        linha, ultima = posicao.linha, self.n - 1
+        valor, custo = self._valor_e_custo(linha)
+        self._soma_valor -= valor
+        self._soma_custo -= custo
+        self._por_codigo.delete(codigo)
+        self._por_sufixo.delete(codigo[::-1])
+        if self._por_valor is not None:
+            self._alterados.add(codigo)
+        if linha != ultima:
+            for nome in self.CAMPOS.values():
+                array = getattr(self, nome)
+                array[linha] = array[ultima]
+            movida = self._posicoes[ultima]
+            movida.linha = linha
+            self._posicoes[linha] = movida
+        self._posicoes.pop()
+        self.n -= 1
+        # Limpa a linha que ficou livre no fim dos arrays
+        self.quantidade[ultima] = 0
+        self.preco_medio[ultima] = 0.0
+        self.valor_total[ultima] = self.preco_atual[ultima] = self.lucro_prejuizo[ultima] = np.nan
+        posicao.linha = -1
+        if self.n == 0:
+            self._soma_valor = self._soma_custo = 0.0
+        return True
+
+    def items(self):
+        """Gera os pares (ticker, Posicao) na ordem das linhas."""
+        for posicao in tuple(self._posicoes):
+            yield posicao.codigo, posicao
+
+    def keys(self):
+        for posicao in tuple(self._posicoes):
+            yield posicao.codigo
+
+    def values(self):
+        yield from tuple(self._posicoes)
+
+    def __iter__(self):
+        return self.keys()
+
+    def get_all_items(self):
+        return list(self.items())
+
+    def linhas(self, codigos):
+        """Array com a linha de cada ticker informado (-1 para os ausentes)."""
+        linhas = np.full(len(codigos), -1, dtype=np.int64)
+        for i, codigo in enumerate(codigos):
+            posicao = self._indice.get(codigo)
+            if posicao is not None:
+                linhas[i] = posicao.linha
+        return linhas
+
+    def codigos(self):
+        """Lista de tickers alinhada com as linhas dos arrays."""
+        return [posicao.codigo for posicao in self._posicoes]
+
+    def marcar_a_mercado(self, precos):
+        """
+        Atualiza preço atual, valor total e lucro/prejuízo de todas as
+        posições de uma vez. `precos` é um array alinhado com as linhas;
+        entradas NaN mantêm os valores anteriores daquela posição.
+        """
+        precos = np.asarray(precos, dtype=np.float64)[:self.n]
+        linhas = np.flatnonzero(~np.isnan(precos))
+        return self.marcar_linhas(linhas, precos[linhas])
+
+    def marcar_linhas(self, linhas, precos):
+        """
+        Como `marcar_a_mercado`, mas apenas para as `linhas` informadas, com
+        `precos` alinhado a elas (sem NaN e sem linhas repetidas).
+        """
+        valor_antes, custo_antes = self._valores_e_custos(linhas)
+        self.preco_atual[linhas] = precos
+        self.valor_total[linhas] = self.quantidade[linhas] * precos
+        self.lucro_prejuizo[linhas] = (precos / self.preco_medio[linhas] - 1) * 100
+        self._reindexar_linhas(linhas, valor_antes, custo_antes)
+        return len(linhas)
+
+    @staticmethod
+    def marcar_varias(tabelas, cotacoes):
+        """
+        Marca várias tabelas a mercado com um dict {codigo: preço} (tickers
+        ausentes ou com NaN mantêm o preço anterior), empilhando as linhas
+        de todas elas: a busca dos preços, o cálculo dos valores e os totais
+        de cada tabela são feitos em uma única passada vetorizada, e cada
+        tabela recebe de volta apenas a sua fatia. Retorna a quantidade de
+        linhas atualizadas em cada tabela.
+        """
+        resultado = {id(tabela): 0 for tabela in tabelas}
+        # Tabelas vazias ficam de fora: reduceat não aceita fatias vazias
+        tabelas = [tabela for tabela in tabelas if tabela.n]
+        if not tabelas or not cotacoes:
+            return list(resultado.values())
+        tamanhos = np.array([tabela.n for tabela in tabelas])
+        fins = np.cumsum(tamanhos)
+        inicios = fins - tamanhos
+        precos = np.fromiter((cotacoes.get(posicao.codigo, np.nan) for tabela in tabelas for posicao in tabela._posicoes),
+                             dtype=np.float64, count=int(fins[-1]))
+        validos = ~np.isnan(precos)
+
+        def empilhar(nome):
+            return np.concatenate([getattr(tabela, nome)[:tabela.n] for tabela in tabelas])
+
+        quantidade, preco_medio = empilhar("quantidade"), empilhar("preco_medio")
+        preco_atual = np.where(validos, precos, empilhar("preco_atual"))
+        valor_total = np.where(validos, quantidade * precos, empilhar("valor_total"))
+        lucro_prejuizo = np.where(validos, (precos / preco_medio - 1) * 100, empilhar("lucro_prejuizo"))
+        valor = np.where(np.isnan(valor_total), quantidade * preco_medio, valor_total)
+        somas_valor = np.add.reduceat(valor, inicios).tolist()
+        atualizados = np.add.reduceat(validos, inicios).tolist()
+
+        for tabela, inicio, fim, soma_valor, quantos in zip(tabelas, inicios.tolist(), fins.tolist(),
+                                                             somas_valor, atualizados):
+            if not quantos:
+                continue
+            resultado[id(tabela)] = quantos
+            n = tabela.n
+            tabela.preco_atual[:n] = preco_atual[inicio:fim]
+            tabela.valor_total[:n] = valor_total[inicio:fim]
+            tabela.lucro_prejuizo[:n] = lucro_prejuizo[inicio:fim]
+            tabela._soma_valor = soma_valor
+            # Como na marcação de muitas linhas: o índice por valor é reconstruído na próxima consulta
+            tabela._por_valor = None
+        return list(resultado.values())
+
+    def definir_linhas(self, linhas, quantidade, preco_medio):
+        """
+        Grava quantidade e preço médio de várias linhas de uma vez. O valor
+        total usa o último preço de mercado ou, sem ele, o preço médio.
+        """
+        valor_antes, custo_antes = self._valores_e_custos(linhas)
+        self.quantidade[linhas] = quantidade
+        self.preco_medio[linhas] = preco_medio
+        preco_ref = np.where(np.isnan(self.preco_atual[linhas]), preco_medio, self.preco_atual[linhas])
+        self.valor_total[linhas] = quantidade * preco_ref
+        self._reindexar_linhas(linhas, valor_antes, custo_antes)
+
+    def valores_de_mercado(self):
+        """Valor de cada posição, usando o custo quando ainda não há preço de mercado."""
+        n = self.n
+        custo = self.quantidade[:n] * self.preco_medio[:n]
+        return np.where(np.isnan(self.valor_total[:n]), custo, self.valor_total[:n])
+
+    def valor_total_carteira(self):
+        return self._soma_valor
+
+    def custo_total(self):
+        return self._soma_custo
+
+    def maiores(self, k):
+        """As k posições de maior valor de mercado, em ordem decrescente: [(ticker, valor)]."""
+        return [(codigo, -valor) for (valor, codigo), _ in self._indice_por_valor().primeiros(k)]
+
+    def com_prefixo(self, prefixo):
+        """Tickers que começam com `prefixo`, em ordem alfabética."""
+        return [codigo for codigo, _ in self._por_codigo.com_prefixo(prefixo)]
+
+    def com_sufixo(self, sufixo):
+        """Tickers que terminam com `sufixo` (ex.: ".SA"), em ordem do ticker invertido."""
+        return [posicao.codigo for _, posicao in self._por_sufixo.com_prefixo(sufixo[::-1])]
+
+    def no_intervalo(self, inicio=None, fim=None):
+        """Tickers no intervalo alfabético [inicio, fim), em ordem."""
+        return [codigo for codigo, _ in self._por_codigo.items(inicio, fim)]
@@ -0,0 +1,220 @@
+import abc
+import os
+import zlib
+
+from importacao_tardia import np, pd
+
+
+class ProvedorDados(abc.ABC):
+    """
+    Interface para as fontes de dados de mercado.
+
+    Todo acesso a cotações e históricos do projeto passa por um provedor, o
+    que permite trocar a API real (`ProvedorYFinance`) por dados locais
+    (`ProvedorLocal`) em testes de carga e benchmarks sem acesso à rede.
+    Um provedor que não implemente os métodos abstratos falha ao ser criado
+    (TypeError), e não na primeira consulta.
+    """
+    @abc.abstractmethod
+    def cotacao(self, codigo):
+        """Preço atual do ativo, ou None se não estiver disponível."""
+
+    @abc.abstractmethod
+    def cotacoes(self, codigos):
+        """Dict {codigo: preço} com o último preço de cada ativo (NaN se indisponível)."""
+
+    @abc.abstractmethod
+    def historico(self, codigo, periodo="1y", intervalo="1d"):
+        """DataFrame OHLCV (Open, High, Low, Close, Volume); vazio se não houver dados."""
+
+    @abc.abstractmethod
+    def info(self, codigo):
+        """Dict com informações do ativo no formato do yfinance (shortName, currentPrice, beta)."""
+
+    def infos(self, codigos):
+        """Dict {codigo: info} para vários ativos."""
+        return {codigo: self.info(codigo) for codigo in codigos}
+
+    def historico_desde(self, codigo, inicio, intervalo="1d"):
+        """
+        Barras a partir de `inicio` (inclusive). A implementação padrão busca o
+        menor período que cobre a data e filtra o resultado.
+        """
+        inicio = pd.Timestamp(inicio)
+        agora = pd.Timestamp.now(tz=inicio.tz)
+        dias = (agora - inicio).days + 1
+        periodo = next((p for p, d in sorted(DIAS_POR_PERIODO.items(), key=lambda x: x[1]) if d >= dias), "max")
+        dados = self.historico(codigo, periodo=periodo, intervalo=intervalo)
+        if dados is None or dados.empty:
+            return dados
+        return dados.loc[dados.index >= _mesmo_fuso(inicio, dados.index)]
+
+
+def _mesmo_fuso(instante, indice):
+    """Converte o instante para o fuso do índice, para poder compará-los."""
+    instante = pd.Timestamp(instante)
+    if indice.tz is None:
+        return instante.tz_convert(None) if instante.tz is not None else instante
+    return instante.tz_localize(indice.tz) if instante.tz is None else instante.tz_convert(indice.tz)
+
+
+class ProvedorYFinance(ProvedorDados):
+    """
+    Provedor que consulta a API do Yahoo Finance via yfinance. O yfinance
+    (e o pandas que ele carrega) só é importado na primeira consulta.
+    """
+    def __init__(self):
+        self._modulo_yf = None
+
+    @property
+    def _yf(self):
+        if self._modulo_yf is None:
+            import yfinance as yf
+            self._modulo_yf = yf
+        return self._modulo_yf
+
+    def __getstate__(self):
+        # Módulos não são serializáveis: um processo de trabalho importa o yfinance de novo
+        return {**self.__dict__, "_modulo_yf": None}
+
+    def cotacao(self, codigo):
+        return self.info(codigo).get('currentPrice')
+
+    def cotacoes(self, codigos):
+        codigos = list(codigos)
+        fechamentos = self._yf.download(codigos, period="1d", interval="15m", progress=False, multi_level_index=False)['Close']
+        if isinstance(fechamentos, pd.DataFrame) and len(codigos) > 1:
+            ultimos = fechamentos.iloc[-1]
+            return {codigo: float(ultimos.get(codigo, np.nan)) for codigo in codigos}
+        ultimo = fechamentos.squeeze().iloc[-1] if len(fechamentos) else np.nan
+        return {codigos[0]: float(ultimo)}
+
+    def historico(self, codigo, periodo="1y", intervalo="1d"):
+        return self._yf.Ticker(codigo).history(period=periodo, interval=intervalo)
+
+    def info(self, codigo):
+        return self._yf.Ticker(codigo).info
+
+    def historico_desde(self, codigo, inicio, intervalo="1d"):
+        return self._yf.Ticker(codigo).history(start=pd.Timestamp(inicio), interval=intervalo)
+
+
+INDICE_MERCADO = "^BVSP"
+
+# Tamanho aproximado de cada período em dias corridos
+DIAS_POR_PERIODO = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 91, "6mo": 182, "1y": 365,
+                     "2y": 730, "5y": 1826, "10y": 3652, "ytd": 365, "max": 7305}
+# Intervalo do yfinance -> frequência do pandas
+_FREQUENCIAS = {"1m": "1min", "2m": "2min", "5m": "5min", "15m": "15min", "30m": "30min",
+                "60m": "60min", "90m": "90min", "1h": "60min", "1d": "B", "5d": "5B",
+                "1wk": "W-FRI", "1mo": "BME", "3mo": "BQE"}
+
+
+class ProvedorLocal(ProvedorDados):
+    """
+    Provedor offline. Lê `<diretorio>/<codigo>.parquet` ou `<codigo>.csv`
+    (índice de datas na primeira coluna e colunas OHLCV) quando existirem e,
+    caso contrário, gera um histórico sintético por movimento browniano
+    geométrico, com semente derivada do ticker. O resultado é reprodutível:
+    o mesmo ticker sempre produz a mesma série.
+    """
+    def __init__(self, diretorio=None, semente=0, data_final=None):
+        self.diretorio = diretorio
+        self.semente = semente
+        # Convertida no primeiro uso: criar o provedor não importa o pandas
+        self._data_final = data_final
+
+    @property
+    def data_final(self):
+        if not isinstance(self._data_final, pd.Timestamp):
+            self._data_final = pd.Timestamp(self._data_final or pd.Timestamp.today().normalize())
+        return self._data_final
+
+    def _ler_arquivo(self, codigo):
+        if self.diretorio is None:
+            return None
+        base = os.path.join(self.diretorio, codigo)
+        if os.path.exists(base + ".parquet"):
+            return pd.read_parquet(base + ".parquet")
+        if os.path.exists(base + ".csv"):
+            return pd.read_csv(base + ".csv", index_col=0, parse_dates=True)
+        return None
+
+    def _sorteios(self, chave):
+        """
+        Gerador de números aleatórios para uma chave. Cada série usa sua própria
+        chave e é sorteada do fim para o começo, então períodos diferentes
+        compartilham os mesmos valores nas datas em comum (o histórico de 1y é
+        o final do de 2y).
+        """
+        # crc32 é estável entre execuções, ao contrário de hash() para strings
+        return np.random.default_rng([self.semente, zlib.crc32(chave.encode())])
+
+    def _gerar_sintetico(self, codigo, inicio, frequencia):
+        try:
+            # Alinha frequências fixas (ex.: 15min) à grade que termina em data_final
+            inicio = inicio.ceil(frequencia)
+        except ValueError:
+            pass
+        indice = pd.date_range(inicio, self.data_final, freq=frequencia)
+        n = len(indice)
+        rng = self._sorteios(codigo)
+        preco_final = rng.uniform(5, 100)
+        beta = 1.0 if codigo == INDICE_MERCADO else rng.uniform(0.5, 1.5)
+        volatilidade = 0.0 if codigo == INDICE_MERCADO else rng.uniform(0.005, 0.02)
+
+        # Fator de mercado comum a todos os tickers, para que o beta faça sentido
+        mercado = self._sorteios(INDICE_MERCADO + "/retornos").normal(0.0003, 0.012, n)[::-1]
+        retornos = beta * mercado + self._sorteios(codigo + "/retornos").normal(0.0, volatilidade, n)[::-1]
+        # Preço ancorado na data final: log P(t) = log P(fim) - soma dos retornos posteriores
+        posteriores = np.r_[np.cumsum(retornos[::-1])[::-1][1:], 0.0]
+        fechamento = preco_final * np.exp(-posteriores)
+        abertura = fechamento * np.exp(-retornos)
+        amplitude = np.abs(self._sorteios(codigo + "/amplitude").normal(0, 0.005, n))[::-1]
+        return pd.DataFrame({
+            "Open": abertura,
+            "High": np.maximum(abertura, fechamento) * (1 + amplitude),
+            "Low": np.minimum(abertura, fechamento) * (1 - amplitude),
+            "Close": fechamento,
+            "Volume": self._sorteios(codigo + "/volume").integers(10_000, 5_000_000, n)[::-1],
+        }, index=indice)
+
+    def historico(self, codigo, periodo="1y", intervalo="1d"):
+        inicio = self.data_final - pd.Timedelta(days=DIAS_POR_PERIODO.get(periodo, 365))
+        dados = self._ler_arquivo(codigo)
+        if dados is None:
+            return self._gerar_sintetico(codigo, inicio, _FREQUENCIAS.get(intervalo, "B"))
+        return dados.loc[dados.index >= inicio]
+
+    def historico_desde(self, codigo, inicio, intervalo="1d"):
+        inicio = pd.Timestamp(inicio)
+        inicio = inicio.tz_convert(None) if inicio.tz is not None else inicio
+        dados = self._ler_arquivo(codigo)
+        if dados is None:
+            return self._gerar_sintetico(codigo, inicio, _FREQUENCIAS.get(intervalo, "B"))
+        return dados.loc[dados.index >= _mesmo_fuso(inicio, dados.index)]
+
+    def cotacao(self, codigo):
+        dados = self.historico(codigo, periodo="5d", intervalo="1d")
+        return float(dados['Close'].iloc[-1]) if not dados.empty else None
+
+    def cotacoes(self, codigos):
+        return {codigo: (self.cotacao(codigo) or np.nan) for codigo in codigos}
+
+    def info(self, codigo):
+        return {"shortName": codigo, "currentPrice": self.cotacao(codigo), "beta": None}
+
+
+def criar_provedor(nome=None, **kwargs):
+    """
+    Cria o provedor pelo nome ("yfinance" ou "local"). Sem nome, usa a
+    variável de ambiente PROVEDOR_DADOS (padrão "yfinance"); para o provedor
+    local, DADOS_LOCAIS_DIR indica a pasta com os arquivos.
+    """
+    nome = nome or os.environ.get("PROVEDOR_DADOS", "yfinance")
+    if nome == "local":
+        kwargs.setdefault("diretorio", os.environ.get("DADOS_LOCAIS_DIR"))
+        return ProvedorLocal(**kwargs)
+    if nome == "yfinance":
+        return ProvedorYFinance(**kwargs)
+    raise ValueError(f"Provedor de dados desconhecido: {nome}")
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def _inicios_dos_grupos(n, tamanho_grupo):
+    """Posição da primeira barra de cada grupo de `tamanho_grupo` barras consecutivas."""
+    return np.arange(0, n, tamanho_grupo, dtype=np.int64)
+
+
+def _agregar(posicoes, abertura, maxima, minima, fechamento, volume, inicios):
+    """
+    Agrega colunas OHLCV nos grupos que começam em `inicios`: abertura da
+    primeira barra, máxima das máximas, mínima das mínimas, fechamento da
+    última barra e soma dos volumes. NaN é ignorado na máxima, na mínima e
+    no volume.
+    """
+    finais = np.r_[inicios[1:], len(posicoes)] - 1
+    return (
+        posicoes[inicios],
+        abertura[inicios],
+        np.fmax.reduceat(maxima, inicios),
+        np.fmin.reduceat(minima, inicios),
+        fechamento[finais],
+        np.add.reduceat(np.nan_to_num(volume), inicios),
+    )
+
+
+def reduzir_ohlc(dados, max_barras):
+    """
+    Reagrupa um DataFrame OHLCV em no máximo `max_barras` barras, juntando
+    barras consecutivas em grupos de mesmo tamanho. Cada barra resultante
+    fica com a data da primeira barra do grupo. Se já couber, o DataFrame
+    é devolvido sem cópia.
+    """
+    n = len(dados)
+    if n <= max_barras:
+        return dados
+    inicios = _inicios_dos_grupos(n, math.ceil(n / max_barras))
+    colunas = _agregar(np.arange(n), *(dados[c].to_numpy(dtype=np.float64)
+                                        for c in ("Open", "High", "Low", "Close", "Volume")), inicios)
+    posicoes, abertura, maxima, minima, fechamento, volume = colunas
+    return pd.DataFrame({"Open": abertura, "High": maxima, "Low": minima, "Close": fechamento, "Volume": volume},
+                        index=dados.index[posicoes])
+
+
+def lttb(x, y, n_pontos):
+    """
+    Largest-Triangle-Three-Buckets: escolhe `n_pontos` pontos da série (x, y)
+    que preservam sua forma visual, para gráficos de linha. O primeiro e o
+    último pontos são sempre mantidos. Retorna os índices escolhidos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_pontos >= n or n_pontos < 3:
+        return np.arange(n)
+
+    # Limites dos n_pontos - 2 grupos internos (o primeiro e o último ponto ficam de fora)
+    limites = np.floor(np.linspace(1, n - 1, n_pontos - 1)).astype(np.int64)
+    escolhidos = np.empty(n_pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    a = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo grupo (ou o último ponto, no grupo final)
+        if i + 2 < len(limites):
+            proximo = slice(limites[i + 1], limites[i + 2])
+            media_x, media_y = x[proximo].mean(), y[proximo].mean()
+        else:
+            media_x, media_y = x[n - 1], y[n - 1]
+        # Ponto do grupo atual que forma o maior triângulo com o anterior escolhido e a média seguinte
+        areas = np.abs((x[a] - media_x) * (y[inicio:fim] - y[a]) - (x[a] - x[inicio:fim]) * (media_y - y[a]))
+        a = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def reduzir_linha(serie, max_pontos):
+    """Aplica o LTTB a uma Series indexada por datas."""
+    if len(serie) <= max_pontos:
+        return serie
+    x = serie.index.asi8 if isinstance(serie.index, pd.DatetimeIndex) else np.arange(len(serie))
+    return serie.iloc[lttb(x, serie.to_numpy(dtype=np.float64), max_pontos)]
+
+
+class PiramideOHLC:
+    """
+    Níveis pré-agregados de um histórico OHLCV, para gráficos que mudam de
+    zoom com frequência. O nível k junta 2**k barras originais e é montado a
+    partir do nível k-1 (pares de barras), apenas na primeira vez em que é
+    pedido; os seguintes ficam guardados. `janela(inicio, fim, max_barras)`
+    escolhe o nível mais detalhado em que o intervalo cabe em `max_barras`
+    barras e devolve só essa fatia, sem reagregar nada.
+    """
+    def __init__(self, dados):
+        self.indice = dados.index
+        posicoes = np.arange(len(dados), dtype=np.int64)
+        colunas = tuple(dados[c].to_numpy(dtype=np.float64) for c in ("Open", "High", "Low", "Close", "Volume"))
+        # Cada nível guarda a posição da primeira barra original de cada grupo e as colunas OHLCV
+        self.niveis = [(posicoes,) + colunas]
+
+    def __len__(self):
+        return len(self.indice)
+
+    def nivel(self, k):
+        while len(self.niveis) <= k:
+            anterior = self.niveis[-1]
+            if len(anterior[0]) <= 1:
+                return anterior
+            self.niveis.append(_agregar(*anterior, _inicios_dos_grupos(len(anterior[0]), 2)))
+        return self.niveis[k]
+
+    def janela(self, inicio=None, fim=None, max_barras=600):
+        a = 0 if inicio is None else int(self.indice.searchsorted(inicio, side="left"))
+        b = len(self.indice) if fim is None else int(self.indice.searchsorted(fim, side="right"))
+        if b <= a:
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], index=self.indice[:0])
+        # Reserva um grupo para o desalinhamento das bordas com a grade do nível
+        k = 0
+        while b - a > max(max_barras - 1, 1) * 2 ** k:
+            k += 1
+        posicoes, abertura, maxima, minima, fechamento, volume = self.nivel(k)
+        # Grupos que contêm alguma barra do intervalo
+        i = int(np.searchsorted(posicoes, a, side="right")) - 1
+        j = int(np.searchsorted(posicoes, b, side="left"))
+        return pd.DataFrame({"Open": abertura[i:j], "High": maxima[i:j], "Low": minima[i:j],
+                             "Close": fechamento[i:j], "Volume": volume[i:j]},
+                            index=self.indice[posicoes[i:j]])
@@ -0,0 +1,111 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from estruturas_dados import TabelaHashEncadeada, TabelaHashConcorrente
+from portifolio_manager import PortfolioManager, FerramentasDeAnalise
+from provedores_dados import criar_provedor
+
+
+class RegistroPortfolios:
+    """
+    Gerencia um `PortfolioManager` por conta de cliente.
+
+    Todos os portfólios do registro compartilham o mesmo provedor de dados e
+    o mesmo `FerramentasDeAnalise` (e, portanto, o mesmo cache de históricos
+    e o mesmo armazenamento em disco): mil contas com PETR4.SA mantêm uma
+    única cópia do histórico do ativo.
+
+    `reavaliar_todos()` junta os tickers de todas as contas sem repetição,
+    busca as cotações uma única vez, em lotes paralelos, e marca todas as
+    carteiras em uma única passada vetorizada sobre as linhas empilhadas de
+    todas elas (ver `PortfolioManager.aplicar_cotacoes_em_varios`). A busca
+    espera pela rede e ganha com as threads; a marcação roda sob o GIL e
+    ganharia pouco com elas, então o que pesa é não repetir o custo fixo de
+    uma marcação por conta.
+
+    Com `concorrente=True`, as contas são consultadas sem trava e cada
+    carteira é criada no modo concorrente do `PortfolioManager`, para que
+    várias sessões e tarefas possam operar a mesma conta.
+    """
+    def __init__(self, provedor=None, tipo_tabela=TabelaHashEncadeada, diretorio_historico=None,
+                 max_trabalhadores=None, tickers_por_lote=50, concorrente=False):
+        self.tipo_tabela = tipo_tabela
+        self.provedor = provedor if provedor is not None else criar_provedor()
+        self.analisador = FerramentasDeAnalise(tipo_tabela=tipo_tabela, provedor=self.provedor,
+                                               diretorio_historico=diretorio_historico)
+        self.max_trabalhadores = max_trabalhadores or os.cpu_count() or 4
+        self.tickers_por_lote = tickers_por_lote
+        self.concorrente = concorrente
+        self._portfolios = TabelaHashConcorrente() if concorrente else tipo_tabela()
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._portfolios)
+
+    def __contains__(self, conta):
+        return self._portfolios.get(conta) is not None
+
+    def contas(self):
+        return list(self._portfolios.keys())
+
+    def criar(self, conta, saldo_inicial=10000.0, diario=None):
+        """Cria o portfólio da conta, ligado aos dados de mercado compartilhados."""
+        with self._trava:
+            if self._portfolios.get(conta) is not None:
+                print(f"ERRO: A conta {conta} já existe.")
+                return None
+            portfolio = PortfolioManager(saldo_inicial=saldo_inicial, tipo_tabela=self.tipo_tabela,
+                                         diario=diario, provedor=self.provedor, analisador=self.analisador,
+                                         concorrente=self.concorrente)
+            self._portfolios.put(conta, portfolio)
+            return portfolio
+
+    def obter(self, conta):
+        return self._portfolios.get(conta)
+
+    def remover(self, conta):
+        with self._trava:
+            return self._portfolios.delete(conta)
+
+    def tickers(self):
+        """Tickers de todas as contas, sem repetição."""
+        unicos = {}
+        for portfolio in self._portfolios.values():
+            unicos.update(dict.fromkeys(portfolio.ativos.codigos()))
+        return list(unicos)
+
+    def _buscar_cotacoes(self, tickers, executor):
+        lotes = [tickers[i:i + self.tickers_por_lote] for i in range(0, len(tickers), self.tickers_por_lote)]
+        cotacoes = {}
+        for parcial in executor.map(self.provedor.cotacoes, lotes):
+            cotacoes.update(parcial)
+        return cotacoes
+
+    def reavaliar_todos(self):
+        """
+        Atualiza os preços de todas as carteiras com uma única busca por
+        ticker. Retorna um dict com a quantidade de contas, de tickers
+        distintos e de tickers sem cotação.
+        """
+        portfolios = [p for p in self._portfolios.values() if p.ativos]
+        tickers = self.tickers()
+        if not tickers:
+            return {"contas": 0, "tickers": 0, "sem_cotacao": 0}
+
+        with ThreadPoolExecutor(max_workers=self.max_trabalhadores) as executor:
+            try:
+                cotacoes = self._buscar_cotacoes(tickers, executor)
+            except Exception as e:
+                print(f"ERRO ao buscar dados de mercado: {e}")
+                return {"contas": 0, "tickers": len(tickers), "sem_cotacao": len(tickers)}
+
+        PortfolioManager.aplicar_cotacoes_em_varios(portfolios, cotacoes)
+
+        sem_cotacao = sum(1 for codigo in tickers if math.isnan(cotacoes.get(codigo, math.nan)))
+        return {"contas": len(portfolios), "tickers": len(tickers), "sem_cotacao": sem_cotacao}
+
+    def valor_total(self):
+        """Soma do saldo e do valor de mercado de todas as contas."""
+        return sum(p.saldo + p.totais()["valor_mercado"] for p in self._portfolios.values())
@@ -0,0 +1,141 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+from importacao_tardia import pd
+
+from backtest import fechamentos_alinhados
+
+
+def _piores(perdas_atuais, novas, k):
+    """Mantém apenas os k menores resultados (as maiores perdas) vistos até agora."""
+    juntos = np.concatenate([perdas_atuais, novas])
+    if len(juntos) <= k:
+        return juntos
+    return np.partition(juntos, k - 1)[:k]
+
+
+def _simular_lotes(fator, media, valores, lotes, k):
+    """
+    Simula os lotes [(semente, tamanho), ...] e devolve os k piores
+    resultados. Cada lote tem sua própria semente, então o resultado não
+    depende de quantos processos dividiram o trabalho.
+    """
+    piores = np.empty(0)
+    for semente, tamanho in lotes:
+        rng = np.random.default_rng(semente)
+        choques = rng.standard_normal((tamanho, len(media)))
+        retornos = choques @ fator.T + media
+        piores = _piores(piores, retornos @ valores, k)
+    return piores
+
+
+class MotorRisco:
+    """
+    Risco da carteira como um todo, calculado sobre os mesmos históricos em
+    cache usados por `FerramentasDeAnalise`.
+
+    Os valores em risco (VaR) e as perdas esperadas além dele (CVaR) são
+    dados em reais, como perdas positivas, para o nível de confiança e o
+    horizonte (em pregões) informados:
+    - paramétrico: retornos normais com a média e a covariância históricas;
+    - histórico: quantil das variações diárias que a carteira atual teria
+      tido no período;
+    - Monte Carlo: caminhos gerados em lotes vetorizados a partir da
+      decomposição de Cholesky da covariância, com gerador semeado.
+
+    No Monte Carlo, cada lote guarda apenas as piores perdas necessárias
+    para o quantil, então a memória usada depende do tamanho do lote e não
+    da quantidade de caminhos. Com `processos`, os lotes são divididos entre
+    processos; como cada lote tem sua própria semente, o resultado é o mesmo
+    com qualquer quantidade de processos.
+    """
+    def __init__(self, analisador, periodo="1y"):
+        self.analisador = analisador
+        self.periodo = periodo
+
+    def retornos(self, codigos):
+        """Retornos diários alinhados (apenas os dias em que todos os ativos têm preço)."""
+        fechamentos = fechamentos_alinhados(self.analisador, codigos, periodo=self.periodo)
+        faltantes = [codigo for codigo in codigos if codigo not in fechamentos.columns]
+        if faltantes:
+            print(f"AVISO: Sem histórico para {', '.join(faltantes)}; ativo(s) fora do cálculo de risco.")
+        return fechamentos.pct_change(fill_method=None).dropna(how="any")
+
+    def matriz_covariancia(self, codigos):
+        return self.retornos(codigos).cov()
+
+    def _alinhar(self, codigos, valores):
+        """Retornos e valores por ativo restritos aos ativos com histórico."""
+        valores = pd.Series(np.asarray(valores, dtype=np.float64), index=list(codigos))
+        retornos = self.retornos(list(codigos))
+        return retornos, valores.reindex(retornos.columns).to_numpy()
+
+    def var_parametrico(self, codigos, valores, nivel=0.95, horizonte=1):
+        retornos, valores = self._alinhar(codigos, valores)
+        if retornos.empty:
+            return {"var": None, "cvar": None}
+        media = float(retornos.mean().to_numpy() @ valores) * horizonte
+        desvio = math.sqrt(max(float(valores @ retornos.cov().to_numpy() @ valores), 0.0) * horizonte)
+        normal = NormalDist()
+        z = normal.inv_cdf(nivel)
+        return {
+            "var": desvio * z - media,
+            "cvar": desvio * normal.pdf(z) / (1 - nivel) - media,
+        }
+
+    def var_historico(self, codigos, valores, nivel=0.95, horizonte=1):
+        retornos, valores = self._alinhar(codigos, valores)
+        if retornos.empty:
+            return {"var": None, "cvar": None}
+        resultados = retornos.to_numpy() @ valores
+        if horizonte > 1:
+            # Variações sobrepostas de `horizonte` pregões
+            acumulado = np.r_[0.0, np.cumsum(resultados)]
+            resultados = acumulado[horizonte:] - acumulado[:-horizonte]
+        k = max(1, math.ceil(len(resultados) * (1 - nivel)))
+        piores = np.sort(resultados)[:k]
+        return {"var": -float(piores[-1]), "cvar": -float(piores.mean())}
+
+    def var_monte_carlo(self, codigos, valores, nivel=0.95, horizonte=1, n_caminhos=1_000_000,
+                        tamanho_lote=25_000, semente=0, processos=None):
+        retornos, valores = self._alinhar(codigos, valores)
+        if retornos.empty:
+            return {"var": None, "cvar": None}
+        media = retornos.mean().to_numpy() * horizonte
+        covariancia = retornos.cov().to_numpy() * horizonte
+        # Pequeno ajuste na diagonal para matrizes semidefinidas (ex.: ativos idênticos)
+        fator = np.linalg.cholesky(covariancia + np.eye(len(media)) * 1e-12)
+
+        k = max(1, math.ceil(n_caminhos * (1 - nivel)))
+        tamanhos = [min(tamanho_lote, n_caminhos - i) for i in range(0, n_caminhos, tamanho_lote)]
+        sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+        lotes = list(zip(sementes, tamanhos))
+
+        if processos is None or processos <= 1:
+            piores = _simular_lotes(fator, media, valores, lotes, k)
+        else:
+            processos = min(processos, len(lotes), os.cpu_count() or 1)
+            partes = [lotes[i::processos] for i in range(processos)]
+            piores = np.empty(0)
+            with ProcessPoolExecutor(max_workers=processos) as executor:
+                futuros = [executor.submit(_simular_lotes, fator, media, valores, parte, k) for parte in partes]
+                for futuro in futuros:
+                    piores = _piores(piores, futuro.result(), k)
+
+        piores = np.sort(piores)
+        return {"var": -float(piores[-1]), "cvar": -float(piores.mean())}
+
+    def risco_da_carteira(self, portfolio, nivel=0.95, horizonte=1, **kwargs_monte_carlo):
+        """VaR e CVaR das posições atuais de `portfolio` pelos três métodos."""
+        codigos = portfolio.ativos.codigos()
+        if not codigos:
+            return None
+        valores = portfolio.ativos.valores_de_mercado()
+        return {
+            "parametrico": self.var_parametrico(codigos, valores, nivel, horizonte),
+            "historico": self.var_historico(codigos, valores, nivel, horizonte),
+            "monte_carlo": self.var_monte_carlo(codigos, valores, nivel, horizonte, **kwargs_monte_carlo),
+        }
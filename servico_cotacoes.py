@@ -0,0 +1,164 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metricas import METRICAS
+from provedores_dados import ProvedorDados
+
+
+class ServicoCotacoes(ProvedorDados):
+    """
+    Camada de cotações concorrente sobre outro provedor.
+
+    Implementa a mesma interface de `ProvedorDados`, então pode ser passada
+    como `provedor` ao `PortfolioManager` para que o dashboard, as ordens e
+    `atualizar_precos` compartilhem o mesmo cache de cotações:
+
+    - as buscas de vários tickers são disparadas em paralelo em um pool de
+      no máximo `max_concorrencia` threads;
+    - pedidos do mesmo ticker já em andamento são reaproveitados, em vez de
+      gerar uma nova chamada;
+    - cada chamada espera no máximo `timeout` segundos; o que não chegar a
+      tempo volta como ausente (None/NaN) sem travar a página;
+    - cotações e informações ficam em cache por `ttl` segundos.
+
+    Históricos (`historico`, `historico_desde`) são repassados ao provedor
+    de origem sem alteração.
+
+    O pool de threads vive enquanto o serviço existir: um serviço que deixa
+    de ser usado deve ser encerrado com `fechar()` (ou usado em um bloco
+    `with`). No dashboard há um único serviço para todas as sessões.
+    """
+    def __init__(self, provedor, max_concorrencia=16, timeout=5.0, ttl=15.0, relogio=time.monotonic):
+        self.provedor = provedor
+        self.timeout = timeout
+        self.ttl = ttl
+        self.relogio = relogio
+        self._executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix="cotacoes")
+        # RLock: o callback de um Future já concluído roda na própria thread que o registra
+        self._trava = threading.RLock()
+        self._cache = {}  # (tipo, codigo) -> (valor, expira_em)
+        self._em_andamento = {}  # (tipo, codigo) -> Future
+
+    def _do_cache(self, chave):
+        """Deve ser chamado com a trava."""
+        entrada = self._cache.get(chave)
+        if entrada is None:
+            return None
+        valor, expira_em = entrada
+        if self.relogio() >= expira_em:
+            del self._cache[chave]
+            return None
+        return valor
+
+    def _guardar(self, chave, valor):
+        """Deve ser chamado com a trava."""
+        if valor is not None:
+            self._cache[chave] = (valor, self.relogio() + self.ttl)
+
+    def _finalizar(self, chaves, futuro, extrair):
+        """Callback do Future: preenche o cache e libera as chaves em andamento."""
+        with self._trava:
+            if futuro.exception() is None:
+                resultado = futuro.result()
+                for tipo, codigo in chaves:
+                    self._guardar((tipo, codigo), extrair(resultado, codigo))
+            for chave in chaves:
+                if self._em_andamento.get(chave) is futuro:
+                    del self._em_andamento[chave]
+
+    def _buscar(self, tipo, codigos, disparar, extrair):
+        """
+        Resolve `codigos` pelo cache, por pedidos em andamento ou por novas
+        chamadas (`disparar(faltantes)` devolve uma lista de (codigos, Future)).
+        """
+        codigos = list(dict.fromkeys(codigos))
+        resultados = {}
+        aguardando = {}
+        with self._trava:
+            faltantes = []
+            for codigo in codigos:
+                valor = self._do_cache((tipo, codigo))
+                if valor is not None:
+                    resultados[codigo] = valor
+                elif (tipo, codigo) in self._em_andamento:
+                    aguardando[codigo] = self._em_andamento[(tipo, codigo)]
+                else:
+                    faltantes.append(codigo)
+            METRICAS.contar("cache_consultas", len(resultados), cache="cotacoes", resultado="acerto")
+            METRICAS.contar("cache_consultas", len(codigos) - len(resultados), cache="cotacoes", resultado="falta")
+            METRICAS.contar("cotacoes_coalescidas", len(aguardando))
+            for grupo, futuro in disparar(faltantes):
+                chaves = [(tipo, codigo) for codigo in grupo]
+                for chave in chaves:
+                    self._em_andamento[chave] = futuro
+                for codigo in grupo:
+                    aguardando[codigo] = futuro
+                futuro.add_done_callback(lambda f, chaves=chaves: self._finalizar(chaves, f, extrair))
+
+        if aguardando:
+            wait(set(aguardando.values()), timeout=self.timeout)
+        for codigo, futuro in aguardando.items():
+            if futuro.done() and futuro.exception() is None:
+                resultados[codigo] = extrair(futuro.result(), codigo)
+            elif not futuro.done():
+                METRICAS.contar("cotacoes_timeout", tipo=tipo)
+        return resultados
+
+    def _medido(self, operacao, funcao):
+        """Envolve uma chamada ao provedor de origem com o cronômetro de latência."""
+        def executar(*args):
+            with METRICAS.cronometro("provedor_segundos", operacao=operacao):
+                return funcao(*args)
+        return executar
+
+    def infos(self, codigos):
+        """Informações de vários ativos, buscadas em paralelo (None para os que falharem)."""
+        def disparar(faltantes):
+            return [([codigo], self._executor.submit(self._medido("info", self.provedor.info), codigo)) for codigo in faltantes]
+
+        resultados = self._buscar("info", codigos, disparar, lambda resultado, codigo: resultado)
+        return {codigo: resultados.get(codigo) for codigo in codigos}
+
+    def info(self, codigo):
+        return self.infos([codigo])[codigo] or {}
+
+    def cotacao(self, codigo):
+        return self.info(codigo).get('currentPrice')
+
+    def cotacoes(self, codigos):
+        """Últimos preços; os tickers fora do cache são pedidos em uma única chamada ao provedor."""
+        def disparar(faltantes):
+            if not faltantes:
+                return []
+            return [(faltantes, self._executor.submit(self._medido("cotacoes", self.provedor.cotacoes), faltantes))]
+
+        def extrair(resultado, codigo):
+            preco = resultado.get(codigo)
+            return None if preco is None or math.isnan(preco) else preco
+
+        resultados = self._buscar("preco", codigos, disparar, extrair)
+        return {codigo: (resultados.get(codigo) if resultados.get(codigo) is not None else math.nan)
+                for codigo in codigos}
+
+    def historico(self, codigo, periodo="1y", intervalo="1d"):
+        return self.provedor.historico(codigo, periodo=periodo, intervalo=intervalo)
+
+    def historico_desde(self, codigo, inicio, intervalo="1d"):
+        return self.provedor.historico_desde(codigo, inicio, intervalo=intervalo)
+
+    def limpar_cache(self):
+        with self._trava:
+            self._cache.clear()
+
+    def fechar(self):
+        """Encerra o pool de threads, cancelando as buscas que ainda não começaram."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+        return False
@@ -0,0 +1,131 @@
+"""
+Invariantes do modo concorrente (`PortfolioManager(concorrente=True)`), com
+sementes fixas e poucas operações, para rodar em segundos:
+
+- em todo instantâneo lido durante as ordens, saldo + custo das posições -
+  lucro realizado é igual ao saldo inicial, e o custo bate com a soma das
+  posições;
+- ao final, a quantidade de cada ativo é a soma das ordens executadas nele;
+- reabrir o diário de transações reconstrói exatamente o estado final.
+
+A ordem em que as threads se intercalam varia, mas os invariantes valem em
+qualquer intercalação. O estresse com mais threads e a medição de vazão
+ficam em benchmarks/concorrencia.py.
+
+Uso:
+    python -m pytest tests
+    python tests/test_concorrencia.py
+"""
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diario import DiarioTransacoes
+from portifolio_manager import PortfolioManager
+from provedores_dados import ProvedorLocal
+
+SALDO_INICIAL = 1e7
+CODIGOS = [f"INV{i:02d}.SA" for i in range(12)]
+THREADS = 4
+OPERACOES = 300
+
+
+def problemas_do_instantaneo(estado):
+    """Lista de invariantes violados em um `instantaneo()` da carteira."""
+    posicoes = estado["posicoes"]
+    custo_linhas = float((posicoes["quantidade"] * posicoes["preco_medio"]).sum())
+    problemas = []
+    if not math.isclose(estado["saldo"] + estado["custo"] - estado["lucro_vendas"], SALDO_INICIAL, rel_tol=1e-9):
+        problemas.append("saldo + custo - lucro realizado != saldo inicial")
+    if not math.isclose(estado["custo"], custo_linhas, rel_tol=1e-9, abs_tol=1e-6):
+        problemas.append("custo total != soma das posições")
+    if (posicoes["quantidade"] <= 0).any():
+        problemas.append("posição com quantidade não positiva")
+    return problemas
+
+
+def _novo_portfolio(pasta):
+    return PortfolioManager(saldo_inicial=SALDO_INICIAL, provedor=ProvedorLocal(), concorrente=True,
+                            diario=DiarioTransacoes(pasta, intervalo_snapshot=200))
+
+
+def _operar(portfolio, semente, executadas):
+    """Compras, vendas e lotes em ativos sorteados, e uma marcação a mercado a cada 25 operações."""
+    rng = random.Random(semente)
+    for n in range(OPERACOES):
+        codigo, quantidade, preco = rng.choice(CODIGOS), rng.randint(1, 20), round(rng.uniform(5, 50), 2)
+        sorteio = rng.random()
+        if sorteio < 0.45:
+            if portfolio.comprar(codigo, quantidade, preco):
+                executadas[codigo] = executadas.get(codigo, 0) + quantidade
+        elif sorteio < 0.85:
+            if portfolio.vender(codigo, quantidade, preco):
+                executadas[codigo] = executadas.get(codigo, 0) - quantidade
+        else:
+            outro = rng.choice(CODIGOS)
+            ordens = [(codigo, "compra", quantidade, preco), (outro, "compra", 2, preco), (outro, "venda", 1, preco)]
+            if portfolio.executar_lote(ordens)["sucesso"]:
+                executadas[codigo] = executadas.get(codigo, 0) + quantidade
+                executadas[outro] = executadas.get(outro, 0) + 1
+        if n % 25 == 24:
+            portfolio.aplicar_cotacoes({c: round(rng.uniform(5, 50), 2) for c in rng.sample(CODIGOS, 4)})
+
+
+def test_invariantes_e_diario_no_modo_concorrente():
+    intervalo = sys.getswitchinterval()
+    # Trocas de thread frequentes: mais intercalações no meio das ordens
+    sys.setswitchinterval(1e-5)
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            portfolio = _novo_portfolio(pasta)
+            executadas = [{} for _ in range(THREADS)]
+            falhas = []
+            parar = threading.Event()
+
+            def ler():
+                while not parar.is_set():
+                    falhas.extend(problemas_do_instantaneo(portfolio.instantaneo()))
+
+            leitor = threading.Thread(target=ler)
+            threads = [threading.Thread(target=_operar, args=(portfolio, 100 + i, executadas[i]))
+                       for i in range(THREADS)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                leitor.start()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                parar.set()
+                leitor.join()
+
+            assert falhas == []
+            final = portfolio.instantaneo()
+            assert problemas_do_instantaneo(final) == []
+
+            esperado = {codigo: sum(parte.get(codigo, 0) for parte in executadas) for codigo in CODIGOS}
+            quantidades = final["posicoes"]["quantidade"].reindex(CODIGOS, fill_value=0).to_dict()
+            assert quantidades == esperado
+
+            portfolio.diario.fechar()
+            with contextlib.redirect_stdout(io.StringIO()):
+                restaurado = _novo_portfolio(pasta).instantaneo()
+            assert math.isclose(restaurado["saldo"], final["saldo"], rel_tol=1e-12)
+            assert math.isclose(restaurado["lucro_vendas"], final["lucro_vendas"], rel_tol=1e-12, abs_tol=1e-9)
+            vivas, repetidas = final["posicoes"].sort_index(), restaurado["posicoes"].sort_index()
+            assert repetidas["quantidade"].equals(vivas["quantidade"])
+            # O preço médio refeito a partir do snapshot pode diferir no último bit
+            assert ((repetidas["preco_medio"] - vivas["preco_medio"]).abs() <= 1e-9 * vivas["preco_medio"]).all()
+    finally:
+        sys.setswitchinterval(intervalo)
+
+
+if __name__ == "__main__":
+    test_invariantes_e_diario_no_modo_concorrente()
+    print("invariantes: OK")
@@ -0,0 +1,176 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from importacao_tardia import pd
+
+from metricas import METRICAS
+from portifolio_manager import FerramentasDeAnalise
+from servico_cotacoes import ServicoCotacoes
+
+ACOES_POR_SETOR = {
+    "Financeiro": ["ITUB4.SA", "BBDC4.SA", "BBAS3.SA", "SANB11.SA", "BPAC11.SA"],
+    "Varejo": ["MGLU3.SA", "LREN3.SA", "BHIA3.SA", "AMER3.SA", "PETZ3.SA"],
+    "Energia e Matérias-Primas": ["PETR4.SA", "VALE3.SA", "SUZB3.SA", "ELET3.SA", "PRIO3.SA"],
+    "Saúde": ["RADL3.SA", "HAPV3.SA", "FLRY3.SA", "RDOR3.SA", "AALR3.SA"],
+    "Tecnologia": ["TOTS3.SA", "LWSA3.SA", "CASH3.SA", "SQIA3.SA", "ZENV4.SA"]
+}
+
+# Períodos lidos por calcular_indicadores: 2 anos (beta) e 1 ano (volatilidade e RSI)
+PERIODOS_INDICADORES = ("2y", "1y")
+
+# Analisador de cada processo de trabalho (ver _iniciar_processo)
+_analisador_do_processo = None
+
+
+def _iniciar_processo(provedor, diretorio_historico):
+    """Cada processo de trabalho monta um analisador próprio sobre o mesmo histórico em disco."""
+    global _analisador_do_processo
+    _analisador_do_processo = FerramentasDeAnalise(provedor=provedor, diretorio_historico=diretorio_historico)
+
+
+def _calcular_lote(codigos, parametros):
+    return _analisador_do_processo.calcular_indicadores(codigos, **parametros)
+
+
+def carregar_universo(caminho):
+    """
+    Lê um universo de tickers de um CSV com a coluna codigo e, opcionalmente,
+    setor (ex.: a lista completa da B3). Retorna {setor: [tickers]}.
+    """
+    df = pd.read_csv(caminho, dtype=str)
+    if "setor" not in df.columns:
+        df["setor"] = "Sem setor"
+    return {setor: grupo["codigo"].str.strip().tolist() for setor, grupo in df.groupby("setor", sort=False)}
+
+
+class Triagem:
+    """
+    Triagem de um universo de tickers por volatilidade, RSI e beta.
+
+    1. `aquecer`: os históricos são carregados pelo `analisador` em paralelo,
+       em até `max_trabalhadores` threads (a espera é de rede ou disco);
+    2. `calcular`: os indicadores saem de `calcular_indicadores`, em lotes
+       vetorizados de `tamanho_lote` tickers. Com `processos` > 1, os lotes
+       são divididos entre processos, cada um com um analisador próprio que
+       lê o mesmo histórico em disco (`diretorio_historico` do analisador).
+       Sem histórico em disco, cada processo buscaria tudo de novo no
+       provedor, então nesse caso o cálculo fica sempre neste processo;
+    3. `filtrar` e ordenar.
+
+    `executar` faz as três etapas.
+    """
+    def __init__(self, analisador, processos=None, tamanho_lote=250, max_trabalhadores=16):
+        self.analisador = analisador
+        self.processos = processos
+        self.tamanho_lote = tamanho_lote
+        self.max_trabalhadores = max_trabalhadores
+
+    def _processos_para(self, quantidade):
+        if self.analisador.historico_local is None:
+            # Os processos só teriam de onde ler o que foi aquecido se houvesse histórico em disco
+            return 1
+        lotes = math.ceil(quantidade / self.tamanho_lote)
+        return min(self.processos or 1, lotes, os.cpu_count() or 1)
+
+    def aquecer(self, codigos):
+        """
+        Carrega os históricos usados pelos indicadores, e o do ^BVSP, em
+        paralelo. Cada ticker é carregado por uma única tarefa, do maior
+        período para o menor, para que o menor já saia do histórico em disco.
+
+        Se o cálculo for dividido entre processos, apenas o histórico em disco
+        é atualizado: cada processo lê dele os seus lotes, e carregá-los
+        também na memória deste processo seria trabalho perdido.
+        Retorna os tickers sem histórico.
+        """
+        codigos = list(dict.fromkeys(codigos))
+        historico_local = self.analisador.historico_local
+        so_disco = self._processos_para(len(codigos)) > 1
+
+        def carregar(codigo):
+            if so_disco:
+                try:
+                    meta = historico_local.atualizar(codigo, periodo=PERIODOS_INDICADORES[0])
+                except Exception:
+                    return False
+                return meta is not None and meta["linhas"] > 0
+            dados = None
+            for periodo in PERIODOS_INDICADORES:
+                dados = self.analisador._get_dados_historicos(codigo, periodo=periodo, copiar=False)
+            return dados is not None
+
+        with METRICAS.cronometro("triagem_segundos", etapa="aquecer"), \
+                ThreadPoolExecutor(max_workers=self.max_trabalhadores) as executor:
+            encontrados = list(executor.map(carregar, codigos + ["^BVSP"]))
+        return [codigo for codigo, encontrado in zip(codigos, encontrados) if not encontrado]
+
+    def calcular(self, codigos, **parametros):
+        """Indicadores de todos os tickers (DataFrame indexado pelo código), calculados em lotes."""
+        codigos = list(dict.fromkeys(codigos))
+        lotes = [codigos[i:i + self.tamanho_lote] for i in range(0, len(codigos), self.tamanho_lote)]
+        if not lotes:
+            return self.analisador.calcular_indicadores([], **parametros)
+
+        processos = self._processos_para(len(codigos))
+        with METRICAS.cronometro("triagem_segundos", etapa="calcular"):
+            if processos <= 1:
+                partes = [self.analisador.calcular_indicadores(lote, **parametros) for lote in lotes]
+            else:
+                provedor = self.analisador.provedor
+                if isinstance(provedor, ServicoCotacoes):
+                    # O pool de threads e o cache de cotações ficam neste processo
+                    provedor = provedor.provedor
+                historico_local = self.analisador.historico_local
+                diretorio = None if historico_local is None else historico_local.diretorio
+                # "spawn": um fork herdaria travas seguradas pelas outras threads
+                # deste processo (ex.: as do servidor do Streamlit)
+                with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                         initargs=(provedor, diretorio),
+                                         mp_context=multiprocessing.get_context("spawn")) as executor:
+                    partes = list(executor.map(_calcular_lote, lotes, [parametros] * len(lotes)))
+        return pd.concat(partes)
+
+    @staticmethod
+    def filtrar(resultado, criterios=None):
+        """
+        Mantém as linhas dentro dos limites de `criterios`, um dict
+        {coluna: (mínimo, máximo)} com None para "sem limite". Tickers sem o
+        indicador filtrado (NaN) são descartados.
+        """
+        mascara = pd.Series(True, index=resultado.index)
+        for coluna, (minimo, maximo) in (criterios or {}).items():
+            valores = resultado[coluna]
+            mascara &= valores.notna()
+            if minimo is not None:
+                mascara &= valores >= minimo
+            if maximo is not None:
+                mascara &= valores <= maximo
+        return resultado[mascara]
+
+    def executar(self, universo, criterios=None, ordenar_por="rsi", ascendente=True, limite=None, **parametros):
+        """
+        Triagem completa de `universo`, uma lista de tickers ou um dict
+        {setor: [tickers]} como `ACOES_POR_SETOR`. Retorna um DataFrame
+        indexado pelo ticker com o setor (quando informado), volatilidade,
+        RSI e beta, filtrado por `criterios` e ordenado por `ordenar_por`.
+        """
+        if isinstance(universo, dict):
+            setores = {codigo: setor for setor, codigos in universo.items() for codigo in codigos}
+            codigos = list(setores)
+        else:
+            setores = None
+            codigos = list(dict.fromkeys(universo))
+
+        sem_historico = self.aquecer(codigos)
+        if sem_historico:
+            exemplos = ", ".join(sem_historico[:10]) + (", ..." if len(sem_historico) > 10 else "")
+            print(f"AVISO: Sem histórico para {len(sem_historico)} ticker(s): {exemplos}")
+
+        resultado = self.calcular(codigos, **parametros)
+        if setores is not None:
+            resultado.insert(0, "setor", resultado.index.map(setores))
+        resultado = self.filtrar(resultado, criterios)
+        resultado = resultado.sort_values(ordenar_por, ascending=ascendente, na_position="last")
+        return resultado if limite is None else resultado.head(limite)